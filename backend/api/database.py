@@ -1,7 +1,7 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import Column, String, DateTime, Text, Boolean, JSON, ForeignKey, Integer
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import relationship
 import os
 import uuid
@@ -231,19 +231,97 @@ class SyncroTicket(Base):
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     syncro_ticket_id = Column(String, unique=True, index=True)
-    customer_id = Column(String)
+    customer_id = Column(String, index=True)
     subject = Column(String)
     description = Column(Text)
-    status = Column(String)
-    priority = Column(String)
+    status = Column(String, index=True)
+    priority = Column(String, index=True)
     problem_type = Column(String)
     assigned_technician = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     synced_at = Column(DateTime, default=datetime.utcnow)
     
     # Additional metadata
-    ticket_metadata = Column(JSON) 
+    ticket_metadata = Column(JSON)
+
+class RetellAgentPushState(Base):
+    __tablename__ = "retell_agent_push_state"
+
+    # What RetellAI holds for each agent as far as we know (services/agent_push.py)
+    retell_agent_id = Column(String, primary_key=True)
+    field_hashes = Column(JSONB, nullable=False, default=dict)  # field -> SHA-256 of its last pushed/pulled value
+    last_pushed_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SyncroSyncState(Base):
+    __tablename__ = "syncro_sync_state"
+
+    # Delta sync cursor per mirrored resource, written only when a sync completes
+    resource = Column(String, primary_key=True)  # tickets
+    high_water = Column(DateTime)  # Newest SyncroMSP updated_at seen by a completed sync
+    last_full_sync_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SyncroCustomer(Base):
+    __tablename__ = "syncro_customers"
+
+    # Local mirror of SyncroMSP customers (refreshed in the background, see services/customer_mirror.py)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    syncro_customer_id = Column(String, unique=True, index=True, nullable=False)
+    business_name = Column(String)
+    contact_name = Column(String)
+    email = Column(String)
+    phone = Column(String)
+    mobile = Column(String)
+    disabled = Column(Boolean, default=False)
+    syncro_updated_at = Column(DateTime, index=True)
+    synced_at = Column(DateTime, default=datetime.utcnow)
+
+    # Full customer payload from SyncroMSP
+    customer_data = Column(JSON)
+
+class ITGlueRecordMixin:
+    """Columns shared by the local ITGlue mirror tables (filled by services/itglue_mirror.py)"""
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    itglue_id = Column(String, unique=True, index=True, nullable=False)
+    organization_id = Column(String, index=True)
+    name = Column(String)
+    itglue_updated_at = Column(DateTime, index=True)
+    synced_at = Column(DateTime, default=datetime.utcnow)
+
+    # Plain text extracted from the record's HTML at sync time, and its one-line excerpt
+    text = Column(Text)
+    excerpt = Column(Text)
+
+    # Record as returned by ITGlueService (same shape as the live API responses)
+    data = Column(JSON)
+
+class ITGlueArticle(ITGlueRecordMixin, Base):
+    __tablename__ = "itglue_articles"
+
+class ITGlueConfiguration(ITGlueRecordMixin, Base):
+    __tablename__ = "itglue_configurations"
+
+class ITGlueContact(ITGlueRecordMixin, Base):
+    __tablename__ = "itglue_contacts"
+
+class ITGluePassword(ITGlueRecordMixin, Base):
+    # Metadata only - password values are never requested or stored
+    __tablename__ = "itglue_passwords"
+
+class ITGlueSyncRun(Base):
+    __tablename__ = "itglue_sync_runs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    mode = Column(String, nullable=False)  # full, incremental
+    status = Column(String, nullable=False, default="running")  # running, completed, partial, failed
+    started_at = Column(DateTime, default=datetime.utcnow, index=True)
+    finished_at = Column(DateTime)
+    items_synced = Column(Integer, default=0)
+    errors = Column(Integer, default=0)
+    results = Column(JSON)  # Per-resource pages/upserted/removed/error
 
 class PromptTemplate(Base):
     __tablename__ = "prompt_templates"
@@ -0,0 +1,125 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import engine
+from ..services.cache import TTLCache, _MISSING
+
+CHANNEL = "prompt_catalog"
+
+
+class PromptCatalogCache:
+    """In-process cache of prompt catalog reads (templates, scenarios, assignments).
+
+    Writers commit through commit(), which issues pg_notify in the same
+    transaction, so every worker's LISTEN connection hears about the change
+    exactly when it becomes visible and drops its cached reads. Reads bypass
+    the cache while the listener is disconnected, since missed notifications
+    would otherwise leave entries stale; the TTL is only a backstop.
+    """
+
+    def __init__(self):
+        self.ttl = float(os.getenv("PROMPT_CATALOG_CACHE_TTL_SECONDS", "600"))
+        self.keepalive = float(os.getenv("PROMPT_CATALOG_LISTEN_KEEPALIVE_SECONDS", "30"))
+        self.retry_interval = float(os.getenv("PROMPT_CATALOG_LISTEN_RETRY_SECONDS", "5"))
+        self._cache = TTLCache(maxsize=int(os.getenv("PROMPT_CATALOG_CACHE_SIZE", "512")))
+        self.listening = False
+        self.notifications = 0
+        self.last_error: Optional[str] = None
+        self._origin = str(os.getpid())
+        self._task: Optional[asyncio.Task] = None
+
+    async def read(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached result of `loader()` for `key`, loaded on a miss"""
+        if not self.listening:
+            return await loader()
+
+        value = self._cache.get(key)
+        if value is not _MISSING:
+            return value
+
+        generation = self._cache.generation
+        value = await loader()
+        self._cache.set(key, value, self.ttl, generation=generation)
+        return value
+
+    async def commit(self, db: AsyncSession) -> None:
+        """Commit a catalog write and broadcast the invalidation to every worker"""
+        await db.execute(text("SELECT pg_notify(:channel, :origin)"), {"channel": CHANNEL, "origin": self._origin})
+        await db.commit()
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        self._cache.clear()
+
+    def _on_notify(self, connection: Any, pid: int, channel: str, payload: str) -> None:
+        self.notifications += 1
+        self.invalidate()
+
+    async def _listen(self) -> None:
+        async with engine.connect() as conn:
+            fairy = await conn.get_raw_connection()
+            driver = fairy.driver_connection
+            lost = asyncio.Event()
+            driver.add_termination_listener(lambda _: lost.set())
+            await driver.add_listener(CHANNEL, self._on_notify)
+            try:
+                # Anything written while we were not listening may be cached
+                self.invalidate()
+                self.listening = True
+                logger.info(f"Prompt catalog cache listening on '{CHANNEL}'")
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), timeout=self.keepalive)
+                    except asyncio.TimeoutError:
+                        # Surfaces silently dropped connections
+                        await driver.execute("SELECT 1")
+            finally:
+                self.listening = False
+                self.invalidate()
+                if not driver.is_closed():
+                    await driver.remove_listener(CHANNEL, self._on_notify)
+        raise ConnectionError("LISTEN connection closed")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"Prompt catalog cache listener down, reads go to the database: {str(e)}")
+            await asyncio.sleep(self.retry_interval)
+
+    async def start(self) -> None:
+        """Listen for catalog changes; reads are cached only while listening"""
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "listening": self.listening,
+            "notifications": self.notifications,
+            "last_error": self.last_error,
+            **self._cache.stats()
+        }
+
+
+# Create singleton instance
+prompt_catalog_cache = PromptCatalogCache()
@@ -1,24 +1,38 @@
 from typing import Dict, Any, List, Optional
+import asyncio
 import os
 import json
+import threading
 from pathlib import Path
 from loguru import logger
 
+from .template_compiler import template_compiler
+
 class PromptManager:
-    """Manages RetellAI agent prompts with template support"""
+    """Manages RetellAI agent prompts with template support.
+
+    Prompt files are held in an in-memory catalog keyed by name. The catalog is
+    built at startup and re-checked against file mtimes by a background poll
+    (file I/O runs in a worker thread), so reads and listings never touch disk.
+    The lock is held only to swap entries in, never across file I/O.
+    """
     
     def __init__(self):
         self.prompts_dir = Path(__file__).parent / "templates"
         self.prompts_dir.mkdir(exist_ok=True)
-        self._prompts_cache = {}
+        self.poll_interval = float(os.getenv("PROMPT_CATALOG_POLL_SECONDS", "5"))
+        # name -> {"mtime_ns", "size", "data", "summary"}
+        self._catalog: Dict[str, Dict[str, Any]] = {}
+        self._scanned = False
+        # Bumped whenever the catalog changes, so derived indexes know to rebuild
+        self.version = 0
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
     
     def get_prompt(self, prompt_name: str, variables: Optional[Dict[str, Any]] = None) -> str:
         """Get a prompt by name with optional variable substitution"""
         try:
-            if prompt_name not in self._prompts_cache:
-                self._load_prompt(prompt_name)
-            
-            prompt_template = self._prompts_cache[prompt_name]["template"]
+            prompt_template = self.get_prompt_info(prompt_name)["template"]
             
             if variables:
                 return self._substitute_variables(prompt_template, variables)
@@ -30,35 +44,28 @@ class PromptManager:
             raise
     
     def list_prompts(self) -> List[Dict[str, Any]]:
-        """List all available prompts"""
-        prompts = []
-        
-        for prompt_file in self.prompts_dir.glob("*.json"):
-            try:
-                with open(prompt_file, 'r') as f:
-                    prompt_data = json.load(f)
-                    prompts.append({
-                        "name": prompt_file.stem,
-                        "title": prompt_data.get("title", prompt_file.stem),
-                        "description": prompt_data.get("description", ""),
-                        "variables": prompt_data.get("variables", []),
-                        "category": prompt_data.get("category", "general")
-                    })
-            except Exception as e:
-                logger.error(f"Error loading prompt {prompt_file}: {str(e)}")
+        """List all available prompts (from the catalog)"""
+        if not self._scanned:
+            self.refresh()
         
-        return prompts
+        return [dict(entry["summary"]) for _, entry in sorted(self._catalog.items())]
     
     def save_prompt(self, name: str, prompt_data: Dict[str, Any]) -> bool:
         """Save a prompt to disk"""
         try:
             prompt_file = self.prompts_dir / f"{name}.json"
             
-            with open(prompt_file, 'w') as f:
+            # Write a temp file and rename it over the prompt, so a scan never reads half a file
+            temp_file = self.prompts_dir / f".{name}.json.tmp"
+            with open(temp_file, 'w') as f:
                 json.dump(prompt_data, f, indent=2)
+            os.replace(temp_file, prompt_file)
+            entry = self._entry(name, prompt_file.stat(), prompt_data)
             
-            # Update cache
-            self._prompts_cache[name] = prompt_data
+            with self._lock:
+                # Update catalog
+                self._catalog[name] = entry
+                self.version += 1
             
             logger.info(f"Saved prompt: {name}")
             return True
@@ -72,17 +79,18 @@ class PromptManager:
         try:
             prompt_file = self.prompts_dir / f"{name}.json"
             
-            if prompt_file.exists():
+            try:
                 prompt_file.unlink()
-                
-                # Remove from cache
-                if name in self._prompts_cache:
-                    del self._prompts_cache[name]
-                
-                logger.info(f"Deleted prompt: {name}")
-                return True
+            except FileNotFoundError:
+                return False
             
-            return False
+            with self._lock:
+                # Remove from catalog
+                self._catalog.pop(name, None)
+                self.version += 1
+            
+            logger.info(f"Deleted prompt: {name}")
+            return True
             
         except Exception as e:
             logger.error(f"Error deleting prompt {name}: {str(e)}")
@@ -91,34 +99,111 @@ class PromptManager:
     def get_prompt_info(self, name: str) -> Dict[str, Any]:
         """Get detailed information about a prompt"""
         try:
-            if name not in self._prompts_cache:
-                self._load_prompt(name)
+            if not self._scanned:
+                self.refresh()
             
-            return self._prompts_cache[name]
+            entry = self._catalog.get(name)
+            if entry is None:
+                # Files written by other processes appear on the next poll
+                raise FileNotFoundError(f"Prompt '{name}' not found")
+            
+            return entry["data"]
             
         except Exception as e:
             logger.error(f"Error getting prompt info {name}: {str(e)}")
             raise
     
-    def _load_prompt(self, name: str) -> None:
-        """Load a prompt from disk into cache"""
-        prompt_file = self.prompts_dir / f"{name}.json"
+    def _entry(self, name: str, stat: os.stat_result, prompt_data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "data": prompt_data,
+            "summary": {
+                "name": name,
+                "title": prompt_data.get("title", name),
+                "description": prompt_data.get("description", ""),
+                "variables": prompt_data.get("variables", []),
+                "category": prompt_data.get("category", "general")
+            }
+        }
+    
+    def refresh(self) -> Dict[str, int]:
+        """Re-read prompt files whose mtime or size changed and drop deleted ones (blocking; see refresh_async)"""
+        changes = {"loaded": 0, "removed": 0, "failed": 0}
+        snapshot = dict(self._catalog)
+        loaded: Dict[str, Dict[str, Any]] = {}
+        seen = set()
         
-        if not prompt_file.exists():
-            raise FileNotFoundError(f"Prompt '{name}' not found")
+        for file in os.scandir(self.prompts_dir):
+            if not file.is_file() or not file.name.endswith(".json"):
+                continue
+            name = file.name[:-len(".json")]
+            seen.add(name)
+            
+            try:
+                stat = file.stat()
+                current = snapshot.get(name)
+                if current and current["mtime_ns"] == stat.st_mtime_ns and current["size"] == stat.st_size:
+                    continue
+                
+                with open(file.path, 'r') as f:
+                    loaded[name] = self._entry(name, stat, json.load(f))
+            except Exception as e:
+                # Keep serving the last good version (e.g. a file caught mid-write)
+                changes["failed"] += 1
+                logger.error(f"Error loading prompt {file.path}: {str(e)}")
         
-        with open(prompt_file, 'r') as f:
-            self._prompts_cache[name] = json.load(f)
+        with self._lock:
+            # Entries saved or deleted through this manager during the scan are newer than what we read
+            for name, entry in loaded.items():
+                if self._catalog.get(name) is snapshot.get(name):
+                    self._catalog[name] = entry
+                    changes["loaded"] += 1
+            for name in set(snapshot) - seen:
+                if name in self._catalog and self._catalog[name] is snapshot[name]:
+                    del self._catalog[name]
+                    changes["removed"] += 1
+            
+            if changes["loaded"] or changes["removed"]:
+                self.version += 1
+            self._scanned = True
+        
+        if changes["loaded"] or changes["removed"]:
+            logger.info(f"Prompt catalog refreshed: {changes}")
+        return changes
+    
+    async def refresh_async(self) -> Dict[str, int]:
+        """Refresh the catalog from a worker thread"""
+        return await asyncio.to_thread(self.refresh)
+    
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh_async()
+            except Exception as e:
+                logger.error(f"Prompt catalog refresh failed: {str(e)}")
+            await asyncio.sleep(self.poll_interval)
+    
+    async def start(self) -> None:
+        """Build the catalog and keep it current with the prompt files"""
+        if self._task is not None:
+            return
+        await self.refresh_async()
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
     
     def _substitute_variables(self, template: str, variables: Dict[str, Any]) -> str:
         """Substitute variables in a prompt template"""
-        result = template
-        
-        for key, value in variables.items():
-            placeholder = f"{{{key}}}"
-            result = result.replace(placeholder, str(value))
-        
-        return result
+        return template_compiler.compile(template, variables).text
     
     def create_from_retell_agent(self, agent_name: str, retell_prompt: str, 
                                 description: str = "", category: str = "retell") -> str:
@@ -0,0 +1,207 @@
+import asyncio
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import selectinload
+
+from ..database import AsyncSessionLocal, Agent, AgentPromptAssignment, PromptScenario
+from ..services.agent_push import agent_push_tracker
+from .template_compiler import template_compiler
+
+
+def _job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in job.items() if not key.startswith("_")}
+
+
+class PromptPropagator:
+    """Carries template and scenario edits through to the agents that use them.
+
+    Dependencies run template -> active scenarios -> each agent's current
+    (latest active) assignment -> agent. A job resolves only the agents whose
+    current scenario is affected, compiles each affected scenario once, stores
+    the prompt on the agent and pushes it to RetellAI with bounded concurrency.
+    Unchanged prompts are skipped by the content-hash push tracker.
+
+    A new job for the same template or scenario supersedes any queued or running
+    one and starts only after it has stopped, so pushes land in edit order. The
+    database session is held only to load the work and to save the results,
+    never across RetellAI round trips.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("PROMPT_PROPAGATION_ENABLED", "true").lower() == "true"
+        self.concurrency = int(os.getenv("PROMPT_PROPAGATION_CONCURRENCY", "4"))
+        self.max_jobs = int(os.getenv("PROMPT_PROPAGATION_JOB_HISTORY", "50"))
+        self.jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    async def affected_agents(self, db, template_id: Optional[str] = None,
+                              scenario_id: Optional[str] = None) -> List[tuple]:
+        """(agent, scenario) pairs whose current assignment depends on the template or scenario"""
+        # Each agent's current assignment: its most recently assigned active one
+        current = (
+            select(AgentPromptAssignment.agent_id, AgentPromptAssignment.scenario_id)
+            .where(AgentPromptAssignment.is_active == True)
+            .distinct(AgentPromptAssignment.agent_id)
+            .order_by(AgentPromptAssignment.agent_id, AgentPromptAssignment.assigned_at.desc())
+            .subquery()
+        )
+        conditions = []
+        if template_id:
+            conditions.append(PromptScenario.template_id == template_id)
+        if scenario_id:
+            conditions.append(PromptScenario.id == scenario_id)
+
+        query = (
+            select(Agent, PromptScenario)
+            .join(current, current.c.agent_id == Agent.id)
+            .join(PromptScenario, PromptScenario.id == current.c.scenario_id)
+            .where(PromptScenario.is_active == True, or_(*conditions))
+            .options(selectinload(PromptScenario.template))
+        )
+        return list((await db.execute(query)).all())
+
+    def schedule(self, template_id: Optional[str] = None, scenario_id: Optional[str] = None,
+                 force: bool = False, reason: str = "manual") -> Dict[str, Any]:
+        """Start a background propagation job and return its initial state"""
+        if not template_id and not scenario_id:
+            raise ValueError("template_id or scenario_id is required")
+
+        job_id = str(uuid.uuid4())
+        job = {
+            "id": job_id,
+            "template_id": str(template_id) if template_id else None,
+            "scenario_id": str(scenario_id) if scenario_id else None,
+            "reason": reason,
+            "force": force,
+            "status": "queued",
+            "created_at": datetime.utcnow().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "scenarios": 0,
+            "total": 0,
+            "completed": 0,
+            "updated": 0,
+            "pushed": 0,
+            "unchanged": 0,
+            "failed": 0,
+            "errors": []
+        }
+        # An older job for the same target would push a stale compile; it must finish stopping first
+        superseded = []
+        for other in self.jobs.values():
+            if (other["template_id"], other["scenario_id"]) == (job["template_id"], job["scenario_id"]) \
+                    and not other["_task"].done():
+                other["status"] = "superseded"
+                other["superseded_by"] = job_id
+                other["_task"].cancel()
+                superseded.append(other["_task"])
+
+        self.jobs[job_id] = job
+        while len(self.jobs) > self.max_jobs:
+            oldest = next(iter(self.jobs))
+            if self.jobs[oldest]["status"] in ("queued", "running"):
+                break
+            self.jobs.popitem(last=False)
+
+        job["_task"] = asyncio.create_task(self._run(job, superseded))
+        return _job_view(job)
+
+    async def _run(self, job: Dict[str, Any], superseded: List[asyncio.Task]) -> None:
+        try:
+            await asyncio.gather(*superseded, return_exceptions=True)
+            job["status"] = "running"
+            job["started_at"] = datetime.utcnow().isoformat()
+
+            async with AsyncSessionLocal() as db:
+                pairs = await self.affected_agents(db, job["template_id"], job["scenario_id"])
+                prompts = {}
+                for _, scenario in pairs:
+                    if scenario.id not in prompts:
+                        prompts[scenario.id] = template_compiler.compile_scenario(scenario).text
+            job["scenarios"] = len(prompts)
+            job["total"] = len(pairs)
+
+            semaphore = asyncio.Semaphore(max(1, self.concurrency))
+            # Agents are detached now; changes are collected and saved in one short session below
+            changes: Dict[str, Dict[str, Any]] = {}
+
+            async def apply(agent: Agent, prompt: str) -> None:
+                async with semaphore:
+                    try:
+                        changed = agent.prompt != prompt
+                        pushed = False
+                        if agent.remote_agent_id:
+                            push = await agent_push_tracker.push(
+                                agent.remote_agent_id, {"general_prompt": prompt}, force=job["force"]
+                            )
+                            pushed = push["pushed"]
+                        if changed:
+                            changes[agent.id] = {"id": agent.id, "prompt": prompt}
+                        job["updated" if changed else "unchanged"] += 1
+                        job["pushed"] += int(pushed)
+                    except Exception as e:
+                        job["failed"] += 1
+                        job["errors"].append({"agent_id": agent.id, "error": str(e)})
+                        logger.error(f"Prompt propagation to agent {agent.id} failed: {str(e)}")
+                    finally:
+                        job["completed"] += 1
+
+            try:
+                await asyncio.gather(*(apply(agent, prompts[scenario.id]) for agent, scenario in pairs))
+            finally:
+                # Saved even when superseded, so local prompts match what was pushed
+                if changes:
+                    async with AsyncSessionLocal() as db:
+                        await db.execute(update(Agent), list(changes.values()))
+                        await db.commit()
+
+            job["status"] = "completed" if not job["failed"] else "completed_with_errors"
+        except asyncio.CancelledError:
+            if job["status"] != "superseded":
+                job["status"] = "cancelled"
+            raise
+        except Exception as e:
+            job["status"] = "failed"
+            job["errors"].append({"error": str(e)})
+            logger.error(f"Prompt propagation job {job['id']} failed: {str(e)}")
+        finally:
+            job["finished_at"] = datetime.utcnow().isoformat()
+            logger.info(
+                f"Prompt propagation job {job['id']} {job['status']}: {job['completed']}/{job['total']} agents, "
+                f"{job['updated']} updated, {job['pushed']} pushed, {job['failed']} failed"
+            )
+
+    def on_template_updated(self, template_id: Any, changed_fields) -> Optional[Dict[str, Any]]:
+        """Propagate a template edit if it changed the compiled output"""
+        if not self.enabled or "template_content" not in changed_fields:
+            return None
+        return self.schedule(template_id=str(template_id), reason="template_updated")
+
+    def on_scenario_updated(self, scenario_id: Any, changed_fields) -> Optional[Dict[str, Any]]:
+        """Propagate a scenario edit if it changed the compiled output"""
+        if not self.enabled or not {"variable_values", "template_id"} & set(changed_fields):
+            return None
+        return self.schedule(scenario_id=str(scenario_id), reason="scenario_updated")
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.jobs.get(job_id)
+        return _job_view(job) if job else None
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        return [_job_view(job) for job in reversed(self.jobs.values())]
+
+    async def stop(self) -> None:
+        """Cancel running jobs"""
+        tasks = [job["_task"] for job in self.jobs.values() if not job["_task"].done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Create singleton instance
+prompt_propagator = PromptPropagator()
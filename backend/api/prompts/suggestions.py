@@ -0,0 +1,245 @@
+import asyncio
+import heapq
+import math
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import func, or_, select
+
+from ..database import AsyncSessionLocal, Call, PromptTemplate
+from ..services.knowledge_index import tokenize
+from .prompt_manager import prompt_manager
+
+# Term weight multipliers per template field
+FIELD_WEIGHTS = {"title": 3.0, "category": 2.0, "description": 2.0, "content": 1.0}
+
+# Query parts: agent name matters most, then what callers actually talk about
+QUERY_WEIGHTS = {"name": 3.0, "topics": 2.0, "prompt": 1.0}
+
+
+def _weighted_terms(parts: Dict[str, str], weights: Dict[str, float]) -> Counter:
+    terms: Counter = Counter()
+    for part, text in parts.items():
+        weight = weights[part]
+        for token in tokenize(text or ""):
+            terms[token] += weight
+    return terms
+
+
+class TemplateVectorIndex:
+    """TF-IDF vectors over prompt templates, with an inverted index for cosine scoring.
+
+    Document vectors use sublinear term frequency (1 + log tf) times smoothed IDF
+    and are L2-normalized at build time, so a query costs one pass over the
+    postings of its terms.
+    """
+
+    def __init__(self, documents: List[Dict[str, Any]]):
+        self.documents = documents
+        term_counts = [
+            _weighted_terms({field: doc.get(field) or "" for field in FIELD_WEIGHTS}, FIELD_WEIGHTS)
+            for doc in documents
+        ]
+        document_frequency: Counter = Counter()
+        for counts in term_counts:
+            document_frequency.update(counts.keys())
+
+        total = len(documents)
+        self.idf = {term: math.log((1 + total) / (1 + df)) + 1.0 for term, df in document_frequency.items()}
+        self.postings: Dict[str, List[Tuple[int, float]]] = {}
+        for doc, counts in enumerate(term_counts):
+            weights = {term: (1.0 + math.log(tf)) * self.idf[term] for term, tf in counts.items()}
+            norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+            for term, weight in weights.items():
+                self.postings.setdefault(term, []).append((doc, weight / norm))
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def search(self, parts: Dict[str, str], limit: int = 5, max_terms: int = 64) -> List[Tuple[float, Dict[str, Any]]]:
+        """Top `limit` templates by cosine similarity to the weighted query parts"""
+        counts = _weighted_terms(parts, QUERY_WEIGHTS)
+        weights = {
+            term: (1.0 + math.log(tf)) * self.idf[term]
+            for term, tf in counts.items() if term in self.idf
+        }
+        if not weights:
+            return []
+
+        # Long prompts: keep the most distinctive terms
+        if len(weights) > max_terms:
+            weights = dict(sorted(weights.items(), key=lambda item: item[1], reverse=True)[:max_terms])
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+
+        scores: Dict[int, float] = {}
+        for term, weight in weights.items():
+            for doc, doc_weight in self.postings[term]:
+                scores[doc] = scores.get(doc, 0.0) + weight * doc_weight
+
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(score / norm, self.documents[doc]) for doc, score in top]
+
+
+async def load_template_documents() -> List[Dict[str, Any]]:
+    """File prompts from the prompt catalog plus active library templates (library wins on name clashes)"""
+    documents: Dict[str, Dict[str, Any]] = {}
+    for prompt in prompt_manager.list_prompts():
+        try:
+            content = prompt_manager.get_prompt_info(prompt["name"]).get("template", "")
+        except FileNotFoundError:
+            # Removed by a catalog poll since the listing
+            continue
+        documents[prompt["name"]] = {
+            "source": "file",
+            "name": prompt["name"],
+            "title": prompt["title"],
+            "description": prompt["description"],
+            "category": prompt["category"],
+            "variables": prompt["variables"],
+            "content": content
+        }
+
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(
+                    PromptTemplate.id, PromptTemplate.name, PromptTemplate.title, PromptTemplate.description,
+                    PromptTemplate.category, PromptTemplate.variables, PromptTemplate.template_content
+                ).where(PromptTemplate.is_active == True)
+            )
+            rows = result.all()
+    except Exception as e:
+        logger.warning(f"Template library unavailable for suggestions, using file prompts only: {str(e)}")
+        rows = []
+
+    for template_id, name, title, description, category, variables, content in rows:
+        documents[name] = {
+            "source": "library",
+            "id": str(template_id),
+            "name": name,
+            "title": title,
+            "description": description or "",
+            "category": category,
+            "variables": variables or [],
+            "content": content or ""
+        }
+    return list(documents.values())
+
+
+class PromptSuggester:
+    """Ranks prompt templates for an agent from a prebuilt TF-IDF index.
+
+    The index is rebuilt in a worker thread when the file catalog or the active
+    template library changes (checked every PROMPT_SUGGEST_REFRESH_SECONDS), so
+    a suggestion request only scores the query against in-memory postings.
+    """
+
+    def __init__(self):
+        self.refresh_interval = float(os.getenv("PROMPT_SUGGEST_REFRESH_SECONDS", "60"))
+        self.topic_calls = int(os.getenv("PROMPT_SUGGEST_TOPIC_CALLS", "20"))
+        self.index = TemplateVectorIndex([])
+        self.loaded = False
+        self.last_build_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self._signature: Optional[Tuple] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _library_signature(self) -> Tuple:
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(func.count(PromptTemplate.id), func.max(PromptTemplate.updated_at)).where(
+                        PromptTemplate.is_active == True
+                    )
+                )
+                return tuple(result.one())
+        except Exception:
+            return ("unavailable",)
+
+    async def rebuild(self, force: bool = False) -> bool:
+        """Rebuild the index if templates changed since the last build"""
+        async with self._lock:
+            signature = (prompt_manager.version, *(await self._library_signature()))
+            if not force and self.loaded and signature == self._signature:
+                return False
+
+            documents = await load_template_documents()
+            self.index = await asyncio.to_thread(TemplateVectorIndex, documents)
+            self._signature = signature
+            self.loaded = True
+            self.last_build_at = datetime.utcnow()
+            self.last_error = None
+            logger.info(f"Prompt suggestion index built: {len(self.index)} templates")
+            return True
+
+    async def call_topics(self, db, agent_id: Any) -> List[str]:
+        """Summaries of the agent's most recent analyzed calls"""
+        result = await db.execute(
+            select(Call.call_analysis).where(
+                or_(Call.agent_id == agent_id, Call.inbound_agent_id == agent_id, Call.caller_agent_id == agent_id),
+                Call.call_analysis.isnot(None)
+            ).order_by(Call.created_at.desc()).limit(self.topic_calls)
+        )
+        return [
+            analysis["call_summary"] for analysis in result.scalars().all()
+            if isinstance(analysis, dict) and analysis.get("call_summary")
+        ]
+
+    async def suggest(self, name: str, prompt: str = "", topics: Optional[List[str]] = None,
+                      limit: int = 5) -> Dict[str, Any]:
+        """Top templates for an agent, with cosine scores"""
+        if not self.loaded:
+            await self.rebuild()
+
+        started = time.perf_counter()
+        ranked = self.index.search({"name": name, "prompt": prompt, "topics": " ".join(topics or [])}, limit=limit)
+        return {
+            "results": [
+                {**{key: value for key, value in document.items() if key != "content"}, "score": round(score, 4)}
+                for score, document in ranked
+            ],
+            "took_ms": round((time.perf_counter() - started) * 1000, 3)
+        }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.rebuild()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Prompt suggestion index refresh failed: {str(e)}")
+            await asyncio.sleep(self.refresh_interval)
+
+    async def start(self) -> None:
+        """Build the index and keep it in step with template changes"""
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.loaded,
+            "templates": len(self.index),
+            "terms": len(self.index.postings),
+            "last_build_at": self.last_build_at.isoformat() if self.last_build_at else None,
+            "last_error": self.last_error
+        }
+
+
+# Create singleton instance
+prompt_suggester = PromptSuggester()
@@ -0,0 +1,110 @@
+import os
+import re
+from typing import Any, Dict, FrozenSet, Hashable, List, NamedTuple, Optional
+
+from ..services.cache import TTLCache, _MISSING
+
+# {name} placeholders; anything between single braces is a candidate, but only
+# identifier-like names count as template variables (JSON snippets stay literal)
+_PLACEHOLDER = re.compile(r"\{([^{}]+)\}")
+_IDENTIFIER = re.compile(r"\w+")
+
+
+class CompiledPrompt(NamedTuple):
+    text: str
+    missing_variables: List[str]
+    unused_variables: List[str]
+
+
+class ParsedTemplate:
+    """A template split once into alternating literal and placeholder segments"""
+
+    __slots__ = ("literals", "names", "variables")
+
+    def __init__(self, content: str):
+        self.literals: List[str] = []
+        self.names: List[str] = []
+        position = 0
+        for match in _PLACEHOLDER.finditer(content):
+            self.literals.append(content[position:match.start()])
+            self.names.append(match.group(1))
+            position = match.end()
+        self.literals.append(content[position:])
+        self.variables: FrozenSet[str] = frozenset(name for name in self.names if _IDENTIFIER.fullmatch(name))
+
+    def render(self, values: Dict[str, Any]) -> str:
+        """Fill placeholders in one pass; unknown placeholders are kept as written"""
+        parts = [self.literals[0]]
+        for name, literal in zip(self.names, self.literals[1:]):
+            value = values.get(name, _MISSING)
+            parts.append(f"{{{name}}}" if value is _MISSING else str(value))
+            parts.append(literal)
+        return "".join(parts)
+
+    def compile(self, values: Dict[str, Any]) -> CompiledPrompt:
+        return CompiledPrompt(
+            text=self.render(values),
+            missing_variables=sorted(self.variables.difference(values)),
+            unused_variables=sorted(set(values).difference(self.names))
+        )
+
+
+class TemplateCompiler:
+    """Parses prompt templates once and memoizes compiled scenario prompts.
+
+    Parsed templates are keyed by template id and updated_at (or by content when
+    the template is not stored), compiled prompts by scenario id and updated_at
+    plus the template key, so any edit to either side produces a new entry
+    rather than needing invalidation.
+    """
+
+    def __init__(self):
+        self.ttl = float(os.getenv("PROMPT_COMPILE_CACHE_TTL_SECONDS", "3600"))
+        maxsize = int(os.getenv("PROMPT_COMPILE_CACHE_SIZE", "1024"))
+        self._parsed = TTLCache(maxsize=maxsize)
+        self._compiled = TTLCache(maxsize=maxsize)
+
+    def parse(self, content: str, template_id: Any = None, updated_at: Any = None) -> ParsedTemplate:
+        key = self._template_key(content, template_id, updated_at)
+        parsed = self._parsed.get(key)
+        if parsed is _MISSING:
+            parsed = ParsedTemplate(content)
+            self._parsed.set(key, parsed, self.ttl)
+        return parsed
+
+    def compile(self, content: str, values: Optional[Dict[str, Any]] = None,
+                template_id: Any = None, updated_at: Any = None) -> CompiledPrompt:
+        return self.parse(content, template_id, updated_at).compile(values or {})
+
+    def compile_scenario(self, scenario: Any, template: Any = None) -> CompiledPrompt:
+        """Compiled prompt for a PromptScenario (and its template, defaulting to scenario.template)"""
+        template = template if template is not None else scenario.template
+        if template is None:
+            return CompiledPrompt("", [], sorted(scenario.variable_values or {}))
+
+        template_key = self._template_key(template.template_content, template.id, template.updated_at)
+        key = None
+        if scenario.id is not None and scenario.updated_at is not None:
+            key = (str(scenario.id), scenario.updated_at, template_key)
+            compiled = self._compiled.get(key)
+            if compiled is not _MISSING:
+                return compiled
+
+        compiled = self.parse(template.template_content, template.id, template.updated_at).compile(
+            scenario.variable_values or {}
+        )
+        if key is not None:
+            self._compiled.set(key, compiled, self.ttl)
+        return compiled
+
+    def _template_key(self, content: str, template_id: Any, updated_at: Any) -> Hashable:
+        if template_id is not None and updated_at is not None:
+            return (str(template_id), updated_at)
+        return ("content", content)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"parsed_templates": self._parsed.stats(), "compiled_prompts": self._compiled.stats()}
+
+
+# Create singleton instance
+template_compiler = TemplateCompiler()
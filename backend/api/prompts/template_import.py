@@ -0,0 +1,192 @@
+import asyncio
+import json
+import os
+import tarfile
+import zipfile
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import IO, Any, Dict, Iterable, List
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import PromptTemplate
+from .propagation import prompt_propagator
+
+TEMPLATE_SUFFIXES = (".json", ".txt")
+
+MAX_FILE_BYTES = int(os.getenv("PROMPT_IMPORT_MAX_FILE_BYTES", str(1024 * 1024)))
+MAX_ARCHIVE_FILES = int(os.getenv("PROMPT_IMPORT_MAX_ARCHIVE_FILES", "500"))
+MAX_ARCHIVE_BYTES = int(os.getenv("PROMPT_IMPORT_MAX_ARCHIVE_BYTES", str(20 * 1024 * 1024)))
+
+
+def parse_template_file(filename: str, raw: bytes, created_by: str = "system_import",
+                        is_system_template: bool = True) -> Dict[str, Any]:
+    """PromptTemplate column values for a .json or .txt template file"""
+    path = PurePosixPath(filename)
+    name = path.stem
+    content = raw.decode("utf-8")
+
+    if path.suffix == ".json":
+        template_data = json.loads(content)
+        if not isinstance(template_data, dict):
+            raise ValueError("expected a JSON object")
+        return {
+            "name": name,
+            "title": template_data.get("title", name),
+            "description": template_data.get("description", ""),
+            "category": template_data.get("category", "imported"),
+            "template_content": template_data.get("template", ""),
+            "variables": template_data.get("variables", []),
+            "tools": template_data.get("tools", []),
+            "is_system_template": is_system_template,
+            "created_by": created_by
+        }
+
+    return {
+        "name": name,
+        "title": name.replace("_", " ").title(),
+        "description": f"Imported from {path.name}",
+        "category": "text_templates",
+        "template_content": content,
+        "variables": [],
+        "tools": [],
+        "is_system_template": is_system_template,
+        "created_by": created_by
+    }
+
+
+def _parse_path(path: Path) -> Dict[str, Any]:
+    result: Dict[str, Any] = {"file": path.name}
+    try:
+        if path.stat().st_size > MAX_FILE_BYTES:
+            raise ValueError(f"larger than {MAX_FILE_BYTES} bytes")
+        result["row"] = parse_template_file(path.name, path.read_bytes())
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+async def parse_template_dir(templates_dir: Path) -> List[Dict[str, Any]]:
+    """Read and parse every template file in a directory concurrently, off the event loop"""
+    paths = sorted(path for path in templates_dir.iterdir() if path.suffix in TEMPLATE_SUFFIXES)
+    return list(await asyncio.gather(*(asyncio.to_thread(_parse_path, path) for path in paths)))
+
+
+def _archive_members(fileobj: IO[bytes], filename: str) -> Iterable[tuple]:
+    """(member name, size, opener) for regular files in a zip or tar archive"""
+    if filename.lower().endswith(".zip"):
+        archive = zipfile.ZipFile(fileobj)
+        for info in archive.infolist():
+            if not info.is_dir():
+                yield info.filename, info.file_size, lambda info=info: archive.open(info)
+        return
+
+    # Stream mode: members are read in order without seeking back through the upload
+    archive = tarfile.open(fileobj=fileobj, mode="r|*")
+    for member in archive:
+        if member.isfile():
+            yield member.name, member.size, lambda member=member: archive.extractfile(member)
+
+
+def parse_template_archive(fileobj: IO[bytes], filename: str) -> List[Dict[str, Any]]:
+    """Parse template files from an uploaded zip/tar archive one member at a time (blocking)"""
+    results: List[Dict[str, Any]] = []
+    files = 0
+    for member_name, size, open_member in _archive_members(fileobj, filename):
+        path = PurePosixPath(member_name)
+        if path.suffix not in TEMPLATE_SUFFIXES or path.name.startswith("."):
+            continue
+
+        files += 1
+        if files > MAX_ARCHIVE_FILES:
+            results.append({"file": member_name, "error": f"archive holds more than {MAX_ARCHIVE_FILES} templates"})
+            break
+
+        result: Dict[str, Any] = {"file": member_name}
+        try:
+            if size > MAX_FILE_BYTES:
+                raise ValueError(f"larger than {MAX_FILE_BYTES} bytes")
+            with open_member() as member:
+                raw = member.read(MAX_FILE_BYTES + 1)
+            if len(raw) > MAX_FILE_BYTES:
+                raise ValueError(f"larger than {MAX_FILE_BYTES} bytes")
+            result["row"] = parse_template_file(
+                path.name, raw, created_by="archive_import", is_system_template=False
+            )
+        except Exception as e:
+            result["error"] = str(e)
+        results.append(result)
+    return results
+
+
+async def import_template_rows(db: AsyncSession, parsed: List[Dict[str, Any]],
+                               overwrite_existing: bool = False) -> Dict[str, Any]:
+    """Write parsed templates in bulk and report the outcome per file.
+
+    Existing names are fetched in one query; new templates go in with a single
+    bulk INSERT and, when overwriting, existing ones with a single bulk UPDATE.
+    The caller commits; once it does, overwritten templates whose content changed
+    are propagated to their agents (job ids are added to "propagation_job_ids").
+    """
+    names = {result["row"]["name"] for result in parsed if "row" in result}
+    existing: Dict[str, Any] = {}
+    contents: Dict[str, Any] = {}
+    if names:
+        rows = await db.execute(
+            select(PromptTemplate.name, PromptTemplate.id, PromptTemplate.template_content)
+            .where(PromptTemplate.name.in_(names))
+        )
+        for name, template_id, content in rows.all():
+            existing[name] = template_id
+            contents[name] = content
+
+    inserts: List[Dict[str, Any]] = []
+    updates: List[Dict[str, Any]] = []
+    seen = set()
+    for result in parsed:
+        row = result.pop("row", None)
+        if row is None:
+            result["status"] = "error"
+            continue
+
+        name = result["name"] = row["name"]
+        if name in seen:
+            result["status"] = "skipped"
+            result["reason"] = "duplicate name in this import"
+        elif name in existing and not overwrite_existing:
+            result["status"] = "skipped"
+            result["reason"] = "template already exists"
+        elif name in existing:
+            updates.append({**row, "id": existing[name], "updated_at": datetime.utcnow()})
+            result["status"] = "updated"
+        else:
+            inserts.append(row)
+            result["status"] = "imported"
+        seen.add(name)
+
+    if inserts:
+        await db.execute(insert(PromptTemplate), inserts)
+    if updates:
+        await db.execute(update(PromptTemplate), updates)
+
+    changed = [row["id"] for row in updates if row["template_content"] != contents[row["name"]]]
+    propagation_job_ids: List[str] = []
+    if changed:
+        def propagate(session) -> None:
+            for template_id in changed:
+                job = prompt_propagator.on_template_updated(template_id, {"template_content"})
+                if job:
+                    propagation_job_ids.append(job["id"])
+
+        # Only after the commit, so jobs read the imported content (and never run for a rollback)
+        event.listen(db.sync_session, "after_commit", propagate, once=True)
+
+    return {
+        "imported_count": len(inserts),
+        "updated_count": len(updates),
+        "propagation_job_ids": propagation_job_ids,
+        "skipped_count": sum(1 for result in parsed if result["status"] == "skipped"),
+        "errors": [f"Error importing {result['file']}: {result['error']}" for result in parsed if result["status"] == "error"],
+        "results": parsed
+    }
@@ -1,19 +1,42 @@
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
 from typing import List, Optional
 import asyncio
+import json
 from loguru import logger
 from datetime import datetime
 
 from ..database import get_db, Agent, RetellAgent, PhoneNumber
 from ..services.retell_service import retell_service
-from ..schemas import AgentCreate, AgentUpdate, AgentResponse, LegacyAgentResponse, TestCallRequest
+from ..services.agent_push import agent_push_tracker
+from ..schemas import AgentCreate, AgentUpdate, AgentResponse, LegacyAgentResponse, TestCallRequest, RetellAgentBulkUpdate
 from ..prompts.prompt_manager import prompt_manager
+from ..prompts.suggestions import prompt_suggester
 import uuid
 
 router = APIRouter()
 
+# Agent schema attribute -> RetellAI update-agent field
+RETELL_AGENT_FIELDS = {
+    "name": "agent_name",
+    "prompt": "general_prompt",
+    "voice_id": "voice_id",
+    "llm_websocket_url": "llm_websocket_url",
+    "boosted_keywords": "boosted_keywords",
+    "tools": "general_tools",
+}
+
+def _retell_agent_fields(agent_data) -> dict:
+    """RetellAI fields for the values set on an AgentCreate/AgentUpdate"""
+    fields = {}
+    for attribute, retell_field in RETELL_AGENT_FIELDS.items():
+        value = getattr(agent_data, attribute, None)
+        if value is not None:
+            fields[retell_field] = value
+    return fields
+
 @router.post("/", response_model=AgentResponse, status_code=201)
 async def create_agent(
     agent_data: AgentCreate,
@@ -42,6 +65,8 @@ async def create_agent(
             boosted_keywords=agent_data.boosted_keywords,
             tools=agent_data.tools,
         )
+        # Baseline for change detection on later saves
+        await agent_push_tracker.record(db_agent.retell_agent_id, _retell_agent_fields(agent_data))
         
         db.add(db_agent)
         await db.commit()
@@ -193,6 +218,37 @@ async def delete_onboarding_agent(
         logger.error(f"Error deleting onboarding agent: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/retell/bulk-update")
+async def bulk_update_retell_agents(update_request: RetellAgentBulkUpdate, stream: bool = False):
+    """Apply the same field update to many RetellAI agents (all agents by default)"""
+    if not update_request.fields:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    
+    if stream:
+        async def progress():
+            try:
+                async for event in retell_service.iter_bulk_update_agents(
+                    update_request.fields,
+                    agent_ids=update_request.agent_ids,
+                    concurrency=update_request.concurrency
+                ):
+                    yield json.dumps(event) + "\n"
+            except Exception as e:
+                logger.error(f"Error bulk updating RetellAI agents: {str(e)}")
+                yield json.dumps({"event": "error", "error": str(e)}) + "\n"
+        
+        return StreamingResponse(progress(), media_type="application/x-ndjson")
+    
+    try:
+        return await retell_service.bulk_update_agents(
+            update_request.fields,
+            agent_ids=update_request.agent_ids,
+            concurrency=update_request.concurrency
+        )
+    except Exception as e:
+        logger.error(f"Error bulk updating RetellAI agents: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/", response_model=List[LegacyAgentResponse])
 async def list_agents(
     skip: int = 0,
@@ -269,11 +325,12 @@ async def get_agent(agent_id: int, db: AsyncSession = Depends(get_db)):
 
 @router.put("/{agent_id}", response_model=AgentResponse)
 async def update_agent(
-    agent_id: int,
+    agent_id: str,
     agent_data: AgentUpdate,
+    force_push: bool = False,
     db: AsyncSession = Depends(get_db)
 ):
-    """Update an agent"""
+    """Update an agent (only fields changed since the last push are sent to RetellAI)"""
     try:
         # Get existing agent
         query = select(RetellAgent).where(RetellAgent.id == agent_id)
@@ -283,24 +340,11 @@ async def update_agent(
         if not agent:
             raise HTTPException(status_code=404, detail="Agent not found")
         
-        # Prepare update data for RetellAI
-        retell_update_data = {}
-        if agent_data.name is not None:
-            retell_update_data["agent_name"] = agent_data.name
-        if agent_data.prompt is not None:
-            retell_update_data["general_prompt"] = agent_data.prompt
-        if agent_data.voice_id is not None:
-            retell_update_data["voice_id"] = agent_data.voice_id
-        if agent_data.llm_websocket_url is not None:
-            retell_update_data["llm_websocket_url"] = agent_data.llm_websocket_url
-        if agent_data.boosted_keywords is not None:
-            retell_update_data["boosted_keywords"] = agent_data.boosted_keywords
-        if agent_data.tools is not None:
-            retell_update_data["general_tools"] = agent_data.tools
-        
-        # Update in RetellAI
+        # Update in RetellAI, skipping fields unchanged since the last push
+        retell_update_data = _retell_agent_fields(agent_data)
         if retell_update_data:
-            await retell_service.update_agent(agent.retell_agent_id, retell_update_data)
+            push = await agent_push_tracker.push(agent.retell_agent_id, retell_update_data, force=force_push)
+            logger.info(f"RetellAI push for agent {agent_id}: {push}")
         
         # Update in database
         update_data = agent_data.model_dump(exclude_unset=True)
@@ -409,7 +453,7 @@ async def test_agent_call(
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/{agent_id}/sync-retell")
-async def sync_agent_with_retell(agent_id: int, db: AsyncSession = Depends(get_db)):
+async def sync_agent_with_retell(agent_id: str, db: AsyncSession = Depends(get_db)):
     """Sync agent data with RetellAI (useful for observability)"""
     try:
         # Get local agent
@@ -420,9 +464,19 @@ async def sync_agent_with_retell(agent_id: int, db: AsyncSession = Depends(get_d
         if not agent:
             raise HTTPException(status_code=404, detail="Agent not found")
         
-        # Get agent data from RetellAI
+        # Get agent data from RetellAI (bypassing the read cache - this is a sync)
+        retell_service.invalidate_cache("get_agent", agent.retell_agent_id)
         retell_agent_data = await retell_service.get_agent(agent.retell_agent_id)
         
+        # RetellAI's current values become the pushed baseline, so saving a value edited
+        # away in the RetellAI dashboard is pushed instead of skipped as unchanged
+        pulled = {
+            field: retell_agent_data[field]
+            for field in RETELL_AGENT_FIELDS.values() if field in retell_agent_data
+        }
+        if pulled:
+            await agent_push_tracker.record(agent.retell_agent_id, pulled)
+        
         return {
             "local_agent": {
                 "id": agent.id,
@@ -462,7 +516,8 @@ async def save_agent_prompt_as_template(
             prompt_name = agent.name.lower().replace(" ", "_").replace("-", "_")
         
         # Create prompt template
-        template_name = prompt_manager.create_from_retell_agent(
+        template_name = await asyncio.to_thread(
+            prompt_manager.create_from_retell_agent,
             agent_name=agent.name,
             retell_prompt=agent.prompt,
             description=f"Saved from agent '{agent.name}'",
@@ -483,8 +538,12 @@ async def save_agent_prompt_as_template(
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/{agent_id}/prompt-suggestions")
-async def get_prompt_suggestions(agent_id: int, db: AsyncSession = Depends(get_db)):
-    """Get prompt template suggestions for an agent"""
+async def get_prompt_suggestions(
+    agent_id: str,
+    limit: int = Query(5, ge=1, le=50),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get prompt template suggestions for an agent, ranked against its name, prompt and call topics"""
     try:
         # Get agent
         query = select(RetellAgent).where(RetellAgent.id == agent_id)
@@ -494,42 +553,24 @@ async def get_prompt_suggestions(agent_id: int, db: AsyncSession = Depends(get_d
         if not agent:
             raise HTTPException(status_code=404, detail="Agent not found")
         
-        # Get all available prompts
-        all_prompts = prompt_manager.list_prompts()
+        topics = await prompt_suggester.call_topics(db, agent.id)
+        ranked = await prompt_suggester.suggest(agent.name, agent.prompt or "", topics, limit=limit)
         
         # Categorize suggestions
         suggestions = {
-            "recommended": [],
+            "recommended": ranked["results"],
             "by_category": {}
         }
-        
-        # Simple recommendation based on agent name keywords
-        agent_name_lower = agent.name.lower()
-        keywords = ["support", "sales", "appointment", "schedule", "customer", "service"]
-        
-        for prompt in all_prompts:
-            category = prompt.get("category", "general")
-            
-            if category not in suggestions["by_category"]:
-                suggestions["by_category"][category] = []
-            
-            suggestions["by_category"][category].append(prompt)
-            
-            # Simple keyword matching for recommendations
-            prompt_name_lower = prompt.get("name", "").lower()
-            prompt_title_lower = prompt.get("title", "").lower()
-            
-            for keyword in keywords:
-                if (keyword in agent_name_lower and 
-                    (keyword in prompt_name_lower or keyword in prompt_title_lower)):
-                    if prompt not in suggestions["recommended"]:
-                        suggestions["recommended"].append(prompt)
+        for prompt in prompt_manager.list_prompts():
+            suggestions["by_category"].setdefault(prompt.get("category", "general"), []).append(prompt)
         
         return {
             "agent_name": agent.name,
-            "current_prompt_length": len(agent.prompt),
+            "current_prompt_length": len(agent.prompt or ""),
+            "call_topics_used": len(topics),
             "suggestions": suggestions,
-            "total_templates": len(all_prompts)
+            "total_templates": len(prompt_suggester.index),
+            "took_ms": ranked["took_ms"]
         }
         
     except HTTPException:
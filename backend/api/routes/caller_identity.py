@@ -0,0 +1,26 @@
+from fastapi import APIRouter, HTTPException
+from loguru import logger
+
+from ..services.caller_identity import caller_identity
+
+router = APIRouter()
+
+@router.get("/resolve/{phone_number}")
+async def resolve_caller(phone_number: str):
+    """Resolve a caller's phone number to a SyncroMSP customer and/or ITGlue contact"""
+    return caller_identity.resolve(phone_number)
+
+@router.get("/status")
+async def get_caller_identity_status():
+    """Get caller identity index statistics"""
+    return caller_identity.status()
+
+@router.post("/refresh")
+async def refresh_caller_identity(full: bool = False):
+    """Refresh ITGlue contacts in the caller identity index now (Syncro customers follow the customer mirror)"""
+    try:
+        result = await caller_identity.refresh_itglue(full=full)
+        return {"success": True, **result}
+    except Exception as e:
+        logger.error(f"Error refreshing caller identity index: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
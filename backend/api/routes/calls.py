@@ -9,6 +9,7 @@ from loguru import logger
 
 from ..database import get_db, PhoneCall, Call, CallEvent, RetellAgent, PhoneNumber
 from ..services.retell_service import retell_service
+from ..services.caller_identity import caller_identity
 from ..schemas import CallCreate, CallResponse, RetellWebhookEvent
 
 router = APIRouter()
@@ -483,6 +484,11 @@ async def retell_webhook(request: Request, db: AsyncSession = Depends(get_db)):
             
             # Handle different event types
             if event_type == "call_started":
+                # Identify who is on the line from the local phone number index
+                caller = caller_identity.resolve_call(webhook_data.get("data", {}))
+                if caller:
+                    call_event.data = {**webhook_data, "caller_identity": caller}
+                
                 await db.execute(
                     update(Call)
                     .where(Call.id == call.id)
@@ -498,6 +504,7 @@ async def retell_webhook(request: Request, db: AsyncSession = Depends(get_db)):
                         "type": "call_started",
                         "call_id": call_id,
                         "data": webhook_data.get("data", {}),
+                        "caller_identity": caller,
                         "timestamp": datetime.utcnow().isoformat()
                     }),
                     call.retell_call_id
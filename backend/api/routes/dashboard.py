@@ -1,13 +1,17 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, desc
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 from loguru import logger
+import json
 
 from ..database import get_db, Agent, PhoneNumber, PhoneCall, Conversation
 from ..services.retell_service import retell_service
-from ..services.syncro_service import syncro_service
+from ..services.agent_push import agent_push_tracker
+from ..services.syncro_service import syncro_service, PROBE
+from ..services.metrics import upstream_metrics
 
 router = APIRouter()
 
@@ -163,7 +167,8 @@ async def health_check():
         
         # SyncroMSP health
         try:
-            tickets = await syncro_service.get_tickets(limit=1)
+            with syncro_service.priority(PROBE):
+                tickets = await syncro_service.get_tickets(limit=1)
             health_status["syncro_msp"] = "healthy"
             health_status["details"]["syncro_tickets_accessible"] = len(tickets) > 0
         except Exception as e:
@@ -193,6 +198,54 @@ async def health_check():
         logger.error(f"Error in health check: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/retell-cache")
+async def get_retell_cache_stats():
+    """Get RetellAI read cache statistics"""
+    return retell_service.get_cache_stats()
+
+@router.get("/retell-push-stats")
+async def get_retell_push_stats():
+    """Get RetellAI agent push statistics (how many upstream writes change detection avoided)"""
+    return agent_push_tracker.stats()
+
+@router.post("/retell-cache/invalidate")
+async def invalidate_retell_cache(method: str = None):
+    """Invalidate the RetellAI read cache (all entries or a single method)"""
+    try:
+        if method and method not in retell_service.cache_ttls:
+            raise HTTPException(status_code=400, detail=f"Unknown cached method: {method}")
+
+        retell_service.invalidate_cache(method)
+        return {"success": True, "invalidated": method or "all"}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error invalidating RetellAI cache: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/request-coalescing")
+async def get_request_coalescing_stats():
+    """Get single-flight statistics (how many upstream calls were shared) per service"""
+    stats = upstream_metrics.coalescing()
+    
+    return {
+        "services": stats,
+        "total_calls": sum(s["calls"] for s in stats),
+        "total_coalesced": sum(s["coalesced"] for s in stats)
+    }
+
+@router.get("/upstream-metrics")
+async def get_upstream_metrics(service: Optional[str] = None):
+    """Get per-endpoint latency, status codes, retries and payload sizes for upstream APIs"""
+    return upstream_metrics.snapshot(service)
+
+@router.post("/upstream-metrics/reset")
+async def reset_upstream_metrics():
+    """Reset upstream API metrics"""
+    upstream_metrics.reset()
+    return {"success": True, "message": "Upstream metrics reset"}
+
 @router.get("/call-activity")
 async def get_call_activity(db: AsyncSession = Depends(get_db)):
     """Get call activity metrics"""
@@ -278,47 +331,76 @@ async def get_ngrok_status():
         logger.warning(f"Could not fetch ngrok status: {str(e)}")
         return {"tunnels": []}
 
+async def _get_ngrok_webhook_url() -> Dict[str, str]:
+    """Resolve the agent-level webhook URL from the current ngrok tunnel for port 8000"""
+    import httpx
+    async with httpx.AsyncClient() as client:
+        response = await client.get("http://localhost:4040/api/tunnels", timeout=5.0)
+        if response.status_code != 200:
+            raise HTTPException(status_code=400, detail="Could not fetch ngrok tunnels")
+        
+        tunnels_data = response.json()
+        tunnels = tunnels_data.get('tunnels', [])
+        
+        # Find backend tunnel (port 8000)
+        backend_tunnel = None
+        for tunnel in tunnels:
+            if (tunnel.get('proto') == 'https' and 
+                tunnel.get('config', {}).get('addr', '').endswith(':8000')):
+                backend_tunnel = tunnel
+                break
+        
+        if not backend_tunnel:
+            raise HTTPException(status_code=400, detail="No ngrok tunnel found for port 8000")
+        
+        ngrok_url = backend_tunnel['public_url']
+        return {
+            "ngrok_url": ngrok_url,
+            "webhook_url": f"{ngrok_url}/api/v1/retellai/agent-level-webhook"
+        }
+
 @router.post("/update-retellai-webhook")
 async def update_retellai_webhook():
     """Automatically update RetellAI webhook URLs with current ngrok tunnel"""
     try:
-        # Get current ngrok tunnel URL
-        import httpx
-        async with httpx.AsyncClient() as client:
-            response = await client.get("http://localhost:4040/api/tunnels", timeout=5.0)
-            if response.status_code != 200:
-                raise HTTPException(status_code=400, detail="Could not fetch ngrok tunnels")
-            
-            tunnels_data = response.json()
-            tunnels = tunnels_data.get('tunnels', [])
-            
-            # Find backend tunnel (port 8000)
-            backend_tunnel = None
-            for tunnel in tunnels:
-                if (tunnel.get('proto') == 'https' and 
-                    tunnel.get('config', {}).get('addr', '').endswith(':8000')):
-                    backend_tunnel = tunnel
-                    break
-            
-            if not backend_tunnel:
-                raise HTTPException(status_code=400, detail="No ngrok tunnel found for port 8000")
-            
-            ngrok_url = backend_tunnel['public_url']
-            webhook_url = f"{ngrok_url}/api/v1/retellai/agent-level-webhook"
-            
-            # Update all RetellAI agents with new webhook URL
-            from ..services.retell_service import retell_service
-            result = await retell_service.update_all_agent_webhooks(webhook_url)
-            
-            return {
-                "success": True,
-                "ngrok_url": ngrok_url,
-                "webhook_url": webhook_url,
-                "update_result": result
-            }
+        urls = await _get_ngrok_webhook_url()
+        
+        # Update all RetellAI agents with new webhook URL
+        result = await retell_service.update_all_agent_webhooks(urls["webhook_url"])
+        
+        return {
+            "success": True,
+            "ngrok_url": urls["ngrok_url"],
+            "webhook_url": urls["webhook_url"],
+            "update_result": result
+        }
             
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error updating RetellAI webhook: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to update webhook: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to update webhook: {str(e)}")
+
+@router.post("/update-retellai-webhook/stream")
+async def update_retellai_webhook_stream():
+    """Update RetellAI webhook URLs with the current ngrok tunnel, streaming progress as NDJSON"""
+    try:
+        urls = await _get_ngrok_webhook_url()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error resolving ngrok webhook URL: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to update webhook: {str(e)}")
+    
+    async def progress():
+        yield json.dumps({"event": "resolved", **urls}) + "\n"
+        try:
+            async for event in retell_service.iter_bulk_update_agents(
+                {"agent_level_webhook_url": urls["webhook_url"]}
+            ):
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            logger.error(f"Error updating RetellAI webhook: {str(e)}")
+            yield json.dumps({"event": "error", "error": str(e)}) + "\n"
+    
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
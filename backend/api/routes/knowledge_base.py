@@ -2,59 +2,33 @@ from fastapi import APIRouter, HTTPException, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+import time
 from loguru import logger
 
 from ..database import get_db
 from ..services.itglue_service import itglue_service
+from ..services.itglue_mirror import itglue_mirror
+from ..services.knowledge_index import knowledge_search, RESULT_TYPES
+from ..services.knowledge_retrieval import knowledge_retriever
+from ..services.knowledge_stats import knowledge_stats
+from ..services.caller_identity import caller_identity
 
 router = APIRouter()
 
 @router.get("/stats")
-async def get_knowledge_base_stats():
-    """Get knowledge base statistics"""
+async def get_knowledge_base_stats(refresh: bool = False):
+    """Get knowledge base statistics (cached; ?refresh=true recomputes now)"""
     try:
-        # For now, return mock data - in production this would aggregate real data
-        stats = {
-            "total_articles": 0,
-            "total_categories": 0,
-            "recent_updates": 0,
-            "configurations": 0,
-            "passwords": 0,
-            "contacts": 0,
-            "last_sync": None
-        }
-        
-        # Try to get real data from ITGlue service
-        try:
-            articles = await itglue_service.get_articles(limit=1)
-            stats["total_articles"] = len(articles) if articles else 0
-            
-            configurations = await itglue_service.get_configurations(limit=1) 
-            stats["configurations"] = len(configurations) if configurations else 0
-            
-            passwords = await itglue_service.get_passwords(limit=1)
-            stats["passwords"] = len(passwords) if passwords else 0
-            
-            contacts = await itglue_service.get_contacts(limit=1)
-            stats["contacts"] = len(contacts) if contacts else 0
-            
-        except Exception as e:
-            logger.warning(f"Could not fetch real ITGlue stats: {e}")
-            # Use mock data as fallback
-            stats.update({
-                "total_articles": 156,
-                "total_categories": 12,
-                "recent_updates": 8,
-                "configurations": 89,
-                "passwords": 45,
-                "contacts": 78
-            })
-        
-        return stats
-        
+        if refresh:
+            return await knowledge_stats.refresh()
+        return await knowledge_stats.get()
     except Exception as e:
-        logger.error(f"Error getting knowledge base stats: {e}")
-        raise HTTPException(status_code=500, detail="Failed to get knowledge base statistics")
+        logger.warning(f"Could not compute knowledge base stats: {e}")
+        # Last known counts beat made-up ones; with none, say so
+        cached = knowledge_stats.cached()
+        if cached is not None:
+            return cached
+        raise HTTPException(status_code=503, detail=f"Knowledge base stats unavailable: {str(e)}")
 
 @router.get("/categories")
 async def get_categories():
@@ -82,9 +56,10 @@ async def get_articles(
     category: Optional[str] = None,
     organization_id: Optional[int] = None,
     limit: Optional[int] = 100,
-    skip: Optional[int] = 0
+    skip: Optional[int] = 0,
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get knowledge base articles with optional filtering"""
+    """Get knowledge base articles (from the local ITGlue mirror once synced) with optional filtering"""
     try:
         filters = {}
         if search:
@@ -94,6 +69,11 @@ async def get_articles(
         if organization_id:
             filters["organization_id"] = organization_id
             
+        if await itglue_mirror.is_ready(db, "articles"):
+            return await itglue_mirror.list_records(
+                db, "articles", search=search, organization_id=organization_id, limit=limit, skip=skip
+            )
+        
         articles = await itglue_service.get_articles(
             limit=limit,
             skip=skip,
@@ -147,10 +127,12 @@ async def get_articles(
         ]
 
 @router.get("/articles/{article_id}")
-async def get_article(article_id: int):
-    """Get a specific article by ID"""
+async def get_article(article_id: int, db: AsyncSession = Depends(get_db)):
+    """Get a specific article by ID (local mirror first, then ITGlue)"""
     try:
-        article = await itglue_service.get_article(article_id)
+        article = await itglue_mirror.get_record(db, "articles", article_id)
+        if article is None:
+            article = await itglue_service.get_article(article_id)
         if not article:
             raise HTTPException(status_code=404, detail="Article not found")
         return article
@@ -166,7 +148,8 @@ async def get_configurations(
     organization_id: Optional[int] = None,
     configuration_type: Optional[str] = None,
     limit: Optional[int] = 100,
-    skip: Optional[int] = 0
+    skip: Optional[int] = 0,
+    db: AsyncSession = Depends(get_db)
 ):
     """Get configuration items"""
     try:
@@ -178,6 +161,11 @@ async def get_configurations(
         if configuration_type:
             filters["configuration_type"] = configuration_type
             
+        if await itglue_mirror.is_ready(db, "configurations"):
+            return await itglue_mirror.list_records(
+                db, "configurations", search=search, organization_id=organization_id, limit=limit, skip=skip
+            )
+        
         configurations = await itglue_service.get_configurations(
             limit=limit,
             skip=skip,
@@ -220,7 +208,8 @@ async def get_passwords(
     search: Optional[str] = None,
     organization_id: Optional[int] = None,
     limit: Optional[int] = 100,
-    skip: Optional[int] = 0
+    skip: Optional[int] = 0,
+    db: AsyncSession = Depends(get_db)
 ):
     """Get password entries (sensitive - returns limited info)"""
     try:
@@ -230,6 +219,11 @@ async def get_passwords(
         if organization_id:
             filters["organization_id"] = organization_id
             
+        if await itglue_mirror.is_ready(db, "passwords"):
+            return await itglue_mirror.list_records(
+                db, "passwords", search=search, organization_id=organization_id, limit=limit, skip=skip
+            )
+        
         passwords = await itglue_service.get_passwords(
             limit=limit,
             skip=skip,
@@ -268,7 +262,8 @@ async def get_contacts(
     search: Optional[str] = None,
     organization_id: Optional[int] = None,
     limit: Optional[int] = 100,
-    skip: Optional[int] = 0
+    skip: Optional[int] = 0,
+    db: AsyncSession = Depends(get_db)
 ):
     """Get contact directory"""
     try:
@@ -278,6 +273,11 @@ async def get_contacts(
         if organization_id:
             filters["organization_id"] = organization_id
             
+        if await itglue_mirror.is_ready(db, "contacts"):
+            return await itglue_mirror.list_records(
+                db, "contacts", search=search, organization_id=organization_id, limit=limit, skip=skip
+            )
+        
         contacts = await itglue_service.get_contacts(
             limit=limit,
             skip=skip,
@@ -314,60 +314,86 @@ async def get_contacts(
         ]
 
 @router.post("/sync/itglue")
-async def sync_with_itglue():
-    """Trigger a sync with ITGlue to refresh all data"""
+async def sync_with_itglue(full: bool = False):
+    """Sync articles, configurations, contacts and password metadata from ITGlue into the local mirror"""
+    if itglue_service.mock_enabled:
+        # Syncing would fill the mirror with sample records that are then served as real
+        raise HTTPException(status_code=400, detail="ITGlue is not configured (ITGLUE_API_KEY is not set)")
     try:
-        sync_results = await itglue_service.sync_all_data()
+        result = await itglue_mirror.sync(full=full)
         
         return {
-            "status": "success",
-            "message": "ITGlue sync completed successfully",
+            "status": "success" if result["status"] == "completed" else result["status"],
+            "message": f"ITGlue {result['mode']} sync {result['status']}",
             "sync_timestamp": datetime.utcnow().isoformat(),
-            "results": sync_results
+            "results": {
+                f"{resource}_synced": outcome.get("upserted", 0)
+                for resource, outcome in result["results"].items()
+            },
+            "run": result
         }
         
     except Exception as e:
         logger.error(f"Error syncing with ITGlue: {e}")
-        # Return mock sync result
-        return {
-            "status": "success",
-            "message": "ITGlue sync completed (mock mode)",
-            "sync_timestamp": datetime.utcnow().isoformat(),
-            "results": {
-                "articles_synced": 156,
-                "configurations_synced": 89,
-                "passwords_synced": 45,
-                "contacts_synced": 78,
-                "categories_updated": 12
-            }
-        }
+        raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/sync/status")
-async def get_sync_status():
-    """Get the status of the last ITGlue sync"""
+async def get_sync_status(db: AsyncSession = Depends(get_db)):
+    """Get the status of the last ITGlue sync from the recorded sync runs"""
     try:
-        status = await itglue_service.get_sync_status()
-        return status
+        return await itglue_mirror.sync_status(db)
     except Exception as e:
         logger.error(f"Error getting sync status: {e}")
-        # Return mock status
-        return {
-            "last_sync": "2025-01-15T10:30:00Z",
-            "status": "completed",
-            "items_synced": 368,
-            "errors": 0,
-            "next_scheduled_sync": "2025-01-16T10:30:00Z"
-        }
+        raise HTTPException(status_code=500, detail="Failed to get sync status")
+
+@router.get("/search/status")
+async def get_search_index_status():
+    """Get the state of the local knowledge base search index"""
+    return knowledge_search.status()
 
 @router.get("/search")
 async def global_search(
     q: str = Query(..., description="Search query"),
     content_type: Optional[str] = Query(None, description="Filter by content type: articles, configurations, passwords, contacts"),
     organization_id: Optional[int] = Query(None, description="Filter by organization ID"),
-    limit: Optional[int] = Query(50, description="Maximum results to return")
+    limit: Optional[int] = Query(50, description="Maximum results to return"),
+    title_boost: Optional[float] = Query(None, ge=0, description="Override the title field boost"),
+    body_boost: Optional[float] = Query(None, ge=0, description="Override the body field boost")
 ):
-    """Perform a global search across all knowledge base content"""
+    """Perform a BM25-ranked search across all knowledge base content (local index over the ITGlue mirror)"""
     try:
+        if knowledge_search.ready:
+            # Accept singular or plural content types
+            resource = content_type
+            if content_type and content_type not in RESULT_TYPES:
+                resource = next((key for key, value in RESULT_TYPES.items() if value == content_type), None)
+                if resource is None:
+                    raise HTTPException(status_code=400, detail=f"Unknown content_type: {content_type}")
+            
+            boosts = {}
+            if title_boost is not None:
+                boosts["title"] = title_boost
+            if body_boost is not None:
+                boosts["body"] = body_boost
+            
+            started = time.perf_counter()
+            search_results = knowledge_search.search(
+                q,
+                content_type=resource,
+                organization_id=organization_id,
+                limit=limit,
+                boosts=boosts
+            )
+            
+            return {
+                "query": q,
+                "total_results": len(search_results),
+                "results": search_results,
+                "source": "local_index",
+                "took_ms": round((time.perf_counter() - started) * 1000, 3)
+            }
+        
+        # Index not built yet (mirror empty or still loading) - search ITGlue directly
         search_results = await itglue_service.global_search(
             query=q,
             content_type=content_type,
@@ -378,9 +404,12 @@ async def global_search(
         return {
             "query": q,
             "total_results": len(search_results),
-            "results": search_results
+            "results": search_results,
+            "source": "itglue_api"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error performing global search: {e}")
         # Return mock search results
@@ -413,4 +442,36 @@ async def global_search(
                     "url": "/knowledge-base/contacts/1"
                 }
             ]
-        } 
\ No newline at end of file
+        } 
+
+@router.post("/retrieve")
+async def retrieve_for_agent(request: dict):
+    """Top-k knowledge passages for a RetellAI agent tool call (in-memory only, never calls ITGlue).
+    
+    Accepts `{"query", "organization_id", "top_k"}` or RetellAI's `{"args": {...}, "call": {...}}`;
+    without an organization_id the caller's ITGlue organization is used when the number is known.
+    When neither gives an organization, only articles are searched: configurations and contacts
+    from other organizations must never be read out to an unverified caller.
+    """
+    args = request.get("args") or request
+    query = str(args.get("query") or "").strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="query is required")
+    
+    organization_id = args.get("organization_id")
+    if organization_id is None and request.get("call"):
+        identity = caller_identity.resolve_call(request["call"])
+        contact = identity.get("contact") if identity else None
+        organization_id = contact.get("organization_id") if contact else None
+    
+    try:
+        top_k = int(args["top_k"]) if args.get("top_k") else None
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="top_k must be an integer")
+    
+    return knowledge_retriever.retrieve(query, organization_id=organization_id, top_k=top_k)
+
+@router.get("/retrieve/status")
+async def get_retrieval_status():
+    """Get passage index size and recent retrieval latency against the budget"""
+    return knowledge_retriever.status()
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, func, and_, or_
+from sqlalchemy import select, insert, update, delete, func, and_, or_, text
 from sqlalchemy.orm import selectinload
 from typing import List, Optional, Dict, Any
+import asyncio
 import json
 import os
+import tarfile
+import zipfile
 from pathlib import Path
 from datetime import datetime
 from loguru import logger
@@ -16,9 +19,45 @@ from ..schemas import (
     AgentPromptAssignmentCreate, AgentPromptAssignmentResponse,
     BulkPromptAssignmentCreate, PromptTemplateImportRequest
 )
+from ..prompts.template_compiler import template_compiler
+from ..prompts.propagation import prompt_propagator
+from ..prompts.catalog_cache import prompt_catalog_cache
+from ..prompts.template_import import (
+    MAX_ARCHIVE_BYTES, import_template_rows, parse_template_archive, parse_template_dir
+)
 
 router = APIRouter()
 
+# Whether pg_trgm is installed (scripts/add_prompt_search_indexes.py); checked once per process
+_pg_trgm: Dict[str, bool] = {}
+
+async def _text_search(db: AsyncSession, search: str, *columns):
+    """ILIKE match across columns (served by pg_trgm GIN indexes) and, with pg_trgm, a relevance rank"""
+    if "installed" not in _pg_trgm:
+        result = await db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"))
+        _pg_trgm["installed"] = result.first() is not None
+    
+    condition = or_(*(column.ilike(f"%{search}%") for column in columns))
+    if not _pg_trgm["installed"]:
+        return condition, None
+    # Best word similarity of the term to any column (NULL descriptions are ignored by GREATEST)
+    rank = func.greatest(*(func.word_similarity(search, column) for column in columns))
+    return condition, rank
+
+
+def _with_scenario_counts(query):
+    """Add each template's active scenario count as a column, from one grouped subquery"""
+    counts = (
+        select(PromptScenario.template_id, func.count(PromptScenario.id).label("scenario_count"))
+        .where(PromptScenario.is_active == True)
+        .group_by(PromptScenario.template_id)
+        .subquery()
+    )
+    return (
+        query.add_columns(func.coalesce(counts.c.scenario_count, 0))
+        .outerjoin(counts, counts.c.template_id == PromptTemplate.id)
+    )
+
 # Template Management
 @router.get("/templates", response_model=List[PromptTemplateResponse])
 async def list_templates(
@@ -31,60 +70,55 @@ async def list_templates(
 ):
     """List all prompt templates with optional filtering"""
     try:
-        query = select(PromptTemplate)
-        
-        # Apply filters
-        conditions = []
-        if category:
-            conditions.append(PromptTemplate.category == category)
-        if is_active is not None:
-            conditions.append(PromptTemplate.is_active == is_active)
-        if search:
-            conditions.append(or_(
-                PromptTemplate.name.ilike(f"%{search}%"),
-                PromptTemplate.title.ilike(f"%{search}%"),
-                PromptTemplate.description.ilike(f"%{search}%")
-            ))
-        
-        if conditions:
-            query = query.where(and_(*conditions))
-        
-        query = query.offset(skip).limit(limit).order_by(PromptTemplate.created_at.desc())
-        
-        result = await db.execute(query)
-        templates = result.scalars().all()
-        
-        # Add scenario count for each template
-        response_templates = []
-        for template in templates:
-            scenario_count_query = select(func.count(PromptScenario.id)).where(
-                and_(
-                    PromptScenario.template_id == template.id,
-                    PromptScenario.is_active == True
+        async def load():
+            query = _with_scenario_counts(select(PromptTemplate))
+            
+            # Apply filters
+            conditions = []
+            if category:
+                conditions.append(PromptTemplate.category == category)
+            if is_active is not None:
+                conditions.append(PromptTemplate.is_active == is_active)
+            rank = None
+            if search:
+                condition, rank = await _text_search(
+                    db, search, PromptTemplate.name, PromptTemplate.title, PromptTemplate.description
                 )
-            )
-            scenario_count_result = await db.execute(scenario_count_query)
-            scenario_count = scenario_count_result.scalar() or 0
+                conditions.append(condition)
             
-            template_dict = {
-                "id": str(template.id),
-                "name": template.name,
-                "title": template.title,
-                "description": template.description,
-                "category": template.category,
-                "template_content": template.template_content,
-                "variables": template.variables,
-                "tools": template.tools,
-                "is_active": template.is_active,
-                "is_system_template": template.is_system_template,
-                "created_at": template.created_at,
-                "updated_at": template.updated_at,
-                "created_by": template.created_by,
-                "scenario_count": scenario_count
-            }
-            response_templates.append(template_dict)
+            if conditions:
+                query = query.where(and_(*conditions))
+            
+            ordering = [PromptTemplate.created_at.desc()]
+            if rank is not None:
+                ordering.insert(0, rank.desc())
+            query = query.offset(skip).limit(limit).order_by(*ordering)
+            
+            result = await db.execute(query)
+            
+            response_templates = []
+            for template, scenario_count in result.all():
+                template_dict = {
+                    "id": str(template.id),
+                    "name": template.name,
+                    "title": template.title,
+                    "description": template.description,
+                    "category": template.category,
+                    "template_content": template.template_content,
+                    "variables": template.variables,
+                    "tools": template.tools,
+                    "is_active": template.is_active,
+                    "is_system_template": template.is_system_template,
+                    "created_at": template.created_at,
+                    "updated_at": template.updated_at,
+                    "created_by": template.created_by,
+                    "scenario_count": scenario_count
+                }
+                response_templates.append(template_dict)
+            
+            return response_templates
         
-        return response_templates
+        return await prompt_catalog_cache.read(("templates", category, is_active, search, skip, limit), load)
         
     except Exception as e:
         logger.error(f"Error listing templates: {str(e)}")
@@ -116,7 +150,7 @@ async def create_template(
         )
         
         db.add(db_template)
-        await db.commit()
+        await prompt_catalog_cache.commit(db)
         await db.refresh(db_template)
         
         logger.info(f"Created template {db_template.id}: {db_template.name}")
@@ -149,39 +183,35 @@ async def create_template(
 async def get_template(template_id: str, db: AsyncSession = Depends(get_db)):
     """Get a specific template"""
     try:
-        query = select(PromptTemplate).where(PromptTemplate.id == template_id)
-        result = await db.execute(query)
-        template = result.scalar_one_or_none()
+        async def load():
+            query = _with_scenario_counts(select(PromptTemplate)).where(PromptTemplate.id == template_id)
+            result = await db.execute(query)
+            row = result.first()
+            if not row:
+                return None
+            template, scenario_count = row
+            
+            return {
+                "id": str(template.id),
+                "name": template.name,
+                "title": template.title,
+                "description": template.description,
+                "category": template.category,
+                "template_content": template.template_content,
+                "variables": template.variables,
+                "tools": template.tools,
+                "is_active": template.is_active,
+                "is_system_template": template.is_system_template,
+                "created_at": template.created_at,
+                "updated_at": template.updated_at,
+                "created_by": template.created_by,
+                "scenario_count": scenario_count
+            }
         
-        if not template:
+        template = await prompt_catalog_cache.read(("template", template_id), load)
+        if template is None:
             raise HTTPException(status_code=404, detail="Template not found")
-        
-        # Get scenario count
-        scenario_count_query = select(func.count(PromptScenario.id)).where(
-            and_(
-                PromptScenario.template_id == template.id,
-                PromptScenario.is_active == True
-            )
-        )
-        scenario_count_result = await db.execute(scenario_count_query)
-        scenario_count = scenario_count_result.scalar() or 0
-        
-        return {
-            "id": str(template.id),
-            "name": template.name,
-            "title": template.title,
-            "description": template.description,
-            "category": template.category,
-            "template_content": template.template_content,
-            "variables": template.variables,
-            "tools": template.tools,
-            "is_active": template.is_active,
-            "is_system_template": template.is_system_template,
-            "created_at": template.created_at,
-            "updated_at": template.updated_at,
-            "created_by": template.created_by,
-            "scenario_count": scenario_count
-        }
+        return template
         
     except HTTPException:
         raise
@@ -217,10 +247,11 @@ async def update_template(
         
         template.updated_at = datetime.utcnow()
         
-        await db.commit()
+        await prompt_catalog_cache.commit(db)
         await db.refresh(template)
         
         logger.info(f"Updated template {template.id}: {template.name}")
+        job = prompt_propagator.on_template_updated(template.id, update_data)
         
         return {
             "id": str(template.id),
@@ -236,7 +267,8 @@ async def update_template(
             "created_at": template.created_at,
             "updated_at": template.updated_at,
             "created_by": template.created_by,
-            "scenario_count": 0  # Could calculate if needed
+            "scenario_count": 0,  # Could calculate if needed
+            "propagation_job_id": job["id"] if job else None
         }
         
     except HTTPException:
@@ -264,7 +296,7 @@ async def delete_template(template_id: str, db: AsyncSession = Depends(get_db)):
         template.is_active = False
         template.updated_at = datetime.utcnow()
         
-        await db.commit()
+        await prompt_catalog_cache.commit(db)
         
         logger.info(f"Deleted template {template.id}: {template.name}")
         return {"message": "Template deleted successfully"}
@@ -288,66 +320,70 @@ async def list_scenarios(
 ):
     """List all prompt scenarios with optional filtering"""
     try:
-        query = select(PromptScenario).options(selectinload(PromptScenario.template))
-        
-        # Apply filters
-        conditions = []
-        if template_id:
-            conditions.append(PromptScenario.template_id == template_id)
-        if is_active is not None:
-            conditions.append(PromptScenario.is_active == is_active)
-        if search:
-            conditions.append(or_(
-                PromptScenario.name.ilike(f"%{search}%"),
-                PromptScenario.description.ilike(f"%{search}%")
-            ))
-        
-        if conditions:
-            query = query.where(and_(*conditions))
-        
-        query = query.offset(skip).limit(limit).order_by(PromptScenario.created_at.desc())
-        
-        result = await db.execute(query)
-        scenarios = result.scalars().all()
-        
-        response_scenarios = []
-        for scenario in scenarios:
-            # Compile prompt with variables
-            compiled_prompt = compile_prompt_template(
-                scenario.template.template_content if scenario.template else "",
-                scenario.variable_values or {}
-            )
+        async def load():
+            query = select(PromptScenario).options(selectinload(PromptScenario.template))
             
-            scenario_dict = {
-                "id": str(scenario.id),
-                "name": scenario.name,
-                "description": scenario.description,
-                "template_id": str(scenario.template_id),
-                "variable_values": scenario.variable_values,
-                "is_active": scenario.is_active,
-                "created_at": scenario.created_at,
-                "updated_at": scenario.updated_at,
-                "template": {
-                    "id": str(scenario.template.id),
-                    "name": scenario.template.name,
-                    "title": scenario.template.title,
-                    "description": scenario.template.description,
-                    "category": scenario.template.category,
-                    "template_content": scenario.template.template_content,
-                    "variables": scenario.template.variables,
-                    "tools": scenario.template.tools,
-                    "is_active": scenario.template.is_active,
-                    "is_system_template": scenario.template.is_system_template,
-                    "created_at": scenario.template.created_at,
-                    "updated_at": scenario.template.updated_at,
-                    "created_by": scenario.template.created_by,
-                    "scenario_count": 0
-                } if scenario.template else None,
-                "compiled_prompt": compiled_prompt
-            }
-            response_scenarios.append(scenario_dict)
+            # Apply filters
+            conditions = []
+            if template_id:
+                conditions.append(PromptScenario.template_id == template_id)
+            if is_active is not None:
+                conditions.append(PromptScenario.is_active == is_active)
+            rank = None
+            if search:
+                condition, rank = await _text_search(db, search, PromptScenario.name, PromptScenario.description)
+                conditions.append(condition)
+            
+            if conditions:
+                query = query.where(and_(*conditions))
+            
+            ordering = [PromptScenario.created_at.desc()]
+            if rank is not None:
+                ordering.insert(0, rank.desc())
+            query = query.offset(skip).limit(limit).order_by(*ordering)
+            
+            result = await db.execute(query)
+            scenarios = result.scalars().all()
+            
+            response_scenarios = []
+            for scenario in scenarios:
+                # Compile prompt with variables
+                compiled = template_compiler.compile_scenario(scenario)
+                
+                scenario_dict = {
+                    "id": str(scenario.id),
+                    "name": scenario.name,
+                    "description": scenario.description,
+                    "template_id": str(scenario.template_id),
+                    "variable_values": scenario.variable_values,
+                    "is_active": scenario.is_active,
+                    "created_at": scenario.created_at,
+                    "updated_at": scenario.updated_at,
+                    "template": {
+                        "id": str(scenario.template.id),
+                        "name": scenario.template.name,
+                        "title": scenario.template.title,
+                        "description": scenario.template.description,
+                        "category": scenario.template.category,
+                        "template_content": scenario.template.template_content,
+                        "variables": scenario.template.variables,
+                        "tools": scenario.template.tools,
+                        "is_active": scenario.template.is_active,
+                        "is_system_template": scenario.template.is_system_template,
+                        "created_at": scenario.template.created_at,
+                        "updated_at": scenario.template.updated_at,
+                        "created_by": scenario.template.created_by,
+                        "scenario_count": 0
+                    } if scenario.template else None,
+                    "compiled_prompt": compiled.text,
+                    "missing_variables": compiled.missing_variables,
+                    "unused_variables": compiled.unused_variables
+                }
+                response_scenarios.append(scenario_dict)
+            
+            return response_scenarios
         
-        return response_scenarios
+        return await prompt_catalog_cache.read(("scenarios", template_id, is_active, search, skip, limit), load)
         
     except Exception as e:
         logger.error(f"Error listing scenarios: {str(e)}")
@@ -387,17 +423,14 @@ async def create_scenario(
         )
         
         db.add(db_scenario)
-        await db.commit()
+        await prompt_catalog_cache.commit(db)
         await db.refresh(db_scenario)
         
         # Load template for response
         await db.refresh(db_scenario, ["template"])
         
         # Compile prompt
-        compiled_prompt = compile_prompt_template(
-            template.template_content,
-            scenario_data.variable_values or {}
-        )
+        compiled = template_compiler.compile_scenario(db_scenario, template)
         
         logger.info(f"Created scenario {db_scenario.id}: {db_scenario.name}")
         
@@ -411,7 +444,9 @@ async def create_scenario(
             "created_at": db_scenario.created_at,
             "updated_at": db_scenario.updated_at,
             "template": None,  # Can be loaded separately if needed
-            "compiled_prompt": compiled_prompt
+            "compiled_prompt": compiled.text,
+            "missing_variables": compiled.missing_variables,
+            "unused_variables": compiled.unused_variables
         }
         
     except HTTPException:
@@ -425,46 +460,50 @@ async def create_scenario(
 async def get_scenario(scenario_id: str, db: AsyncSession = Depends(get_db)):
     """Get a specific scenario with compiled prompt"""
     try:
-        query = select(PromptScenario).options(selectinload(PromptScenario.template)).where(PromptScenario.id == scenario_id)
-        result = await db.execute(query)
-        scenario = result.scalar_one_or_none()
+        async def load():
+            query = select(PromptScenario).options(selectinload(PromptScenario.template)).where(PromptScenario.id == scenario_id)
+            result = await db.execute(query)
+            scenario = result.scalar_one_or_none()
+            if not scenario:
+                return None
+            
+            # Compile prompt
+            compiled = template_compiler.compile_scenario(scenario)
+            
+            return {
+                "id": str(scenario.id),
+                "name": scenario.name,
+                "description": scenario.description,
+                "template_id": str(scenario.template_id),
+                "variable_values": scenario.variable_values,
+                "is_active": scenario.is_active,
+                "created_at": scenario.created_at,
+                "updated_at": scenario.updated_at,
+                "template": {
+                    "id": str(scenario.template.id),
+                    "name": scenario.template.name,
+                    "title": scenario.template.title,
+                    "description": scenario.template.description,
+                    "category": scenario.template.category,
+                    "template_content": scenario.template.template_content,
+                    "variables": scenario.template.variables,
+                    "tools": scenario.template.tools,
+                    "is_active": scenario.template.is_active,
+                    "is_system_template": scenario.template.is_system_template,
+                    "created_at": scenario.template.created_at,
+                    "updated_at": scenario.template.updated_at,
+                    "created_by": scenario.template.created_by,
+                    "scenario_count": 0
+                } if scenario.template else None,
+                "compiled_prompt": compiled.text,
+                "missing_variables": compiled.missing_variables,
+                "unused_variables": compiled.unused_variables
+            }
         
-        if not scenario:
+        scenario = await prompt_catalog_cache.read(("scenario", scenario_id), load)
+        if scenario is None:
             raise HTTPException(status_code=404, detail="Scenario not found")
-        
-        # Compile prompt
-        compiled_prompt = compile_prompt_template(
-            scenario.template.template_content if scenario.template else "",
-            scenario.variable_values or {}
-        )
-        
-        return {
-            "id": str(scenario.id),
-            "name": scenario.name,
-            "description": scenario.description,
-            "template_id": str(scenario.template_id),
-            "variable_values": scenario.variable_values,
-            "is_active": scenario.is_active,
-            "created_at": scenario.created_at,
-            "updated_at": scenario.updated_at,
-            "template": {
-                "id": str(scenario.template.id),
-                "name": scenario.template.name,
-                "title": scenario.template.title,
-                "description": scenario.template.description,
-                "category": scenario.template.category,
-                "template_content": scenario.template.template_content,
-                "variables": scenario.template.variables,
-                "tools": scenario.template.tools,
-                "is_active": scenario.template.is_active,
-                "is_system_template": scenario.template.is_system_template,
-                "created_at": scenario.template.created_at,
-                "updated_at": scenario.template.updated_at,
-                "created_by": scenario.template.created_by,
-                "scenario_count": 0
-            } if scenario.template else None,
-            "compiled_prompt": compiled_prompt
-        }
+        return scenario
         
     except HTTPException:
         raise
@@ -494,16 +533,14 @@ async def update_scenario(
         
         scenario.updated_at = datetime.utcnow()
         
-        await db.commit()
+        await prompt_catalog_cache.commit(db)
         await db.refresh(scenario)
         
         # Compile prompt
-        compiled_prompt = compile_prompt_template(
-            scenario.template.template_content if scenario.template else "",
-            scenario.variable_values or {}
-        )
+        compiled = template_compiler.compile_scenario(scenario)
         
         logger.info(f"Updated scenario {scenario.id}: {scenario.name}")
+        job = prompt_propagator.on_scenario_updated(scenario.id, update_data)
         
         return {
             "id": str(scenario.id),
@@ -515,7 +552,10 @@ async def update_scenario(
             "created_at": scenario.created_at,
             "updated_at": scenario.updated_at,
             "template": None,  # Can be loaded separately if needed
-            "compiled_prompt": compiled_prompt
+            "compiled_prompt": compiled.text,
+            "missing_variables": compiled.missing_variables,
+            "unused_variables": compiled.unused_variables,
+            "propagation_job_id": job["id"] if job else None
         }
         
     except HTTPException:
@@ -540,7 +580,7 @@ async def delete_scenario(scenario_id: str, db: AsyncSession = Depends(get_db)):
         scenario.is_active = False
         scenario.updated_at = datetime.utcnow()
         
-        await db.commit()
+        await prompt_catalog_cache.commit(db)
         
         logger.info(f"Deleted scenario {scenario.id}: {scenario.name}")
         return {"message": "Scenario deleted successfully"}
@@ -554,7 +594,10 @@ async def delete_scenario(scenario_id: str, db: AsyncSession = Depends(get_db)):
 
 # Import templates from files
 @router.post("/templates/import-from-files")
-async def import_templates_from_files(db: AsyncSession = Depends(get_db)):
+async def import_templates_from_files(
+    overwrite_existing: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
     """Import templates from the templates directory"""
     try:
         templates_dir = Path(__file__).parent.parent / "prompts" / "templates"
@@ -562,83 +605,61 @@ async def import_templates_from_files(db: AsyncSession = Depends(get_db)):
         if not templates_dir.exists():
             raise HTTPException(status_code=404, detail="Templates directory not found")
         
-        imported_count = 0
-        errors = []
+        parsed = await parse_template_dir(templates_dir)
+        report = await import_template_rows(db, parsed, overwrite_existing=overwrite_existing)
+        await prompt_catalog_cache.commit(db)
         
-        # Import JSON templates
-        for json_file in templates_dir.glob("*.json"):
-            try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    template_data = json.load(f)
-                
-                # Check if template already exists
-                existing_query = select(PromptTemplate).where(PromptTemplate.name == json_file.stem)
-                existing_result = await db.execute(existing_query)
-                if existing_result.scalar_one_or_none():
-                    continue  # Skip existing templates
-                
-                db_template = PromptTemplate(
-                    name=json_file.stem,
-                    title=template_data.get("title", json_file.stem),
-                    description=template_data.get("description", ""),
-                    category=template_data.get("category", "imported"),
-                    template_content=template_data.get("template", ""),
-                    variables=template_data.get("variables", []),
-                    tools=template_data.get("tools", []),
-                    is_system_template=True,
-                    created_by="system_import"
-                )
-                
-                db.add(db_template)
-                imported_count += 1
-                
-            except Exception as e:
-                errors.append(f"Error importing {json_file.name}: {str(e)}")
-        
-        # Import TXT templates
-        for txt_file in templates_dir.glob("*.txt"):
-            try:
-                with open(txt_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # Check if template already exists
-                existing_query = select(PromptTemplate).where(PromptTemplate.name == txt_file.stem)
-                existing_result = await db.execute(existing_query)
-                if existing_result.scalar_one_or_none():
-                    continue  # Skip existing templates
-                
-                db_template = PromptTemplate(
-                    name=txt_file.stem,
-                    title=txt_file.stem.replace("_", " ").title(),
-                    description=f"Imported from {txt_file.name}",
-                    category="text_templates",
-                    template_content=content,
-                    variables=[],
-                    tools=[],
-                    is_system_template=True,
-                    created_by="system_import"
-                )
-                
-                db.add(db_template)
-                imported_count += 1
-                
-            except Exception as e:
-                errors.append(f"Error importing {txt_file.name}: {str(e)}")
+        logger.info(f"Imported {report['imported_count']} templates from files ({report['updated_count']} updated)")
         
-        await db.commit()
+        return {
+            "message": f"Successfully imported {report['imported_count']} templates",
+            **report
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error importing templates: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/templates/import-archive")
+async def import_templates_from_archive(
+    archive: UploadFile = File(..., description="Zip or tar(.gz) archive of .json/.txt templates"),
+    overwrite_existing: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """Import templates from an uploaded archive (spooled to disk by the upload, read member by member)"""
+    try:
+        filename = archive.filename or ""
+        if not filename.lower().endswith((".zip", ".tar", ".tar.gz", ".tgz")):
+            raise HTTPException(status_code=400, detail="Upload a .zip, .tar, .tar.gz or .tgz archive")
+        if archive.size is not None and archive.size > MAX_ARCHIVE_BYTES:
+            raise HTTPException(status_code=413, detail=f"Archive larger than {MAX_ARCHIVE_BYTES} bytes")
+        
+        try:
+            parsed = await asyncio.to_thread(parse_template_archive, archive.file, filename)
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            raise HTTPException(status_code=400, detail=f"Could not read archive: {str(e)}")
+        
+        report = await import_template_rows(db, parsed, overwrite_existing=overwrite_existing)
+        await prompt_catalog_cache.commit(db)
         
-        logger.info(f"Imported {imported_count} templates from files")
+        logger.info(f"Imported {report['imported_count']} templates from {filename} ({report['updated_count']} updated)")
         
         return {
-            "message": f"Successfully imported {imported_count} templates",
-            "imported_count": imported_count,
-            "errors": errors
+            "message": f"Successfully imported {report['imported_count']} templates",
+            **report
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         await db.rollback()
-        logger.error(f"Error importing templates: {str(e)}")
+        logger.error(f"Error importing template archive: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await archive.close()
 
 # Agent Assignment Management
 @router.get("/assignments", response_model=List[AgentPromptAssignmentResponse])
@@ -650,57 +671,59 @@ async def list_assignments(
 ):
     """List prompt assignments"""
     try:
-        query = select(AgentPromptAssignment).options(
-            selectinload(AgentPromptAssignment.scenario).selectinload(PromptScenario.template)
-        )
-        
-        conditions = []
-        if agent_id:
-            conditions.append(AgentPromptAssignment.agent_id == agent_id)
-        if scenario_id:
-            conditions.append(AgentPromptAssignment.scenario_id == scenario_id)
-        if is_active is not None:
-            conditions.append(AgentPromptAssignment.is_active == is_active)
-        
-        if conditions:
-            query = query.where(and_(*conditions))
-        
-        result = await db.execute(query)
-        assignments = result.scalars().all()
-        
-        response_assignments = []
-        for assignment in assignments:
-            scenario_data = None
-            if assignment.scenario:
-                compiled_prompt = compile_prompt_template(
-                    assignment.scenario.template.template_content if assignment.scenario.template else "",
-                    assignment.scenario.variable_values or {}
-                )
+        async def load():
+            query = select(AgentPromptAssignment).options(
+                selectinload(AgentPromptAssignment.scenario).selectinload(PromptScenario.template)
+            )
+            
+            conditions = []
+            if agent_id:
+                conditions.append(AgentPromptAssignment.agent_id == agent_id)
+            if scenario_id:
+                conditions.append(AgentPromptAssignment.scenario_id == scenario_id)
+            if is_active is not None:
+                conditions.append(AgentPromptAssignment.is_active == is_active)
+            
+            if conditions:
+                query = query.where(and_(*conditions))
+            
+            result = await db.execute(query)
+            assignments = result.scalars().all()
+            
+            response_assignments = []
+            for assignment in assignments:
+                scenario_data = None
+                if assignment.scenario:
+                    compiled = template_compiler.compile_scenario(assignment.scenario)
+                    
+                    scenario_data = {
+                        "id": str(assignment.scenario.id),
+                        "name": assignment.scenario.name,
+                        "description": assignment.scenario.description,
+                        "template_id": str(assignment.scenario.template_id),
+                        "variable_values": assignment.scenario.variable_values,
+                        "is_active": assignment.scenario.is_active,
+                        "created_at": assignment.scenario.created_at,
+                        "updated_at": assignment.scenario.updated_at,
+                        "template": None,  # Avoid deep nesting
+                        "compiled_prompt": compiled.text,
+                        "missing_variables": compiled.missing_variables,
+                        "unused_variables": compiled.unused_variables
+                    }
                 
-                scenario_data = {
-                    "id": str(assignment.scenario.id),
-                    "name": assignment.scenario.name,
-                    "description": assignment.scenario.description,
-                    "template_id": str(assignment.scenario.template_id),
-                    "variable_values": assignment.scenario.variable_values,
-                    "is_active": assignment.scenario.is_active,
-                    "created_at": assignment.scenario.created_at,
-                    "updated_at": assignment.scenario.updated_at,
-                    "template": None,  # Avoid deep nesting
-                    "compiled_prompt": compiled_prompt
+                assignment_dict = {
+                    "id": str(assignment.id),
+                    "agent_id": assignment.agent_id,
+                    "scenario_id": str(assignment.scenario_id),
+                    "is_active": assignment.is_active,
+                    "assigned_at": assignment.assigned_at,
+                    "scenario": scenario_data
                 }
+                response_assignments.append(assignment_dict)
             
-            assignment_dict = {
-                "id": str(assignment.id),
-                "agent_id": assignment.agent_id,
-                "scenario_id": str(assignment.scenario_id),
-                "is_active": assignment.is_active,
-                "assigned_at": assignment.assigned_at,
-                "scenario": scenario_data
-            }
-            response_assignments.append(assignment_dict)
+            return response_assignments
         
-        return response_assignments
+        return await prompt_catalog_cache.read(("assignments", agent_id, scenario_id, is_active), load)
         
     except Exception as e:
         logger.error(f"Error listing assignments: {str(e)}")
@@ -743,7 +766,7 @@ async def create_assignment(
         )
         
         db.add(db_assignment)
-        await db.commit()
+        await prompt_catalog_cache.commit(db)
         await db.refresh(db_assignment)
         
         logger.info(f"Created assignment {db_assignment.id}: agent {assignment_data.agent_id} -> scenario {assignment_data.scenario_id}")
@@ -772,48 +795,48 @@ async def create_bulk_assignments(
     """Assign a prompt scenario to multiple agents"""
     try:
         # Verify scenario exists
-        scenario_query = select(PromptScenario).where(PromptScenario.id == assignment_data.scenario_id)
+        scenario_query = select(PromptScenario.id).where(PromptScenario.id == assignment_data.scenario_id)
         scenario_result = await db.execute(scenario_query)
         if not scenario_result.scalar_one_or_none():
             raise HTTPException(status_code=404, detail="Scenario not found")
         
+        requested_ids = set(assignment_data.agent_ids)
+        
+        # Validate every agent id in one query
+        agent_query = select(Agent.id).where(Agent.id.in_(requested_ids))
+        known_agents = set((await db.execute(agent_query)).scalars().all())
+        
+        # Existing active assignments for these agents, in one query
+        existing_query = select(AgentPromptAssignment.agent_id).where(
+            and_(
+                AgentPromptAssignment.agent_id.in_(requested_ids),
+                AgentPromptAssignment.scenario_id == assignment_data.scenario_id,
+                AgentPromptAssignment.is_active == True
+            )
+        )
+        assigned_agents = set((await db.execute(existing_query)).scalars().all())
+        
         created_assignments = []
         errors = []
         
         for agent_id in assignment_data.agent_ids:
-            try:
-                # Verify agent exists
-                agent_query = select(Agent).where(Agent.id == agent_id)
-                agent_result = await db.execute(agent_query)
-                if not agent_result.scalar_one_or_none():
-                    errors.append(f"Agent {agent_id} not found")
-                    continue
-                
-                # Check if assignment already exists
-                existing_query = select(AgentPromptAssignment).where(
-                    and_(
-                        AgentPromptAssignment.agent_id == agent_id,
-                        AgentPromptAssignment.scenario_id == assignment_data.scenario_id,
-                        AgentPromptAssignment.is_active == True
-                    )
-                )
-                existing_result = await db.execute(existing_query)
-                if existing_result.scalar_one_or_none():
-                    errors.append(f"Assignment already exists for agent {agent_id}")
-                    continue
-                
-                db_assignment = AgentPromptAssignment(
-                    agent_id=agent_id,
-                    scenario_id=assignment_data.scenario_id
-                )
-                
-                db.add(db_assignment)
+            if agent_id not in known_agents:
+                errors.append(f"Agent {agent_id} not found")
+            elif agent_id in assigned_agents:
+                errors.append(f"Assignment already exists for agent {agent_id}")
+            else:
                 created_assignments.append(agent_id)
-                
-            except Exception as e:
-                errors.append(f"Error assigning to agent {agent_id}: {str(e)}")
+                # A repeated id in the request counts as already assigned
+                assigned_agents.add(agent_id)
+        
+        # Single multi-row insert for the rest
+        if created_assignments:
+            await db.execute(
+                insert(AgentPromptAssignment),
+                [{"agent_id": agent_id, "scenario_id": assignment_data.scenario_id} for agent_id in created_assignments]
+            )
         
-        await db.commit()
+        await prompt_catalog_cache.commit(db)
         
         logger.info(f"Created {len(created_assignments)} bulk assignments for scenario {assignment_data.scenario_id}")
         
@@ -843,7 +866,7 @@ async def delete_assignment(assignment_id: str, db: AsyncSession = Depends(get_d
             raise HTTPException(status_code=404, detail="Assignment not found")
         
         assignment.is_active = False
-        await db.commit()
+        await prompt_catalog_cache.commit(db)
         
         logger.info(f"Deleted assignment {assignment.id}")
         return {"message": "Assignment deleted successfully"}
@@ -859,24 +882,53 @@ async def delete_assignment(assignment_id: str, db: AsyncSession = Depends(get_d
 def compile_prompt_template(template_content: str, variable_values: Dict[str, Any]) -> str:
     """Compile a prompt template with variable values"""
     try:
-        compiled = template_content
-        for key, value in variable_values.items():
-            placeholder = f"{{{key}}}"
-            compiled = compiled.replace(placeholder, str(value))
-        return compiled
+        return template_compiler.compile(template_content, variable_values).text
     except Exception as e:
         logger.error(f"Error compiling template: {str(e)}")
         return template_content
 
+# Propagation of template and scenario edits to agents
+@router.post("/propagate", status_code=202)
+async def propagate_prompts(
+    template_id: Optional[str] = None,
+    scenario_id: Optional[str] = None,
+    force: bool = Query(False, description="Push to RetellAI even when the prompt is unchanged")
+):
+    """Recompile affected scenarios and push them to assigned agents in the background"""
+    if not template_id and not scenario_id:
+        raise HTTPException(status_code=400, detail="template_id or scenario_id is required")
+    return prompt_propagator.schedule(template_id=template_id, scenario_id=scenario_id, force=force)
+
+@router.get("/propagation/jobs")
+async def list_propagation_jobs():
+    """Recent propagation jobs, newest first"""
+    return {"jobs": prompt_propagator.list_jobs()}
+
+@router.get("/propagation/jobs/{job_id}")
+async def get_propagation_job(job_id: str):
+    """Progress of a propagation job"""
+    job = prompt_propagator.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Propagation job not found")
+    return job
+
+@router.get("/catalog-cache")
+async def get_catalog_cache_status():
+    """Prompt catalog cache state: LISTEN connection, invalidations and hit rate"""
+    return prompt_catalog_cache.status()
+
 # Get categories
 @router.get("/categories")
 async def get_categories(db: AsyncSession = Depends(get_db)):
     """Get all unique template categories"""
     try:
-        query = select(PromptTemplate.category).distinct().where(PromptTemplate.is_active == True)
-        result = await db.execute(query)
-        categories = [row[0] for row in result.fetchall()]
-        return {"categories": sorted(categories)}
+        async def load():
+            query = select(PromptTemplate.category).distinct().where(PromptTemplate.is_active == True)
+            result = await db.execute(query)
+            categories = [row[0] for row in result.fetchall()]
+            return {"categories": sorted(categories)}
+        
+        return await prompt_catalog_cache.read(("categories",), load)
         
     except Exception as e:
         logger.error(f"Error getting categories: {str(e)}")
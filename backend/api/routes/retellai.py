@@ -9,6 +9,7 @@ from loguru import logger
 
 from ..database import get_db, Call, CallEvent, RetellAgent
 from ..services.retell_service import retell_service
+from ..services.caller_identity import caller_identity
 from ..schemas import CallBase
 
 router = APIRouter()
@@ -101,6 +102,11 @@ async def retellai_agent_level_webhook(request: Request, db: AsyncSession = Depe
             
             # Handle different event types with real-time streaming
             if event_type == "call_started":
+                # Identify who is on the line from the local phone number index
+                caller = caller_identity.resolve_call(webhook_data.get("data", {}))
+                if caller:
+                    call_event.data = {**webhook_data, "caller_identity": caller}
+                
                 await db.execute(
                     update(Call)
                     .where(Call.id == call.id)
@@ -116,6 +122,7 @@ async def retellai_agent_level_webhook(request: Request, db: AsyncSession = Depe
                         "type": "call_started",
                         "call_id": call_id,
                         "data": webhook_data.get("data", {}),
+                        "caller_identity": caller,
                         "timestamp": datetime.utcnow().isoformat()
                     }),
                     call.retell_call_id
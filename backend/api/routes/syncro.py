@@ -5,16 +5,27 @@ from typing import List, Optional
 import asyncio
 from loguru import logger
 from datetime import datetime, timedelta
+import math
 import random
+import time
 
 from ..database import get_db, SyncroTicket
-from ..services.syncro_service import syncro_service
+from ..services.syncro_service import syncro_service, PROBE
+from ..services.rate_limit import RateLimitExceeded
+from ..services.customer_mirror import customer_mirror
+from ..services.ticket_mirror import ticket_mirror, row_to_ticket
 from ..schemas import TicketCreate, TicketResponse, ErrorResponse
 
 router = APIRouter()
 
 # Real SyncroMSP data only - no mock data
 
+def _rate_limited(e: RateLimitExceeded) -> HTTPException:
+    """SyncroMSP's request budget is exhausted: tell the client when to come back"""
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))})
+
+MIRROR_PAGE_MAX = 500
+
 # ============================================================================
 # READ-ONLY OPERATIONS (ACTIVE)
 # ============================================================================
@@ -23,19 +34,58 @@ router = APIRouter()
 async def list_tickets(
     status: Optional[str] = None,
     priority: Optional[str] = None,
+    customer_id: Optional[str] = None,
+    updated_since: Optional[datetime] = None,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    live: bool = False,
     db: AsyncSession = Depends(get_db)
 ):
-    """List tickets with optional filtering from SyncroMSP API"""
+    """List tickets from the local SyncroMSP mirror (filters run in SQL, keyset paging via `cursor`).
+
+    Mirror pages hold at most MIRROR_PAGE_MAX tickets; follow `next_cursor` for more.
+    """
     try:
+        if not live and await ticket_mirror.is_ready(db):
+            limit = max(1, min(limit, MIRROR_PAGE_MAX))
+            try:
+                tickets, next_cursor = await ticket_mirror.list_tickets(
+                    db,
+                    status=status,
+                    priority=priority,
+                    customer_id=customer_id,
+                    updated_since=updated_since,
+                    limit=limit,
+                    cursor=cursor
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            
+            return {
+                "tickets": tickets,
+                "count": len(tickets),
+                "next_cursor": next_cursor,
+                "filters_applied": {
+                    "status": status,
+                    "priority": priority,
+                    "customer_id": customer_id,
+                    "updated_since": updated_since.isoformat() if updated_since else None,
+                    "limit": limit
+                },
+                "source": "local_mirror",
+                "last_sync_at": ticket_mirror.last_sync_at.isoformat() if ticket_mirror.last_sync_at else None
+            }
+        
         logger.info(f"Fetching tickets from SyncroMSP with filters: status={status}, priority={priority}, limit={limit}")
         
-        # Get tickets from SyncroMSP service
+        # Live read (requested, or the mirror has not been filled yet)
         tickets = await syncro_service.get_tickets(status=status, limit=limit)
         
-        # Apply priority filter if specified (SyncroMSP might not support this directly)
+        # Apply priority/customer filters if specified (SyncroMSP might not support these directly)
         if priority:
             tickets = [t for t in tickets if t.get("priority") == priority]
+        if customer_id:
+            tickets = [t for t in tickets if str(t.get("customer_id")) == str(customer_id)]
         
         return {
             "tickets": tickets,
@@ -43,19 +93,67 @@ async def list_tickets(
             "filters_applied": {
                 "status": status,
                 "priority": priority,
+                "customer_id": customer_id,
                 "limit": limit
             },
             "source": "syncromsp_api"
         }
     
+    except HTTPException:
+        raise
+    except RateLimitExceeded as e:
+        raise _rate_limited(e)
     except Exception as e:
         logger.error(f"Error fetching tickets from SyncroMSP: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/tickets/sync-from-syncro")
+async def sync_tickets_from_syncro(full: bool = False):
+    """Delta-sync tickets from SyncroMSP (READ-ONLY) into the local ticket mirror"""
+    try:
+        logger.info(f"Syncing tickets from SyncroMSP API (read-only) into the local mirror: full={full}")
+        
+        result = await ticket_mirror.sync(full=full)
+        
+        return {
+            "message": "Tickets synced from SyncroMSP API into the local mirror (read-only mode)",
+            "new_count": result["inserted"],
+            "updated_count": result["updated"],
+            "total_tickets": result["inserted"] + result["updated"],
+            **result,
+            "read_only_mode": True,
+            "source": "syncromsp_api"
+        }
+        
+    except RateLimitExceeded as e:
+        raise _rate_limited(e)
+    except Exception as e:
+        logger.error(f"Error syncing tickets from SyncroMSP: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/rate-limit/status")
+async def get_rate_limit_status():
+    """Get the SyncroMSP request scheduler's budget, queues and per-priority counters"""
+    return syncro_service.scheduler_status()
+
+@router.get("/tickets/mirror/status")
+async def get_ticket_mirror_status():
+    """Get the state of the local SyncroMSP ticket mirror"""
+    return ticket_mirror.status()
+
 @router.get("/tickets/{ticket_id}", response_model=dict)
-async def get_syncro_ticket_details(ticket_id: int):
-    """Get detailed ticket information from SyncroMSP API"""
+async def get_syncro_ticket_details(ticket_id: int, live: bool = False, db: AsyncSession = Depends(get_db)):
+    """Get ticket details from the local mirror, falling back to the SyncroMSP API"""
     try:
+        if not live:
+            row = await ticket_mirror.get_ticket(db, ticket_id)
+            if row is not None:
+                return {
+                    "ticket": row_to_ticket(row),
+                    "source": "local_mirror",
+                    "synced_at": row.synced_at.isoformat() if row.synced_at else None
+                }
+        
         logger.info(f"Fetching ticket details from SyncroMSP for ID: {ticket_id}")
         
         # Get ticket from SyncroMSP service
@@ -64,6 +162,12 @@ async def get_syncro_ticket_details(ticket_id: int):
         if not ticket:
             raise HTTPException(status_code=404, detail="Ticket not found")
         
+        # Write through so the next read is served locally (best effort: the live read already succeeded)
+        try:
+            await ticket_mirror.upsert([ticket])
+        except Exception as e:
+            logger.warning(f"Could not write ticket {ticket_id} through to the mirror: {str(e)}")
+        
         return {
             "ticket": ticket,
             "source": "syncromsp_api"
@@ -71,6 +175,8 @@ async def get_syncro_ticket_details(ticket_id: int):
     
     except HTTPException:
         raise
+    except RateLimitExceeded as e:
+        raise _rate_limited(e)
     except Exception as e:
         logger.error(f"Error fetching ticket details: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -91,10 +197,29 @@ async def list_customers(limit: int = 100):
             "source": "syncromsp_api"
         }
     
+    except RateLimitExceeded as e:
+        raise _rate_limited(e)
     except Exception as e:
         logger.error(f"Error fetching customers from SyncroMSP: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/customers/mirror/status")
+async def get_customer_mirror_status():
+    """Get the state of the local SyncroMSP customer mirror"""
+    return customer_mirror.status()
+
+@router.post("/customers/mirror/refresh")
+async def refresh_customer_mirror(full: bool = False):
+    """Refresh the local customer mirror from SyncroMSP now (incremental unless full=true)"""
+    try:
+        result = await customer_mirror.refresh(full=full)
+        return {"success": True, **result}
+    except RateLimitExceeded as e:
+        raise _rate_limited(e)
+    except Exception as e:
+        logger.error(f"Error refreshing customer mirror: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/customers/{customer_id}", response_model=dict)
 async def get_customer(customer_id: int):
     """Get customer details from SyncroMSP API"""
@@ -114,15 +239,30 @@ async def get_customer(customer_id: int):
     
     except HTTPException:
         raise
+    except RateLimitExceeded as e:
+        raise _rate_limited(e)
     except Exception as e:
         logger.error(f"Error fetching customer details: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/customers/search/{search_term}")
-async def search_customers(search_term: str):
-    """Search customers by name, email, or phone using SyncroMSP API"""
+async def search_customers(search_term: str, limit: int = 50):
+    """Search customers by name, email, or phone using the local customer mirror"""
     try:
-        logger.info(f"Searching SyncroMSP customers for term: {search_term}")
+        if customer_mirror.ready:
+            started = time.perf_counter()
+            matching_customers = customer_mirror.search(search_term, limit=limit)
+            
+            return {
+                "customers": matching_customers,
+                "search_term": search_term,
+                "count": len(matching_customers),
+                "source": "local_mirror",
+                "took_ms": round((time.perf_counter() - started) * 1000, 3)
+            }
+        
+        # Mirror not populated yet (first sync still running) - fall back to SyncroMSP
+        logger.info(f"Customer mirror not ready, searching SyncroMSP customers for term: {search_term}")
         
         # Get all customers and filter locally
         # Note: SyncroMSP may have specific search endpoints, but for now we'll filter client-side
@@ -151,6 +291,8 @@ async def search_customers(search_term: str):
             "source": "syncromsp_api"
         }
     
+    except RateLimitExceeded as e:
+        raise _rate_limited(e)
     except Exception as e:
         logger.error(f"Error searching customers: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -204,42 +346,6 @@ async def add_ticket_comment_disabled(
         "recommendation": "Comments cannot be added in read-only mode"
     }
 
-@router.get("/tickets/sync-from-syncro")
-async def sync_tickets_from_syncro(
-    status: Optional[str] = None,
-    limit: int = 50,
-    db: AsyncSession = Depends(get_db)
-):
-    """Sync tickets from SyncroMSP API (READ-ONLY) - fetches latest data without modifications"""
-    try:
-        logger.info(f"Syncing tickets from SyncroMSP API (read-only): status={status}, limit={limit}")
-        
-        # Get fresh tickets from SyncroMSP API
-        tickets = await syncro_service.get_tickets(status=status, limit=limit)
-        
-        # Count new vs existing (for stats - we're not actually writing to local DB in read-only mode)
-        new_count = len(tickets)  # All tickets are "new" since we're just fetching
-        updated_count = 0  # No updates in read-only mode
-        
-        return {
-            "message": "Tickets synced from SyncroMSP API (read-only mode)",
-            "new_count": new_count,
-            "updated_count": updated_count,
-            "total_tickets": len(tickets),
-            "tickets": tickets,
-            "filters_applied": {
-                "status": status,
-                "limit": limit
-            },
-            "read_only_mode": True,
-            "source": "syncromsp_api",
-            "note": "Data fetched from SyncroMSP API but not stored locally (read-only mode)"
-        }
-        
-    except Exception as e:
-        logger.error(f"Error syncing tickets from SyncroMSP: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
-
 @router.get("/status")
 async def get_syncro_connection_status():
     """Get SyncroMSP connection status"""
@@ -256,8 +362,9 @@ async def get_syncro_connection_status():
         
         if has_credentials:
             try:
-                # Test connection by fetching a small number of tickets
-                test_tickets = await syncro_service.get_tickets(limit=1)
+                # Test connection by fetching a small number of tickets (lowest priority for the request budget)
+                with syncro_service.priority(PROBE):
+                    test_tickets = await syncro_service.get_tickets(limit=1)
                 connection_status["api_test"] = "success"
                 connection_status["last_test"] = datetime.utcnow().isoformat()
             except Exception as e:
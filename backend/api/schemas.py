@@ -23,6 +23,11 @@ class AgentUpdate(BaseModel):
     boosted_keywords: Optional[List[str]] = None
     tools: Optional[List[Dict[str, Any]]] = None
 
+class RetellAgentBulkUpdate(BaseModel):
+    fields: Dict[str, Any]  # RetellAI agent fields to PATCH, e.g. {"agent_level_webhook_url": "..."}
+    agent_ids: Optional[List[str]] = None  # Defaults to every RetellAI agent
+    concurrency: Optional[int] = Field(None, ge=1, le=50)
+
 class LegacyAgentResponse(BaseModel):
     id: str
     user_id: str
@@ -262,6 +267,7 @@ class PromptTemplateResponse(BaseModel):
     updated_at: datetime
     created_by: Optional[str]
     scenario_count: Optional[int] = 0
+    propagation_job_id: Optional[str] = None  # Background push of the edit to assigned agents
 
     class Config:
         from_attributes = True
@@ -289,6 +295,9 @@ class PromptScenarioResponse(BaseModel):
     updated_at: datetime
     template: Optional[PromptTemplateResponse] = None
     compiled_prompt: Optional[str] = None  # Template with variables filled in
+    missing_variables: Optional[List[str]] = None  # Template variables without a value
+    unused_variables: Optional[List[str]] = None  # Values the template never references
+    propagation_job_id: Optional[str] = None  # Background push of the edit to assigned agents
 
     class Config:
         from_attributes = True
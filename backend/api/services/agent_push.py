@@ -0,0 +1,94 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Dict
+
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..database import AsyncSessionLocal, RetellAgentPushState
+from .retell_service import retell_service
+
+
+def payload_hash(value: Any) -> str:
+    """SHA-256 of a value's canonical JSON form (sorted keys, no whitespace)"""
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class AgentPushTracker:
+    """Content-addressed change detection for RetellAI agent updates.
+
+    The hash of every field RetellAI is known to hold is kept per RetellAI agent
+    id in retell_agent_push_state. Every successful PATCH through retell_service
+    (saves, prompt propagation, bulk updates) is recorded there, so all write
+    paths share one baseline. A push sends only the fields whose hash differs
+    and is skipped entirely when none do. Changes made directly in RetellAI are
+    not seen here; pass force=True to send everything.
+    """
+
+    def __init__(self):
+        self.counts = {"pushes": 0, "skipped_pushes": 0, "forced_pushes": 0, "fields_sent": 0, "fields_skipped": 0}
+        retell_service.subscribe_agent_updates(self.record)
+
+    async def hashes(self, retell_agent_id: str) -> Dict[str, str]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(RetellAgentPushState.field_hashes).where(RetellAgentPushState.retell_agent_id == retell_agent_id)
+            )
+            return result.scalar_one_or_none() or {}
+
+    async def changed_fields(self, retell_agent_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        pushed = await self.hashes(retell_agent_id)
+        return {key: value for key, value in fields.items() if pushed.get(key) != payload_hash(value)}
+
+    async def record(self, retell_agent_id: str, fields: Dict[str, Any]) -> None:
+        """Remember `fields` as what RetellAI holds for the agent (merged into the stored hashes)"""
+        now = datetime.utcnow()
+        hashes = {key: payload_hash(value) for key, value in fields.items()}
+        stmt = pg_insert(RetellAgentPushState).values(
+            retell_agent_id=retell_agent_id, field_hashes=hashes, last_pushed_at=now, updated_at=now
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[RetellAgentPushState.retell_agent_id],
+            set_={
+                # jsonb || merges per field in one statement, so concurrent writers do not drop each other's keys
+                "field_hashes": RetellAgentPushState.field_hashes.op("||")(stmt.excluded.field_hashes),
+                "last_pushed_at": stmt.excluded.last_pushed_at,
+                "updated_at": stmt.excluded.updated_at
+            }
+        )
+        async with AsyncSessionLocal() as db:
+            await db.execute(stmt)
+            await db.commit()
+
+    async def push(self, retell_agent_id: str, fields: Dict[str, Any], force: bool = False) -> Dict[str, Any]:
+        """PATCH the changed subset of `fields` to the agent in RetellAI (recorded by the update subscription)"""
+        changed = dict(fields) if force else await self.changed_fields(retell_agent_id, fields)
+        skipped = [key for key in fields if key not in changed]
+        self.counts["fields_skipped"] += len(skipped)
+
+        if not changed:
+            self.counts["skipped_pushes"] += 1
+            logger.info(f"Skipped RetellAI update for agent {retell_agent_id}: no changes since last push")
+            return {"pushed": False, "sent_fields": [], "unchanged_fields": skipped}
+
+        await retell_service.update_agent(retell_agent_id, changed)
+        self.counts["pushes"] += 1
+        self.counts["fields_sent"] += len(changed)
+        if force:
+            self.counts["forced_pushes"] += 1
+        return {"pushed": True, "sent_fields": sorted(changed), "unchanged_fields": skipped}
+
+    def stats(self) -> Dict[str, Any]:
+        attempts = self.counts["pushes"] + self.counts["skipped_pushes"]
+        return {
+            **self.counts,
+            "writes_avoided": self.counts["skipped_pushes"],
+            "skip_rate": round(self.counts["skipped_pushes"] / attempts, 4) if attempts else 0.0
+        }
+
+
+# Create singleton instance
+agent_push_tracker = AgentPushTracker()
@@ -0,0 +1,127 @@
+import copy
+import functools
+import inspect
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire after a per-entry TTL"""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        # Bumped on every invalidation so reads that started before a write
+        # cannot repopulate the cache with stale data
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value or _MISSING if absent/expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return _MISSING
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return _MISSING
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float, generation: Optional[int] = None) -> None:
+        """Store a value for ttl seconds, evicting least recently used entries"""
+        if generation is not None and generation != self.generation:
+            return
+
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a single entry"""
+        self.generation += 1
+        self._entries.pop(key, None)
+
+    def invalidate_prefix(self, prefix: Hashable) -> None:
+        """Drop every entry whose tuple key starts with prefix (e.g. a method name)"""
+        self.generation += 1
+        for key in [k for k in self._entries if isinstance(k, tuple) and k and k[0] == prefix]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+def _call_key(signature: inspect.Signature, *args: Any, **kwargs: Any) -> Tuple:
+    """Arguments of a call in declaration order with defaults applied, so positional
+    and keyword spellings of the same call map to the same key"""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    key = []
+    for parameter in signature.parameters.values():
+        value = bound.arguments[parameter.name]
+        if parameter.kind is inspect.Parameter.VAR_POSITIONAL:
+            key.extend(value)
+        elif parameter.kind is inspect.Parameter.VAR_KEYWORD:
+            key.extend(sorted(value.items()))
+        else:
+            key.append(value)
+    return tuple(key)
+
+
+def cached_read(name: str):
+    """Read-through caching for service methods.
+
+    The decorated method's instance must provide a ``_cache`` (TTLCache) and a
+    ``cache_ttls`` dict mapping method names to TTLs in seconds. A TTL of 0
+    disables caching for that method. Only successful results are cached.
+
+    Entries are keyed ``(name, *arguments)`` in declaration order, matching
+    ``invalidate_cache(name, *arguments)`` however the method was called.
+    Callers get a deep copy, so mutating a result never changes the cache.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            ttl = self.cache_ttls.get(name, 0)
+            if ttl <= 0:
+                return await func(self, *args, **kwargs)
+
+            key = (name, *_call_key(signature, self, *args, **kwargs)[1:])
+            value = self._cache.get(key)
+            if value is not _MISSING:
+                return copy.deepcopy(value)
+
+            generation = self._cache.generation
+            value = await func(self, *args, **kwargs)
+            self._cache.set(key, value, ttl, generation=generation)
+            return copy.deepcopy(value)
+        return wrapper
+    return decorator
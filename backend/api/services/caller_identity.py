@@ -0,0 +1,319 @@
+import asyncio
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+from sqlalchemy import select
+
+from ..database import AsyncSessionLocal, ITGlueContact
+from .customer_mirror import customer_mirror, parse_iso_datetime
+from .itglue_mirror import itglue_mirror
+from .itglue_service import itglue_service
+
+_EXTENSION = re.compile(r"\s*(?:ext\.?|extension|x|#)\s*\d+\s*$", re.IGNORECASE)
+
+DEFAULT_COUNTRY_CODE = os.getenv("CALLER_ID_DEFAULT_COUNTRY_CODE", "1")
+
+
+def normalize_phone_number(value: Optional[str], default_country_code: str = DEFAULT_COUNTRY_CODE) -> Optional[str]:
+    """Normalize a phone number to E.164 (+15551234567), or None if it can't be a number.
+
+    Numbers without a country code get `default_country_code` (NANP by default);
+    extensions are dropped. Fewer than 10 digits (local numbers without an area
+    code) cannot be placed and are rejected.
+    """
+    if not value:
+        return None
+
+    value = _EXTENSION.sub("", str(value).strip())
+    digits = re.sub(r"\D", "", value)
+    if len(digits) < 10:
+        return None
+
+    if value.startswith("+"):
+        number = digits
+    elif digits.startswith("00"):
+        number = digits[2:]
+    elif default_country_code == "1" and len(digits) == 11 and digits.startswith("1"):
+        number = digits
+    else:
+        # Drop a national trunk prefix (e.g. 0 in 020 ...) before adding the country code
+        number = default_country_code + digits.lstrip("0")
+
+    if not 8 <= len(number) <= 15:
+        return None
+    return f"+{number}"
+
+
+class CallerIdentityResolver:
+    """Hash index from E.164 phone number to Syncro customers and ITGlue contacts.
+
+    Syncro customers come from the local customer mirror (kept in step through its
+    change subscription); ITGlue contacts updated since the last refresh are paged
+    in every CALLER_ID_REFRESH_SECONDS, with a full rebuild every
+    CALLER_ID_FULL_REFRESH_SECONDS. A refresh that fails part-way removes nothing
+    and leaves the high-water mark where it was. Only the background sync leader
+    pages ITGlue; other workers index contacts from the ITGlue mirror's
+    itglue_contacts table after each mirror sync.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("CALLER_ID_ENABLED", "true").lower() == "true"
+        self.refresh_interval = float(os.getenv("CALLER_ID_REFRESH_SECONDS", "300"))
+        self.full_refresh_interval = float(os.getenv("CALLER_ID_FULL_REFRESH_SECONDS", "86400"))
+        self.overlap = timedelta(seconds=float(os.getenv("CALLER_ID_REFRESH_OVERLAP_SECONDS", "60")))
+        self._by_number: Dict[str, Dict[Tuple[str, str], Dict[str, Any]]] = {}
+        self._numbers: Dict[Tuple[str, str], Set[str]] = {}
+        self.itglue_high_water: Optional[datetime] = None
+        self.last_itglue_refresh_at: Optional[datetime] = None
+        self.last_itglue_full_refresh_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.lookups = 0
+        self.hits = 0
+        self.leading = False
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        customer_mirror.subscribe(self._on_customer_change)
+        itglue_mirror.subscribe(self._on_itglue_sync)
+
+    # Index maintenance
+
+    def upsert(self, source: str, record_id: str, numbers: Iterable[Optional[str]], identity: Dict[str, Any]) -> None:
+        key = (source, str(record_id))
+        self.remove(source, record_id)
+
+        normalized = {n for n in (normalize_phone_number(number) for number in numbers) if n}
+        if not normalized:
+            return
+
+        identity = {"source": source, "id": str(record_id), **identity}
+        for number in normalized:
+            self._by_number.setdefault(number, {})[key] = identity
+        self._numbers[key] = normalized
+
+    def remove(self, source: str, record_id: str) -> None:
+        key = (source, str(record_id))
+        for number in self._numbers.pop(key, ()):
+            matches = self._by_number.get(number)
+            if matches is not None:
+                matches.pop(key, None)
+                if not matches:
+                    del self._by_number[number]
+
+    def _on_customer_change(self, customer_id: str, customer: Optional[Dict[str, Any]]) -> None:
+        if customer is None:
+            self.remove("syncro", customer_id)
+            return
+
+        contact_name = customer.get("fullname") or " ".join(
+            filter(None, [customer.get("firstname"), customer.get("lastname")])
+        )
+        numbers = [customer.get("phone"), customer.get("mobile")]
+        for contact in customer.get("contacts") or []:
+            numbers += [contact.get("phone"), contact.get("mobile")]
+
+        self.upsert("syncro", customer_id, numbers, {
+            "type": "customer",
+            "customer_id": customer.get("id"),
+            "name": contact_name or customer.get("business_name"),
+            "business_name": customer.get("business_name"),
+            "email": customer.get("email")
+        })
+
+    def _index_contact(self, contact: Dict[str, Any]) -> None:
+        self.upsert("itglue", contact["id"], contact.get("phones") or [contact.get("phone")], {
+            "type": "contact",
+            "contact_id": contact["id"],
+            "name": contact.get("name"),
+            "title": contact.get("title"),
+            "email": contact.get("email"),
+            "organization_id": contact.get("organization_id"),
+            "organization_name": contact.get("organization_name")
+        })
+
+    # Lookups
+
+    def resolve(self, phone_number: str) -> Dict[str, Any]:
+        """Look up who is calling from `phone_number`"""
+        started = time.perf_counter()
+        normalized = normalize_phone_number(phone_number)
+        matches = list(self._by_number.get(normalized, {}).values()) if normalized else []
+
+        self.lookups += 1
+        if matches:
+            self.hits += 1
+
+        # Prefer Syncro customers (they own tickets), then ITGlue contacts
+        matches.sort(key=lambda match: match["source"] != "syncro")
+        return {
+            "phone_number": phone_number,
+            "normalized": normalized,
+            "found": bool(matches),
+            "customer": next((m for m in matches if m["type"] == "customer"), None),
+            "contact": next((m for m in matches if m["type"] == "contact"), None),
+            "matches": matches,
+            "took_ms": round((time.perf_counter() - started) * 1000, 4)
+        }
+
+    def resolve_call(self, call_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Resolve the external party of a RetellAI call payload (caller for inbound, callee for outbound)"""
+        number = call_data.get("to_number") if call_data.get("direction") == "outbound" else call_data.get("from_number")
+        return self.resolve(number) if number else None
+
+    # Refresh
+
+    async def refresh_itglue(self, full: bool = False) -> Dict[str, Any]:
+        """Page ITGlue contacts into the index (only those updated since the last refresh unless full)"""
+        if itglue_service.mock_enabled:
+            # Sample contacts must never be matched against real callers
+            return {"mode": "skipped", "reason": "ITGlue is not configured"}
+
+        async with self._lock:
+            started = time.monotonic()
+            seen: Set[str] = set()
+            high_water = self.itglue_high_water
+            since = self.itglue_high_water - self.overlap if not full and self.itglue_high_water else None
+            params = {"filter[updated_at]": f"{since.isoformat()}Z,*", "sort": "updated_at"} if since else None
+            page = 0
+
+            # iter_pages raises on any failed page (no mock fallback), so the removals
+            # and high-water update below only run after a complete listing
+            async for items in itglue_service.iter_pages("/contacts", params=params):
+                page += 1
+                for item in items:
+                    contact = itglue_service.parse_contact(item)
+                    seen.add(str(contact["id"]))
+                    self._index_contact(contact)
+                    updated_at = parse_iso_datetime(contact.get("updated_at"))
+                    if updated_at:
+                        high_water = max(high_water, updated_at) if high_water else updated_at
+
+            removed = 0
+            if full and seen:
+                for source, record_id in [key for key in self._numbers if key[0] == "itglue" and key[1] not in seen]:
+                    self.remove(source, record_id)
+                    removed += 1
+
+            now = datetime.utcnow()
+            self.itglue_high_water = high_water
+            self.last_itglue_refresh_at = now
+            if full:
+                self.last_itglue_full_refresh_at = now
+            self.last_error = None
+
+            return {
+                "mode": "full" if since is None else "incremental",
+                "since": since.isoformat() if since else None,
+                "pages": page,
+                "contacts": len(seen),
+                "removed": removed,
+                "numbers_indexed": len(self._by_number),
+                "duration_seconds": round(time.monotonic() - started, 3)
+            }
+
+    async def load_itglue(self, since: Optional[datetime] = None) -> Dict[str, Any]:
+        """Index ITGlue contacts from the mirror table (synced at or after `since`, or all, dropping the rest)"""
+        async with AsyncSessionLocal() as db:
+            query = select(ITGlueContact.data)
+            if since is not None:
+                query = query.where(ITGlueContact.synced_at >= since)
+            contacts = (await db.execute(query)).scalars().all()
+
+        async with self._lock:
+            seen: Set[str] = set()
+            for contact in contacts:
+                seen.add(str(contact["id"]))
+                self._index_contact(contact)
+
+            removed = 0
+            if since is None:
+                for source, record_id in [key for key in self._numbers if key[0] == "itglue" and key[1] not in seen]:
+                    self.remove(source, record_id)
+                    removed += 1
+
+            self.last_itglue_refresh_at = datetime.utcnow()
+            return {"mode": "mirror", "contacts": len(seen), "removed": removed}
+
+    async def _on_itglue_sync(self, summary: Dict[str, Any], started_at: datetime) -> None:
+        # The leader pages ITGlue itself; followers take the mirror's contacts
+        if self._task is None or self.leading:
+            return
+        contacts = summary["results"].get("contacts") or {}
+        full = summary.get("mode") == "full" or bool(contacts.get("removed"))
+        await self.load_itglue(since=None if full else started_at)
+
+    def _index_mirror_customers(self) -> None:
+        # Customers already in the mirror (e.g. loaded before we subscribed)
+        for customer in customer_mirror.index.customers():
+            self._on_customer_change(str(customer.get("id")), customer)
+
+    async def _follow(self) -> None:
+        self._index_mirror_customers()
+        try:
+            result = await self.load_itglue()
+            logger.info(f"Caller identity index loaded from the ITGlue mirror: {result}")
+        except Exception as e:
+            logger.error(f"Caller identity load from the ITGlue mirror failed: {str(e)}")
+            self.last_error = str(e)
+
+    async def _run(self) -> None:
+        self._index_mirror_customers()
+
+        while True:
+            full = (
+                self.last_itglue_full_refresh_at is None
+                or (datetime.utcnow() - self.last_itglue_full_refresh_at).total_seconds() >= self.full_refresh_interval
+            )
+            try:
+                result = await self.refresh_itglue(full=full)
+                logger.info(f"Caller identity index refreshed from ITGlue: {result}")
+            except Exception as e:
+                logger.error(f"Caller identity refresh failed: {str(e)}")
+                self.last_error = str(e)
+            await asyncio.sleep(self.refresh_interval)
+
+    async def start(self, leader: bool = True) -> None:
+        """Start refreshing ITGlue contacts from ITGlue (leader) or from the mirror (follower)"""
+        if not self.enabled or self._task is not None:
+            return
+        self.leading = leader
+        self._task = asyncio.create_task(self._run() if leader else self._follow())
+        logger.info(f"Caller identity resolver started ({'leader' if leader else 'follower'})")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        by_source: Dict[str, int] = {}
+        for source, _ in self._numbers:
+            by_source[source] = by_source.get(source, 0) + 1
+
+        return {
+            "enabled": self.enabled,
+            "leading": self.leading,
+            "numbers_indexed": len(self._by_number),
+            "records_indexed": by_source,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "default_country_code": DEFAULT_COUNTRY_CODE,
+            "itglue_high_water": self.itglue_high_water.isoformat() if self.itglue_high_water else None,
+            "last_itglue_refresh_at": self.last_itglue_refresh_at.isoformat() if self.last_itglue_refresh_at else None,
+            "last_itglue_full_refresh_at": self.last_itglue_full_refresh_at.isoformat() if self.last_itglue_full_refresh_at else None,
+            "last_error": self.last_error
+        }
+
+
+# Create singleton instance
+caller_identity = CallerIdentityResolver()
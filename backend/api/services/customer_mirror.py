@@ -0,0 +1,442 @@
+import asyncio
+import heapq
+import os
+import re
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from loguru import logger
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..database import AsyncSessionLocal, SyncroCustomer
+from .syncro_service import BACKGROUND, syncro_service
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+MAX_PREFIX = 8
+
+
+def _normalize(value: Optional[str]) -> str:
+    return (value or "").strip().lower()
+
+
+def _digits(value: Optional[str]) -> str:
+    return re.sub(r"\D", "", value or "")
+
+
+def _trigrams(value: str) -> Set[str]:
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def parse_iso_datetime(value: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO timestamp (SyncroMSP, ITGlue) into naive UTC as stored in the database"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class CustomerSearchIndex:
+    """In-memory search index over customer business name, contact name, email and phone.
+
+    Short terms (< 3 chars) match token prefixes; longer terms are narrowed with a
+    trigram index and confirmed with a substring check, so results match the old
+    "term in field" behaviour. Multi-word terms must match every word.
+    """
+
+    def __init__(self):
+        self._customers: Dict[str, Dict[str, Any]] = {}
+        self._fields: Dict[str, List[str]] = {}
+        self._text: Dict[str, str] = {}
+        self._keys: Dict[str, Set[str]] = {}
+        self._prefixes: Dict[str, Set[str]] = defaultdict(set)
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._customers)
+
+    def add(self, customer: Dict[str, Any]) -> None:
+        customer_id = str(customer.get("id"))
+        self.remove(customer_id)
+
+        contact_name = customer.get("fullname") or " ".join(
+            filter(None, [customer.get("firstname"), customer.get("lastname")])
+        )
+        fields = [
+            _normalize(customer.get("business_name")),
+            _normalize(contact_name),
+            _normalize(customer.get("email")),
+        ]
+        phones = " ".join(filter(None, [_digits(customer.get("phone")), _digits(customer.get("mobile"))]))
+        text = " | ".join(fields + [phones])
+
+        keys = {"p:" + token[:n] for token in _TOKEN.findall(text) for n in range(1, min(len(token), MAX_PREFIX) + 1)}
+        keys |= {"t:" + gram for gram in _trigrams(text)}
+        for key in keys:
+            (self._prefixes if key[0] == "p" else self._trigrams)[key[2:]].add(customer_id)
+
+        self._customers[customer_id] = customer
+        self._fields[customer_id] = fields
+        self._text[customer_id] = text
+        self._keys[customer_id] = keys
+
+    def remove(self, customer_id: str) -> None:
+        keys = self._keys.pop(customer_id, None)
+        if keys is None:
+            return
+        for key in keys:
+            index = self._prefixes if key[0] == "p" else self._trigrams
+            ids = index.get(key[2:])
+            if ids is not None:
+                ids.discard(customer_id)
+                if not ids:
+                    del index[key[2:]]
+        del self._customers[customer_id]
+        del self._fields[customer_id]
+        del self._text[customer_id]
+
+    def ids(self) -> Set[str]:
+        return set(self._customers)
+
+    def customers(self) -> List[Dict[str, Any]]:
+        return list(self._customers.values())
+
+    def _candidates(self, word: str) -> Set[str]:
+        if len(word) < 3:
+            return set(self._prefixes.get(word, ()))
+
+        grams = sorted((self._trigrams.get(g, set()) for g in _trigrams(word)), key=len)
+        if not grams or not grams[0]:
+            return set()
+        candidates = set(grams[0]).intersection(*grams[1:])
+        return {customer_id for customer_id in candidates if word in self._text[customer_id]}
+
+    def search(self, term: str, limit: int = 50) -> List[Dict[str, Any]]:
+        query = _normalize(term)
+        words = _TOKEN.findall(query)
+        if not words:
+            return []
+
+        # Phone numbers are indexed as digits only, so "(555) 010-0000" also matches
+        if _digits(query) and not re.search(r"[a-z@]", query):
+            words = [_digits(query)]
+
+        matches: Optional[Set[str]] = None
+        for word in sorted(words, key=len, reverse=True):
+            found = self._candidates(word)
+            matches = found if matches is None else matches & found
+            if not matches:
+                return []
+
+        fields = self._fields
+
+        def rank(customer_id: str):
+            business, contact, email = fields[customer_id]
+            if business.startswith(query):
+                score = 0 if business == query else 1
+            elif contact.startswith(query) or email.startswith(query):
+                score = 0 if query in (contact, email) else 2
+            else:
+                score = 3
+            return score, business or contact
+
+        return [self._customers[customer_id] for customer_id in heapq.nsmallest(limit, matches, key=rank)]
+
+
+class SyncroCustomerMirror:
+    """Postgres-backed mirror of SyncroMSP customers with an in-memory search index.
+
+    A background task loads the mirror from the database on startup, then pages
+    customers from SyncroMSP: incrementally (newest updated first, stopping at the
+    last seen update) every SYNCROMSP_CUSTOMER_REFRESH_SECONDS, and in full every
+    SYNCROMSP_CUSTOMER_FULL_REFRESH_SECONDS to pick up deleted customers. Only
+    the background sync leader talks to SyncroMSP; other workers catch their
+    index up from the table on the same interval.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("SYNCROMSP_CUSTOMER_MIRROR_ENABLED", "true").lower() == "true"
+        self.refresh_interval = float(os.getenv("SYNCROMSP_CUSTOMER_REFRESH_SECONDS", "300"))
+        self.full_refresh_interval = float(os.getenv("SYNCROMSP_CUSTOMER_FULL_REFRESH_SECONDS", "86400"))
+        self.index = CustomerSearchIndex()
+        self.loaded = False
+        self.high_water: Optional[datetime] = None
+        self.synced_through: Optional[datetime] = None
+        self.leading = False
+        self.last_refresh_at: Optional[datetime] = None
+        self.last_full_refresh_at: Optional[datetime] = None
+        self.last_result: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._subscribers: List[Callable[[str, Optional[Dict[str, Any]]], None]] = []
+
+    @property
+    def ready(self) -> bool:
+        """True once the index holds customers (from the database or a refresh)"""
+        return self.loaded and (len(self.index) > 0 or self.last_full_refresh_at is not None)
+
+    def search(self, term: str, limit: int = 50) -> List[Dict[str, Any]]:
+        return self.index.search(term, limit=limit)
+
+    def subscribe(self, callback: Callable[[str, Optional[Dict[str, Any]]], None]) -> None:
+        """Call `callback(customer_id, customer)` for every indexed change (customer is None on removal)"""
+        self._subscribers.append(callback)
+
+    def _index_customer(self, customer: Dict[str, Any]) -> None:
+        self.index.add(customer)
+        for callback in self._subscribers:
+            callback(str(customer.get("id")), customer)
+
+    def _unindex_customer(self, customer_id: str) -> None:
+        self.index.remove(customer_id)
+        for callback in self._subscribers:
+            callback(customer_id, None)
+
+    async def load(self) -> int:
+        """Build the in-memory index from the syncro_customers table"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(SyncroCustomer.customer_data, SyncroCustomer.syncro_updated_at, SyncroCustomer.synced_at)
+            )
+            rows = result.all()
+
+        for customer_data, updated_at, synced_at in rows:
+            if customer_data:
+                self._index_customer(customer_data)
+            if updated_at and (self.high_water is None or updated_at > self.high_water):
+                self.high_water = updated_at
+            if synced_at and (self.synced_through is None or synced_at > self.synced_through):
+                self.synced_through = synced_at
+
+        self.loaded = True
+        logger.info(f"Loaded {len(self.index)} SyncroMSP customers into the search index")
+        return len(self.index)
+
+    async def catch_up(self) -> Dict[str, int]:
+        """Apply rows another worker synced since the last load, and drop rows it deleted"""
+        async with AsyncSessionLocal() as db:
+            query = select(SyncroCustomer.customer_data, SyncroCustomer.syncro_updated_at, SyncroCustomer.synced_at)
+            if self.synced_through is not None:
+                query = query.where(SyncroCustomer.synced_at > self.synced_through)
+            rows = (await db.execute(query)).all()
+            ids = set((await db.execute(select(SyncroCustomer.syncro_customer_id))).scalars().all())
+
+        for customer_data, updated_at, synced_at in rows:
+            if customer_data:
+                self._index_customer(customer_data)
+            if updated_at and (self.high_water is None or updated_at > self.high_water):
+                self.high_water = updated_at
+            if synced_at and (self.synced_through is None or synced_at > self.synced_through):
+                self.synced_through = synced_at
+
+        missing = self.index.ids() - ids
+        for customer_id in missing:
+            self._unindex_customer(customer_id)
+        return {"upserted": len(rows), "removed": len(missing)}
+
+    async def refresh(self, full: bool = False) -> Dict[str, Any]:
+        """Pull changed (or all) customers from SyncroMSP into the mirror and index"""
+        async with self._lock:
+            started = time.monotonic()
+            started_at = datetime.utcnow()
+            seen: Set[str] = set()
+            pages = upserted = removed = 0
+            high_water = self.high_water
+
+            async def apply(customers: List[Dict[str, Any]]) -> Optional[datetime]:
+                """Upsert and index one page, returning its oldest updated_at"""
+                nonlocal high_water
+                await self._upsert(customers)
+                oldest = None
+                for customer in customers:
+                    seen.add(str(customer.get("id")))
+                    self._index_customer(customer)
+                    updated_at = parse_iso_datetime(customer.get("updated_at"))
+                    if updated_at:
+                        high_water = max(high_water, updated_at) if high_water else updated_at
+                        oldest = min(oldest, updated_at) if oldest else updated_at
+                return oldest
+
+            # Mirror refreshes must not crowd out interactive SyncroMSP reads
+            with syncro_service.priority(BACKGROUND):
+                if full:
+                    # Every page is needed, so fetch them concurrently
+                    async for customers in syncro_service.iter_pages(syncro_service.customers_path, "customers"):
+                        pages += 1
+                        if customers:
+                            await apply(customers)
+                            upserted += len(customers)
+                else:
+                    page = 1
+                    while True:
+                        data = await syncro_service.get_customers_page(page, sort="updated_at DESC")
+                        customers = data["customers"]
+                        pages += 1
+                        if not customers:
+                            break
+
+                        oldest = await apply(customers)
+                        upserted += len(customers)
+
+                        # Pages are newest first, so stop once we reach known data
+                        if self.high_water and oldest and oldest <= self.high_water:
+                            break
+
+                        total_pages = data["meta"].get("total_pages")
+                        if total_pages is not None and page >= int(total_pages):
+                            break
+                        page += 1
+
+            # An empty listing is more likely an upstream problem than zero customers
+            if full and seen:
+                removed = await self._remove_missing(seen, started_at)
+
+            now = datetime.utcnow()
+            self.high_water = high_water
+            self.last_refresh_at = now
+            if full:
+                self.last_full_refresh_at = now
+            self.loaded = True
+            self.last_error = None
+            self.last_result = {
+                "mode": "full" if full else "incremental",
+                "pages": pages,
+                "upserted": upserted,
+                "removed": removed,
+                "customers": len(self.index),
+                "duration_seconds": round(time.monotonic() - started, 3)
+            }
+            logger.info(f"SyncroMSP customer mirror refreshed: {self.last_result}")
+            return self.last_result
+
+    async def _upsert(self, customers: Iterable[Dict[str, Any]]) -> None:
+        now = datetime.utcnow()
+        rows = {}
+        for customer in customers:
+            contact_name = customer.get("fullname") or " ".join(
+                filter(None, [customer.get("firstname"), customer.get("lastname")])
+            )
+            rows[str(customer.get("id"))] = {
+                "id": uuid.uuid4(),
+                "syncro_customer_id": str(customer.get("id")),
+                "business_name": customer.get("business_name"),
+                "contact_name": contact_name or None,
+                "email": customer.get("email"),
+                "phone": customer.get("phone"),
+                "mobile": customer.get("mobile"),
+                "disabled": bool(customer.get("disabled", False)),
+                "syncro_updated_at": parse_iso_datetime(customer.get("updated_at")),
+                "synced_at": now,
+                "customer_data": customer
+            }
+
+        stmt = pg_insert(SyncroCustomer).values(list(rows.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SyncroCustomer.syncro_customer_id],
+            set_={
+                column: stmt.excluded[column]
+                for column in ("business_name", "contact_name", "email", "phone", "mobile",
+                               "disabled", "syncro_updated_at", "synced_at", "customer_data")
+            }
+        )
+        async with AsyncSessionLocal() as db:
+            await db.execute(stmt)
+            await db.commit()
+
+    async def _remove_missing(self, seen: Set[str], started_at: datetime) -> int:
+        """Drop customers a full refresh did not return (every returned row was re-synced after started_at)"""
+        missing = self.index.ids() - seen
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(SyncroCustomer).where(SyncroCustomer.synced_at < started_at)
+            )
+            await db.commit()
+
+        for customer_id in missing:
+            self._unindex_customer(customer_id)
+        return max(result.rowcount or 0, len(missing))
+
+    async def _load_once(self) -> None:
+        if self.loaded:
+            return
+        try:
+            await self.load()
+        except Exception as e:
+            logger.error(f"Failed to load SyncroMSP customer mirror: {str(e)}")
+            self.last_error = str(e)
+
+    async def _run(self) -> None:
+        await self._load_once()
+
+        while True:
+            full = (
+                self.last_full_refresh_at is None
+                or (datetime.utcnow() - self.last_full_refresh_at).total_seconds() >= self.full_refresh_interval
+            )
+            try:
+                await self.refresh(full=full)
+            except Exception as e:
+                logger.error(f"SyncroMSP customer mirror refresh failed: {str(e)}")
+                self.last_error = str(e)
+            await asyncio.sleep(self.refresh_interval)
+
+    async def _follow(self) -> None:
+        await self._load_once()
+
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                if not self.loaded:
+                    await self.load()
+                else:
+                    await self.catch_up()
+            except Exception as e:
+                logger.error(f"SyncroMSP customer mirror catch-up failed: {str(e)}")
+                self.last_error = str(e)
+
+    async def start(self, leader: bool = True) -> None:
+        """Start refreshing from SyncroMSP (leader) or from the mirror table (follower)"""
+        if not self.enabled or self._task is not None:
+            return
+        self.leading = leader
+        self._task = asyncio.create_task(self._run() if leader else self._follow())
+        logger.info(f"SyncroMSP customer mirror started ({'leader' if leader else 'follower'})")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "leading": self.leading,
+            "ready": self.ready,
+            "refreshing": self._lock.locked(),
+            "customers": len(self.index),
+            "high_water": self.high_water.isoformat() if self.high_water else None,
+            "last_refresh_at": self.last_refresh_at.isoformat() if self.last_refresh_at else None,
+            "last_full_refresh_at": self.last_full_refresh_at.isoformat() if self.last_full_refresh_at else None,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+            "refresh_interval_seconds": self.refresh_interval,
+            "full_refresh_interval_seconds": self.full_refresh_interval
+        }
+
+
+# Create singleton instance
+customer_mirror = SyncroCustomerMirror()
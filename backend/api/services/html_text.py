@@ -0,0 +1,71 @@
+import re
+from html.parser import HTMLParser
+from typing import List, Optional
+
+# Elements whose content is never visible text
+_SKIPPED = frozenset({"script", "style", "head", "title", "noscript", "template", "svg", "iframe", "object"})
+
+# Elements that start a new line of text
+_BLOCKS = frozenset({
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "fieldset", "figcaption",
+    "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav",
+    "ol", "p", "pre", "section", "table", "tbody", "td", "tfoot", "th", "thead", "tr", "ul"
+})
+
+_SPACE = re.compile(r"[^\S\n]+")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+
+
+class _TextExtractor(HTMLParser):
+    """Collects visible text in one pass; entities are decoded by the parser (convert_charrefs)"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIPPED:
+            self._skip_depth += 1
+        elif tag in _BLOCKS:
+            self.parts.append("\n")
+        elif tag == "img":
+            alt = dict(attrs).get("alt")
+            if alt and not self._skip_depth:
+                self.parts.append(f" {alt} ")
+
+    def handle_startendtag(self, tag, attrs):
+        # Void elements such as <br/> and <img/> never open a skipped region
+        if tag not in _SKIPPED:
+            self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag in _SKIPPED:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+        elif tag in _BLOCKS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def html_to_text(html_content: Optional[str]) -> str:
+    """Visible text of an HTML fragment, one line per block element, whitespace normalized"""
+    if not html_content:
+        return ""
+    parser = _TextExtractor()
+    parser.feed(html_content)
+    parser.close()
+    text = "".join(parser.parts).replace("\xa0", " ")
+    lines = (_SPACE.sub(" ", line).strip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n", "\n".join(line for line in lines if line)).strip()
+
+
+def make_excerpt(text: str, length: int = 200) -> str:
+    """First `length` characters of extracted text on one line, cut at a word boundary"""
+    flat = " ".join(text.split())
+    if len(flat) <= length:
+        return flat
+    cut = flat.rfind(" ", 0, length)
+    return flat[:cut if cut > length // 2 else length].rstrip(" ,;:") + "..."
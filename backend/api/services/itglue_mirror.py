@@ -0,0 +1,360 @@
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple, Type
+
+from loguru import logger
+from sqlalchemy import delete, desc, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import (
+    AsyncSessionLocal, ITGlueArticle, ITGlueConfiguration, ITGlueContact, ITGluePassword, ITGlueSyncRun
+)
+from .customer_mirror import parse_iso_datetime
+from .html_text import make_excerpt
+from .itglue_service import itglue_service
+
+# resource -> (mirror table, ITGlue collection endpoint, JSON:API item parser)
+RESOURCES: Dict[str, Tuple[Type, str, Callable[[Dict[str, Any]], Dict[str, Any]]]] = {
+    "articles": (ITGlueArticle, "/articles", itglue_service.parse_article),
+    "configurations": (ITGlueConfiguration, "/configurations", itglue_service.parse_configuration),
+    "contacts": (ITGlueContact, "/contacts", itglue_service.parse_contact),
+    "passwords": (ITGluePassword, "/passwords", itglue_service.parse_password),
+}
+
+_UPSERT_COLUMNS = ("organization_id", "name", "itglue_updated_at", "synced_at", "text", "excerpt", "data")
+
+
+def record_to_row(record: Dict[str, Any], synced_at: datetime) -> Dict[str, Any]:
+    """Map a parsed ITGlue record to a mirror table row (extracted text moves to its own columns)"""
+    organization_id = record.get("organization_id")
+    text = record.get("text")
+    return {
+        "id": uuid.uuid4(),
+        "itglue_id": str(record["id"]),
+        "organization_id": str(organization_id) if organization_id is not None else None,
+        "name": record.get("name"),
+        "itglue_updated_at": parse_iso_datetime(record.get("updated_at")),
+        "synced_at": synced_at,
+        "text": text,
+        "excerpt": make_excerpt(text) if text else None,
+        "data": {key: value for key, value in record.items() if key != "text"}
+    }
+
+
+def run_to_dict(run: ITGlueSyncRun) -> Dict[str, Any]:
+    return {
+        "id": str(run.id),
+        "mode": run.mode,
+        "status": run.status,
+        "started_at": run.started_at.isoformat() if run.started_at else None,
+        "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+        "items_synced": run.items_synced,
+        "errors": run.errors,
+        "results": run.results
+    }
+
+
+class ITGlueMirror:
+    """Local copy of ITGlue articles, configurations, contacts and password metadata.
+
+    Each sync pages all four resources concurrently and upserts them. Incremental
+    runs ask ITGlue only for records updated since the start of the last
+    completed run in itglue_sync_runs (minus an overlap), so pages that landed in
+    a failed run never move the cursor; full runs also delete records ITGlue no
+    longer returns. Every run is recorded in itglue_sync_runs.
+
+    Only the background sync leader syncs on a timer. Every worker replays runs
+    that finished elsewhere to its subscribers (polling itglue_sync_runs every
+    ITGLUE_FOLLOW_SECONDS), so per-worker indexes follow the mirror.
+    """
+
+    def __init__(self):
+        self.enabled = (
+            os.getenv("ITGLUE_SYNC_ENABLED", "true").lower() == "true"
+            and not itglue_service.mock_enabled
+        )
+        self.sync_interval = float(os.getenv("ITGLUE_SYNC_SECONDS", "900"))
+        self.full_sync_interval = float(os.getenv("ITGLUE_FULL_SYNC_SECONDS", "86400"))
+        self.overlap = timedelta(seconds=float(os.getenv("ITGLUE_SYNC_OVERLAP_SECONDS", "60")))
+        self.follow_interval = float(os.getenv("ITGLUE_FOLLOW_SECONDS", "30"))
+        self.leading = False
+        self.last_full_sync_at: Optional[datetime] = None
+        self._ready: Dict[str, bool] = {}
+        self._local_runs: Set[str] = set()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._subscribers: List[Callable[[Dict[str, Any], datetime], Awaitable[None]]] = []
+
+    def subscribe(self, callback: Callable[[Dict[str, Any], datetime], Awaitable[None]]) -> None:
+        """Await `callback(summary, started_at)` after every sync; rows it touched have synced_at >= started_at"""
+        self._subscribers.append(callback)
+
+    async def is_ready(self, db: AsyncSession, resource: str) -> bool:
+        """True once the mirror holds `resource` records (checked against the table until it does)"""
+        if not self._ready.get(resource):
+            model = RESOURCES[resource][0]
+            result = await db.execute(select(model.id).limit(1))
+            self._ready[resource] = result.first() is not None
+        return self._ready[resource]
+
+    # Sync
+
+    async def sync(self, full: bool = False) -> Dict[str, Any]:
+        """Sync every resource from ITGlue (incrementally by updated_at unless full) and record the run"""
+        async with self._lock:
+            started = time.monotonic()
+            started_at = datetime.utcnow()
+            mode = "full" if full else "incremental"
+
+            async with AsyncSessionLocal() as db:
+                since = None
+                if not full:
+                    last_completed = (await db.execute(
+                        select(func.max(ITGlueSyncRun.started_at)).where(ITGlueSyncRun.status == "completed")
+                    )).scalar()
+                    if last_completed:
+                        since = last_completed - self.overlap
+
+                run = ITGlueSyncRun(mode=mode, status="running", started_at=started_at)
+                db.add(run)
+                await db.commit()
+                run_id = run.id
+            self._local_runs.add(str(run_id))
+
+            outcomes = await asyncio.gather(
+                *(self._sync_resource(resource, since, started_at) for resource in RESOURCES),
+                return_exceptions=True
+            )
+
+            results: Dict[str, Any] = {}
+            for resource, outcome in zip(RESOURCES, outcomes):
+                if isinstance(outcome, BaseException):
+                    logger.error(f"ITGlue {resource} sync failed: {str(outcome)}")
+                    results[resource] = {"error": str(outcome)}
+                else:
+                    results[resource] = outcome
+
+            errors = sum(1 for result in results.values() if "error" in result)
+            items_synced = sum(result.get("upserted", 0) for result in results.values())
+            status = "completed" if not errors else ("failed" if errors == len(results) else "partial")
+            finished_at = datetime.utcnow()
+
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(ITGlueSyncRun).where(ITGlueSyncRun.id == run_id).values(
+                        status=status,
+                        finished_at=finished_at,
+                        items_synced=items_synced,
+                        errors=errors,
+                        results=results
+                    )
+                )
+                await db.commit()
+
+            if full and not errors:
+                self.last_full_sync_at = finished_at
+
+            summary = {
+                "run_id": str(run_id),
+                "mode": mode,
+                "status": status,
+                "items_synced": items_synced,
+                "errors": errors,
+                "results": results,
+                "duration_seconds": round(time.monotonic() - started, 3)
+            }
+            logger.info(f"ITGlue mirror sync finished: {summary}")
+            await self._notify(summary, started_at)
+            return summary
+
+    async def _notify(self, summary: Dict[str, Any], started_at: datetime) -> None:
+        for callback in self._subscribers:
+            try:
+                await callback(summary, started_at)
+            except Exception as e:
+                logger.error(f"ITGlue mirror sync subscriber failed: {str(e)}")
+
+    async def _sync_resource(self, resource: str, since: Optional[datetime], started_at: datetime) -> Dict[str, Any]:
+        model, endpoint, parse = RESOURCES[resource]
+
+        params = {"filter[updated_at]": f"{since.isoformat()}Z,*", "sort": "updated_at"} if since else None
+        pages = upserted = removed = 0
+        seen = False
+
+        # Pages arrive concurrently; each is upserted as soon as it lands
+        async for items in itglue_service.iter_pages(endpoint, params=params):
+            pages += 1
+            records = [parse(item) for item in items]
+            if records:
+                seen = True
+                upserted += await self._upsert(model, records)
+
+        # A complete listing means anything this run did not touch is gone from ITGlue
+        # (an empty listing is more likely an upstream problem than zero records)
+        if since is None and seen:
+            removed = await self._remove_missing(model, started_at)
+
+        if seen:
+            self._ready[resource] = True
+
+        return {
+            "mode": "incremental" if since else "full",
+            "since": since.isoformat() if since else None,
+            "pages": pages,
+            "upserted": upserted,
+            "removed": removed
+        }
+
+    async def _upsert(self, model: Type, records: List[Dict[str, Any]]) -> int:
+        now = datetime.utcnow()
+        rows = {str(record["id"]): record_to_row(record, now) for record in records}
+
+        stmt = pg_insert(model).values(list(rows.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[model.itglue_id],
+            set_={column: stmt.excluded[column] for column in _UPSERT_COLUMNS}
+        )
+        async with AsyncSessionLocal() as db:
+            await db.execute(stmt)
+            await db.commit()
+        return len(rows)
+
+    async def _remove_missing(self, model: Type, started_at: datetime) -> int:
+        """Delete rows a complete listing did not touch (synced before this run started)"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(delete(model).where(model.synced_at < started_at))
+            await db.commit()
+        return result.rowcount or 0
+
+    # Reads
+
+    async def list_records(
+        self,
+        db: AsyncSession,
+        resource: str,
+        search: Optional[str] = None,
+        organization_id: Optional[int] = None,
+        limit: int = 100,
+        skip: int = 0
+    ) -> List[Dict[str, Any]]:
+        """Mirrored records by name, filtered in SQL"""
+        model = RESOURCES[resource][0]
+        query = select(model.data)
+        if search:
+            query = query.where(model.name.ilike(f"%{search}%"))
+        if organization_id:
+            query = query.where(model.organization_id == str(organization_id))
+        query = query.order_by(model.name, model.itglue_id).offset(skip).limit(limit)
+        return list((await db.execute(query)).scalars().all())
+
+    async def get_record(self, db: AsyncSession, resource: str, itglue_id: int) -> Optional[Dict[str, Any]]:
+        model = RESOURCES[resource][0]
+        result = await db.execute(select(model.data).where(model.itglue_id == str(itglue_id)))
+        return result.scalar_one_or_none()
+
+    async def sync_status(self, db: AsyncSession) -> Dict[str, Any]:
+        """Last sync run plus the most recent successful one, from itglue_sync_runs"""
+        recent = (await db.execute(
+            select(ITGlueSyncRun).order_by(desc(ITGlueSyncRun.started_at)).limit(10)
+        )).scalars().all()
+        last = recent[0] if recent else None
+        last_success = next((run for run in recent if run.status == "completed"), None)
+
+        next_scheduled = None
+        if self._task is not None and last and last.finished_at:
+            next_scheduled = (last.finished_at + timedelta(seconds=self.sync_interval)).isoformat() + "Z"
+
+        return {
+            "last_sync": last.started_at.isoformat() + "Z" if last else None,
+            "status": last.status if last else "never_synced",
+            "items_synced": last.items_synced if last else 0,
+            "errors": last.errors if last else 0,
+            "last_successful_sync": last_success.finished_at.isoformat() + "Z" if last_success and last_success.finished_at else None,
+            "next_scheduled_sync": next_scheduled,
+            "syncing": self._lock.locked(),
+            "background_sync_enabled": self.enabled,
+            "last_run": run_to_dict(last) if last else None,
+            "recent_runs": [run_to_dict(run) for run in recent]
+        }
+
+    # Background sync
+
+    async def _follow(self) -> None:
+        """Replay runs finished by other workers to this worker's subscribers"""
+        last_seen: Optional[datetime] = None
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    if last_seen is None:
+                        # Startup index builds read the tables, so earlier runs are already in them
+                        latest = (await db.execute(select(func.max(ITGlueSyncRun.finished_at)))).scalar()
+                        last_seen = latest or datetime.min
+                        runs = []
+                    else:
+                        result = await db.execute(
+                            select(ITGlueSyncRun).where(ITGlueSyncRun.finished_at > last_seen)
+                            .order_by(ITGlueSyncRun.finished_at)
+                        )
+                        runs = result.scalars().all()
+            except Exception as e:
+                logger.error(f"ITGlue mirror follow failed: {str(e)}")
+                runs = []
+
+            for run in runs:
+                last_seen = run.finished_at
+                if str(run.id) in self._local_runs:
+                    self._local_runs.discard(str(run.id))
+                    continue
+                await self._notify({
+                    "run_id": str(run.id),
+                    "mode": run.mode,
+                    "status": run.status,
+                    "items_synced": run.items_synced,
+                    "errors": run.errors,
+                    "results": run.results or {}
+                }, run.started_at)
+            await asyncio.sleep(self.follow_interval)
+
+    async def _sync_forever(self) -> None:
+        while True:
+            full = (
+                self.last_full_sync_at is None
+                or (datetime.utcnow() - self.last_full_sync_at).total_seconds() >= self.full_sync_interval
+            )
+            try:
+                await self.sync(full=full)
+            except Exception as e:
+                logger.error(f"ITGlue mirror sync failed: {str(e)}")
+            await asyncio.sleep(self.sync_interval)
+
+    async def _run(self, leader: bool) -> None:
+        if leader:
+            await asyncio.gather(self._sync_forever(), self._follow())
+        else:
+            await self._follow()
+
+    async def start(self, leader: bool = True) -> None:
+        """Start syncing (leader) and following other workers' runs"""
+        if not self.enabled or self._task is not None:
+            return
+        self.leading = leader
+        self._task = asyncio.create_task(self._run(leader))
+        logger.info(f"ITGlue mirror started ({'leader' if leader else 'follower'})")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+# Create singleton instance
+itglue_mirror = ITGlueMirror()
@@ -1,8 +1,14 @@
 import httpx
 import os
-from typing import Dict, Any, Optional, List
+import re
+import asyncio
+from typing import Dict, Any, Optional, List, AsyncIterator
 from loguru import logger
-from datetime import datetime
+
+from .singleflight import SingleFlight, freeze
+from .metrics import upstream_client, upstream_metrics, normalize_path
+from .rate_limit import TokenBucket, parse_retry_after, backoff_delay
+from .html_text import html_to_text, make_excerpt
 
 class ITGlueService:
     def __init__(self):
@@ -23,15 +29,40 @@ class ITGlueService:
         
         # Mock data for development/demo purposes
         self.mock_enabled = not self.api_key
+        
+        self._single_flight = SingleFlight("itglue")
+        upstream_metrics.register_source(self._single_flight)
+        
+        # Bulk paging (mirror sync): parallel pages within ITGlue's request budget
+        self.page_size = int(os.getenv("ITGLUE_PAGE_SIZE", "500"))
+        self.page_concurrency = int(os.getenv("ITGLUE_PAGE_CONCURRENCY", "4"))
+        self.max_attempts = int(os.getenv("ITGLUE_MAX_ATTEMPTS", "4"))
+        self._rate_limiter = TokenBucket(
+            rate=float(os.getenv("ITGLUE_REQUESTS_PER_MINUTE", "500")) / 60,
+            capacity=float(os.getenv("ITGLUE_RATE_LIMIT_BURST", "10"))
+        )
+    
+    def _client(self, **kwargs) -> httpx.AsyncClient:
+        """HTTP client with per-endpoint latency/status metrics"""
+        return upstream_client("itglue", **kwargs)
 
     async def _make_request(self, endpoint: str, method: str = "GET", params: Dict = None, data: Dict = None):
         """Make HTTP request to ITGlue API with error handling"""
         if self.mock_enabled:
             # Return mock data instead of making real API calls
             return await self._get_mock_data(endpoint)
-            
+        
+        if method == "GET":
+            # Concurrent identical reads share one upstream request
+            key = ("GET " + re.sub(r"/\d+", "/{id}", endpoint), endpoint, freeze(params))
+            return await self._single_flight.do(key, self._send_request, endpoint, method, params, data)
+        
+        return await self._send_request(endpoint, method, params, data)
+
+    async def _send_request(self, endpoint: str, method: str, params: Dict = None, data: Dict = None):
+        """Send a request to the ITGlue API, falling back to mock data on failure"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 url = f"{self.base_url}{endpoint}"
                 response = await client.request(
                     method=method,
@@ -57,6 +88,98 @@ class ITGlueService:
             # Fallback to mock data on any other error
             return await self._get_mock_data(endpoint)
 
+    async def _get_page(self, client: httpx.AsyncClient, endpoint: str, page: int, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Fetch one page of a collection under the request budget, retrying 429s (no mock fallback)"""
+        query = {"page[size]": self.page_size, **(params or {}), "page[number]": page}
+        
+        for attempt in range(1, self.max_attempts + 1):
+            await self._rate_limiter.acquire()
+            response = await client.get(f"{self.base_url}{endpoint}", headers=self.headers, params=query)
+            
+            if response.status_code == 200:
+                return response.json()
+            
+            if response.status_code == 429 and attempt < self.max_attempts:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                delay = retry_after if retry_after is not None else backoff_delay(attempt, base=2.0)
+                self._rate_limiter.pause(delay)
+                upstream_metrics.record_retry("itglue", "GET", normalize_path(response.request.url.path), "429")
+                logger.warning(f"ITGlue rate limited on {endpoint} page {page}, retrying in {delay:.1f}s")
+                continue
+            
+            logger.error(f"ITGlue API HTTP error {response.status_code} on {endpoint} page {page}: {response.text}")
+            raise Exception(f"ITGlue API error: {response.status_code}")
+    
+    async def get_total(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        """Record count of a collection from JSON:API meta, fetching a single one-item page"""
+        if self.mock_enabled:
+            return len((await self._get_mock_data(endpoint)).get("data", []))
+        
+        async with self._client(timeout=10.0) as client:
+            data = await self._get_page(client, endpoint, 1, {**(params or {}), "page[size]": 1})
+        return (data.get("meta") or {}).get("total-count")
+    
+    async def iter_pages(
+        self,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        concurrency: Optional[int] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Stream every page of raw JSON:API items from a collection endpoint as they arrive.
+        
+        Page 1 reports `meta.total-pages`; the rest are fetched concurrently and yielded in
+        completion order. Errors are raised rather than replaced with mock data.
+        """
+        if self.mock_enabled:
+            yield (await self._get_mock_data(endpoint)).get("data", [])
+            return
+        
+        concurrency = max(1, concurrency or self.page_concurrency)
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with self._client(timeout=30.0, limits=limits) as client:
+            first = await self._get_page(client, endpoint, 1, params)
+            yield first.get("data", [])
+            
+            meta = first.get("meta") or {}
+            total_pages = meta.get("total-pages")
+            if total_pages is None:
+                # No page count: follow next-page links one at a time
+                page = meta.get("next-page")
+                while page:
+                    data = await self._get_page(client, endpoint, int(page), params)
+                    yield data.get("data", [])
+                    page = (data.get("meta") or {}).get("next-page")
+                return
+            
+            last_page = int(total_pages)
+            if last_page < 2:
+                return
+            
+            queue: asyncio.Queue = asyncio.Queue()
+            pages = iter(range(2, last_page + 1))
+            
+            async def worker():
+                # Workers share one page iterator, so each page is claimed exactly once
+                for page in pages:
+                    try:
+                        data = await self._get_page(client, endpoint, page, params)
+                    except Exception as e:
+                        await queue.put(e)
+                        return
+                    await queue.put(data.get("data", []))
+            
+            workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, last_page - 1))]
+            try:
+                for _ in range(last_page - 1):
+                    result = await queue.get()
+                    if isinstance(result, Exception):
+                        raise result
+                    yield result
+            finally:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
     async def _get_mock_data(self, endpoint: str):
         """Return mock data based on endpoint"""
         if "/articles" in endpoint:
@@ -134,6 +257,88 @@ class ITGlueService:
         else:
             return {"data": []}
 
+    # ============================================================================
+    # JSON:API ITEM PARSING (shared by the live reads and the mirror sync)
+    # ============================================================================
+
+    def _organization_id(self, item: Dict[str, Any]) -> Optional[int]:
+        organization_id = item["attributes"].get("organization-id")
+        if organization_id is None:
+            organization_id = (((item.get("relationships") or {}).get("organization") or {}).get("data") or {}).get("id")
+        return int(organization_id) if organization_id is not None else None
+
+    def parse_article(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        attributes = item["attributes"]
+        text = html_to_text(attributes.get("body"))
+        return {
+            "id": int(item["id"]),
+            "name": attributes["name"],
+            "description": make_excerpt(text),
+            "text": text,
+            "content": attributes.get("body", ""),
+            "category": "General",  # ITGlue doesn't have categories like this
+            "organization_id": self._organization_id(item),
+            "organization": attributes.get("organization-name") or "TechCorp Inc.",
+            "author": "ITGlue User",  # Would come from created-by relationship
+            "tags": [],  # Would need to be extracted from ITGlue tags
+            "updated_at": attributes["updated-at"],
+            "created_at": attributes["created-at"],
+            "bookmarked": False
+        }
+
+    def parse_configuration(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        attributes = item["attributes"]
+        text = html_to_text(attributes.get("notes"))
+        return {
+            "id": int(item["id"]),
+            "name": attributes["name"],
+            "description": text,
+            "text": text,
+            "configuration_type_name": attributes.get("configuration-type-name") or "Server",
+            "organization_id": self._organization_id(item),
+            "organization_name": attributes.get("organization-name") or "TechCorp Inc.",
+            "serial_number": attributes.get("serial-number", "N/A"),
+            "asset_tag": attributes.get("asset-tag", "N/A"),
+            "operating_system": attributes.get("operating-system-notes", "N/A"),
+            "ip_address": attributes.get("primary-ip") or "192.168.1.10",
+            "updated_at": attributes["updated-at"]
+        }
+
+    def parse_password(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        attributes = item["attributes"]
+        return {
+            "id": int(item["id"]),
+            "name": attributes["name"],
+            "resource_name": attributes.get("resource-name", ""),
+            "username": attributes.get("username", ""),
+            "organization_id": self._organization_id(item),
+            "organization_name": attributes.get("organization-name") or "TechCorp Inc.",
+            "url": attributes.get("url", ""),
+            "notes": attributes.get("notes", ""),
+            "updated_at": attributes["updated-at"]
+        }
+
+    def parse_contact(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        attributes = item["attributes"]
+        # Extract email and phone from arrays
+        emails = attributes.get("contact-emails", [])
+        phones = attributes.get("contact-phones", [])
+        
+        return {
+            "id": int(item["id"]),
+            "name": attributes["name"],
+            "title": attributes.get("title", ""),
+            "email": emails[0]["value"] if emails else "",
+            "phone": phones[0]["value"] if phones else "",
+            "phones": [phone["value"] for phone in phones if phone.get("value")],
+            "organization_id": self._organization_id(item),
+            "organization_name": attributes.get("organization-name") or "TechCorp Inc.",
+            "department": "Information Technology",  # Would be a custom field
+            "notes": attributes.get("notes", ""),
+            "text": html_to_text(attributes.get("notes")),
+            "updated_at": attributes["updated-at"]
+        }
+
     async def get_articles(self, limit: int = 100, skip: int = 0, filters: Dict = None):
         """Get knowledge base articles from ITGlue"""
         try:
@@ -151,24 +356,7 @@ class ITGlueService:
             response = await self._make_request("/articles", params=params)
             
             # Transform ITGlue format to our format
-            articles = []
-            for item in response.get("data", []):
-                article = {
-                    "id": int(item["id"]),
-                    "name": item["attributes"]["name"],
-                    "description": self._extract_text_from_html(item["attributes"].get("body", "")),
-                    "content": item["attributes"].get("body", ""),
-                    "category": "General",  # ITGlue doesn't have categories like this
-                    "organization": "TechCorp Inc.",  # Would come from relationships
-                    "author": "ITGlue User",  # Would come from created-by relationship
-                    "tags": [],  # Would need to be extracted from ITGlue tags
-                    "updated_at": item["attributes"]["updated-at"],
-                    "created_at": item["attributes"]["created-at"],
-                    "bookmarked": False
-                }
-                articles.append(article)
-            
-            return articles
+            return [self.parse_article(item) for item in response.get("data", [])]
             
         except Exception as e:
             logger.error(f"Error getting articles from ITGlue: {e}")
@@ -180,20 +368,7 @@ class ITGlueService:
             response = await self._make_request(f"/articles/{article_id}")
             
             if response.get("data"):
-                item = response["data"]
-                return {
-                    "id": int(item["id"]),
-                    "name": item["attributes"]["name"],
-                    "description": self._extract_text_from_html(item["attributes"].get("body", "")),
-                    "content": item["attributes"].get("body", ""),
-                    "category": "General",
-                    "organization": "TechCorp Inc.",
-                    "author": "ITGlue User",
-                    "tags": [],
-                    "updated_at": item["attributes"]["updated-at"],
-                    "created_at": item["attributes"]["created-at"],
-                    "bookmarked": False
-                }
+                return self.parse_article(response["data"])
             return None
             
         except Exception as e:
@@ -216,23 +391,7 @@ class ITGlueService:
             
             response = await self._make_request("/configurations", params=params)
             
-            configurations = []
-            for item in response.get("data", []):
-                config = {
-                    "id": int(item["id"]),
-                    "name": item["attributes"]["name"],
-                    "description": item["attributes"].get("notes", ""),
-                    "configuration_type_name": "Server",  # Would come from configuration-type relationship
-                    "organization_name": "TechCorp Inc.",  # Would come from organization relationship
-                    "serial_number": item["attributes"].get("serial-number", "N/A"),
-                    "asset_tag": item["attributes"].get("asset-tag", "N/A"),
-                    "operating_system": item["attributes"].get("operating-system-notes", "N/A"),
-                    "ip_address": "192.168.1.10",  # Would be extracted from IP addresses
-                    "updated_at": item["attributes"]["updated-at"]
-                }
-                configurations.append(config)
-            
-            return configurations
+            return [self.parse_configuration(item) for item in response.get("data", [])]
             
         except Exception as e:
             logger.error(f"Error getting configurations from ITGlue: {e}")
@@ -254,33 +413,21 @@ class ITGlueService:
             
             response = await self._make_request("/passwords", params=params)
             
-            passwords = []
-            for item in response.get("data", []):
-                password = {
-                    "id": int(item["id"]),
-                    "name": item["attributes"]["name"],
-                    "resource_name": item["attributes"].get("resource-name", ""),
-                    "username": item["attributes"].get("username", ""),
-                    "organization_name": "TechCorp Inc.",  # Would come from organization relationship
-                    "url": item["attributes"].get("url", ""),
-                    "notes": item["attributes"].get("notes", ""),
-                    "updated_at": item["attributes"]["updated-at"]
-                }
-                passwords.append(password)
-            
-            return passwords
+            return [self.parse_password(item) for item in response.get("data", [])]
             
         except Exception as e:
             logger.error(f"Error getting passwords from ITGlue: {e}")
             return []
 
-    async def get_contacts(self, limit: int = 100, skip: int = 0, filters: Dict = None):
+    async def get_contacts(self, limit: int = 100, skip: int = 0, filters: Dict = None, sort: str = None):
         """Get contacts from ITGlue"""
         try:
             params = {
                 "page[size]": limit,
                 "page[number]": (skip // limit) + 1 if limit > 0 else 1
             }
+            if sort:
+                params["sort"] = sort
             
             if filters:
                 if filters.get("search"):
@@ -290,26 +437,7 @@ class ITGlueService:
             
             response = await self._make_request("/contacts", params=params)
             
-            contacts = []
-            for item in response.get("data", []):
-                # Extract email and phone from arrays
-                emails = item["attributes"].get("contact-emails", [])
-                phones = item["attributes"].get("contact-phones", [])
-                
-                contact = {
-                    "id": int(item["id"]),
-                    "name": item["attributes"]["name"],
-                    "title": item["attributes"].get("title", ""),
-                    "email": emails[0]["value"] if emails else "",
-                    "phone": phones[0]["value"] if phones else "",
-                    "organization_name": "TechCorp Inc.",  # Would come from organization relationship
-                    "department": "Information Technology",  # Would be a custom field
-                    "notes": item["attributes"].get("notes", ""),
-                    "updated_at": item["attributes"]["updated-at"]
-                }
-                contacts.append(contact)
-            
-            return contacts
+            return [self.parse_contact(item) for item in response.get("data", [])]
             
         except Exception as e:
             logger.error(f"Error getting contacts from ITGlue: {e}")
@@ -329,63 +457,6 @@ class ITGlueService:
             {"id": 8, "name": "Emergency Procedures", "article_count": 7}
         ]
 
-    async def sync_all_data(self):
-        """Sync all data from ITGlue"""
-        try:
-            results = {
-                "articles_synced": 0,
-                "configurations_synced": 0,
-                "passwords_synced": 0,
-                "contacts_synced": 0,
-                "categories_updated": 0
-            }
-            
-            # In a real implementation, you would:
-            # 1. Fetch all data from ITGlue
-            # 2. Store/update in local database
-            # 3. Track sync results
-            
-            if self.mock_enabled:
-                # Return mock sync results
-                results.update({
-                    "articles_synced": 156,
-                    "configurations_synced": 89,
-                    "passwords_synced": 45,
-                    "contacts_synced": 78,
-                    "categories_updated": 12
-                })
-            else:
-                # Perform actual sync operations
-                articles = await self.get_articles(limit=1000)
-                results["articles_synced"] = len(articles)
-                
-                configurations = await self.get_configurations(limit=1000)
-                results["configurations_synced"] = len(configurations)
-                
-                passwords = await self.get_passwords(limit=1000)
-                results["passwords_synced"] = len(passwords)
-                
-                contacts = await self.get_contacts(limit=1000)
-                results["contacts_synced"] = len(contacts)
-                
-                results["categories_updated"] = 8  # Mock value
-            
-            return results
-            
-        except Exception as e:
-            logger.error(f"Error syncing data from ITGlue: {e}")
-            raise
-
-    async def get_sync_status(self):
-        """Get the status of the last sync operation"""
-        return {
-            "last_sync": datetime.utcnow().replace(hour=10, minute=30, second=0).isoformat() + "Z",
-            "status": "completed",
-            "items_synced": 368,
-            "errors": 0,
-            "next_scheduled_sync": datetime.utcnow().replace(hour=10, minute=30, second=0, day=16).isoformat() + "Z"
-        }
-
     async def global_search(self, query: str, content_type: str = None, organization_id: int = None, limit: int = 50):
         """Perform a global search across all ITGlue content"""
         try:
@@ -424,16 +495,5 @@ class ITGlueService:
             logger.error(f"Error performing global search: {e}")
             return []
 
-    def _extract_text_from_html(self, html_content: str) -> str:
-        """Extract plain text from HTML content for descriptions"""
-        if not html_content:
-            return ""
-        
-        # Simple HTML tag removal - in production you'd use a proper HTML parser
-        import re
-        text = re.sub(r'<[^>]+>', '', html_content)
-        text = re.sub(r'\s+', ' ', text).strip()
-        return text[:200] + "..." if len(text) > 200 else text
-
 # Create a global instance
 itglue_service = ITGlueService() 
\ No newline at end of file
@@ -0,0 +1,422 @@
+import asyncio
+import heapq
+import html
+import math
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+from sqlalchemy import select
+
+from ..database import AsyncSessionLocal
+from .html_text import html_to_text
+from .itglue_mirror import RESOURCES, itglue_mirror
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_WORD = re.compile(r"[A-Za-z0-9]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it of on or that the this to was what when where "
+    "which who why will with".split()
+)
+
+# Indexed fields, in posting order
+FIELDS = ("title", "body", "extra")
+DEFAULT_BOOSTS = {"title": 3.0, "body": 1.0, "extra": 1.5}
+
+# resource -> result type
+RESULT_TYPES = {"articles": "article", "configurations": "configuration", "contacts": "contact", "passwords": "password"}
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def record_text(record: Dict[str, Any], html_key: str) -> str:
+    """Plain text extracted at sync time; rows mirrored before extraction existed are parsed here once"""
+    text = record.get("text")
+    return text if text is not None else html_to_text(record.get(html_key))
+
+
+def document_fields(resource: str, record: Dict[str, Any]) -> Dict[str, str]:
+    """Searchable title/body/extra text for a mirrored ITGlue record"""
+    def join(*keys: str) -> str:
+        return " ".join(str(record[key]) for key in keys if record.get(key) and record[key] != "N/A")
+
+    if resource == "articles":
+        return {"title": record.get("name") or "", "body": record_text(record, "content"), "extra": join("category", "organization")}
+    if resource == "configurations":
+        return {
+            "title": record.get("name") or "",
+            "body": record_text(record, "description"),
+            "extra": join("configuration_type_name", "serial_number", "asset_tag", "operating_system", "ip_address", "organization_name")
+        }
+    if resource == "contacts":
+        return {
+            "title": record.get("name") or "",
+            "body": record_text(record, "notes"),
+            "extra": " ".join([join("title", "email", "organization_name", "department"), *(record.get("phones") or [])])
+        }
+    # Password entries: metadata only, never notes
+    return {"title": record.get("name") or "", "body": "", "extra": join("resource_name", "username", "url", "organization_name")}
+
+
+class KnowledgeSearchIndex:
+    """In-memory inverted index over mirrored ITGlue records, ranked with BM25F.
+
+    Each document has title, body and extra fields; a term's frequency in each field
+    is length-normalized per field and weighted by the field boost before BM25
+    saturation, so a match in a short title outranks the same word deep in a body.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, boosts: Optional[Dict[str, float]] = None):
+        self.k1 = k1
+        self.b = b
+        self.boosts = {**DEFAULT_BOOSTS, **(boosts or {})}
+        self._keys: Dict[Tuple[str, str], int] = {}
+        self._docs: Dict[int, Dict[str, Any]] = {}
+        self._postings: Dict[str, Dict[int, Tuple[int, int, int]]] = {}
+        self._total_lengths = [0, 0, 0]
+        self._next_doc = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(
+        self,
+        resource: str,
+        record: Dict[str, Any],
+        organization_id: Optional[str] = None,
+        fields: Optional[Dict[str, str]] = None,
+        key: Optional[str] = None
+    ) -> None:
+        """Index `record` (or, given `fields` and `key`, one passage of it)"""
+        key = (resource, str(key if key is not None else record["id"]))
+        self.remove(*key)
+
+        fields = fields if fields is not None else document_fields(resource, record)
+        frequencies: Dict[str, List[int]] = {}
+        lengths = []
+        for i, field in enumerate(FIELDS):
+            tokens = tokenize(fields[field])
+            lengths.append(len(tokens))
+            for token in tokens:
+                counts = frequencies.get(token)
+                if counts is None:
+                    frequencies[token] = counts = [0, 0, 0]
+                counts[i] += 1
+
+        doc = self._next_doc
+        self._next_doc += 1
+        self._keys[key] = doc
+        self._docs[doc] = {
+            "resource": resource,
+            "record": record,
+            "organization_id": str(organization_id) if organization_id is not None else None,
+            "fields": fields,
+            "lengths": lengths,
+            "terms": set(frequencies)
+        }
+        for i, length in enumerate(lengths):
+            self._total_lengths[i] += length
+        postings = self._postings
+        for term, counts in frequencies.items():
+            entry = postings.get(term)
+            if entry is None:
+                postings[term] = entry = {}
+            entry[doc] = tuple(counts)
+
+    def remove(self, resource: str, record_id: str) -> None:
+        doc = self._keys.pop((resource, str(record_id)), None)
+        if doc is None:
+            return
+        entry = self._docs.pop(doc)
+        for i, length in enumerate(entry["lengths"]):
+            self._total_lengths[i] -= length
+        for term in entry["terms"]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc, None)
+                if not postings:
+                    del self._postings[term]
+
+    def search(
+        self,
+        query: str,
+        resource: Optional[str] = None,
+        organization_id: Optional[str] = None,
+        limit: int = 50,
+        boosts: Optional[Dict[str, float]] = None,
+        max_terms: Optional[int] = None,
+        max_df_ratio: Optional[float] = None
+    ) -> List[Tuple[float, Dict[str, Any], Set[str]]]:
+        """Top `limit` (score, document, matched terms) for `query`, best first.
+
+        `max_terms` and `max_df_ratio` bound the work per query: only the rarest
+        `max_terms` terms are scored, and terms in more than `max_df_ratio` of all
+        documents (and over 1000 postings) are skipped while rarer terms remain.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self._docs:
+            return []
+
+        n = len(self._docs)
+        if max_terms is not None or max_df_ratio is not None:
+            terms = sorted((term for term in terms if term in self._postings), key=lambda term: len(self._postings[term]))
+            if max_df_ratio is not None:
+                cap = max(max_df_ratio * n, 1000)
+                rare = [term for term in terms if len(self._postings[term]) <= cap]
+                terms = rare or terms[:1]
+            if max_terms is not None:
+                terms = terms[:max_terms]
+
+        weights = [({**self.boosts, **(boosts or {})})[field] for field in FIELDS]
+        average_lengths = [max(total / n, 1.0) for total in self._total_lengths]
+        organization_id = str(organization_id) if organization_id is not None else None
+
+        scores: Dict[int, float] = {}
+        matched: Dict[int, Set[str]] = {}
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+
+            for doc, frequencies in postings.items():
+                entry = self._docs[doc]
+                if resource and entry["resource"] != resource:
+                    continue
+                if organization_id and entry["organization_id"] != organization_id:
+                    continue
+
+                lengths = entry["lengths"]
+                tf = 0.0
+                for i, frequency in enumerate(frequencies):
+                    if frequency:
+                        tf += weights[i] * frequency / (1 - self.b + self.b * lengths[i] / average_lengths[i])
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / (tf + self.k1)
+                matched.setdefault(doc, set()).add(term)
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(score, self._docs[doc], matched[doc]) for doc, score in best]
+
+    def stats(self) -> Dict[str, Any]:
+        by_type: Dict[str, int] = {}
+        for doc in self._docs.values():
+            by_type[doc["resource"]] = by_type.get(doc["resource"], 0) + 1
+        return {"documents": len(self._docs), "documents_by_type": by_type, "terms": len(self._postings)}
+
+
+def mark(text: str, terms: Set[str]) -> str:
+    """HTML-escape `text`, wrapping words that are in `terms` in <mark>"""
+    parts, position = [], 0
+    for match in _WORD.finditer(text):
+        if match.group().lower() in terms:
+            parts.append(html.escape(text[position:match.start()]))
+            parts.append(f"<mark>{html.escape(match.group())}</mark>")
+            position = match.end()
+    parts.append(html.escape(text[position:]))
+    return "".join(parts)
+
+
+def highlight(text: str, terms: Set[str], width: int = 160) -> Tuple[str, str]:
+    """(plain, highlighted) snippet of `text` around the densest cluster of matched terms"""
+    if not text:
+        return "", ""
+
+    hits = [(match.start(), match.group().lower()) for match in _WORD.finditer(text) if match.group().lower() in terms]
+    best_start = 0
+    if hits:
+        # Slide a window of `width` characters over the hits; keep the one covering the most distinct terms
+        best_count, covered, j = 0, Counter(), 0
+        for i, (position, _) in enumerate(hits):
+            while j < len(hits) and hits[j][0] < position + width:
+                covered[hits[j][1]] += 1
+                j += 1
+            if len(covered) > best_count:
+                best_start, best_count = position, len(covered)
+            covered[hits[i][1]] -= 1
+            if not covered[hits[i][1]]:
+                del covered[hits[i][1]]
+
+    start = max(0, best_start - width // 4)
+    if start > 0:
+        # Don't cut a word in half
+        start = text.rfind(" ", 0, start) + 1
+    end = min(len(text), start + width)
+    if end < len(text):
+        space = text.rfind(" ", start, end)
+        end = space if space > start else end
+
+    prefix = "..." if start > 0 else ""
+    suffix = "..." if end < len(text) else ""
+    window = text[start:end]
+    return prefix + window + suffix, prefix + mark(window, terms) + suffix
+
+
+# Syncs touching more rows than this rebuild the index off the event loop instead of patching it
+INCREMENTAL_MAX_ROWS = int(os.getenv("KB_INDEX_INCREMENTAL_MAX_ROWS", "200"))
+
+
+def sync_needs_rebuild(summary: Dict[str, Any]) -> bool:
+    """Whether a mirror sync should rebuild an index rather than patch it in place"""
+    return summary.get("mode") == "full" or any(result.get("removed") for result in summary["results"].values())
+
+
+async def load_mirror_rows(since: Optional[datetime] = None) -> List[Tuple[str, Optional[str], Dict[str, Any]]]:
+    """(resource, organization_id, record) for every mirrored ITGlue row (synced at or after `since`)"""
+    rows = []
+    async with AsyncSessionLocal() as db:
+        for resource, (model, _, _) in RESOURCES.items():
+            query = select(model.organization_id, model.data, model.text)
+            if since is not None:
+                query = query.where(model.synced_at >= since)
+            for organization_id, data, text in (await db.execute(query)).all():
+                if data:
+                    rows.append((resource, organization_id, {**data, "text": text} if text is not None else data))
+    return rows
+
+
+class KnowledgeSearch:
+    """BM25 search over the ITGlue mirror, kept current through the mirror's sync subscription.
+
+    The index is built from the mirror tables on startup (in a worker thread, then
+    swapped in). Small incremental syncs re-index only the rows they touched,
+    yielding to the event loop between records; full syncs and large deltas
+    trigger a rebuild.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("KB_SEARCH_INDEX_ENABLED", "true").lower() == "true"
+        self.boosts = {
+            field: float(os.getenv(f"KB_SEARCH_BOOST_{field.upper()}", str(DEFAULT_BOOSTS[field])))
+            for field in FIELDS
+        }
+        self.index = KnowledgeSearchIndex(boosts=self.boosts)
+        self.loaded = False
+        self.last_build_at: Optional[datetime] = None
+        self.last_build_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        itglue_mirror.subscribe(self._on_sync)
+
+    @property
+    def ready(self) -> bool:
+        return self.loaded and len(self.index) > 0
+
+    async def rebuild(self) -> int:
+        """Build a fresh index from the mirror tables and swap it in"""
+        async with self._lock:
+            started = time.monotonic()
+            rows = await load_mirror_rows()
+
+            def build() -> KnowledgeSearchIndex:
+                index = KnowledgeSearchIndex(boosts=self.boosts)
+                for resource, organization_id, record in rows:
+                    index.add(resource, record, organization_id)
+                return index
+
+            self.index = await asyncio.to_thread(build)
+            self.loaded = True
+            self.last_build_at = datetime.utcnow()
+            self.last_build_seconds = round(time.monotonic() - started, 3)
+            self.last_error = None
+            logger.info(f"Knowledge search index built: {len(self.index)} documents in {self.last_build_seconds}s")
+            return len(self.index)
+
+    async def _on_sync(self, summary: Dict[str, Any], started_at: datetime) -> None:
+        if not self.loaded or sync_needs_rebuild(summary):
+            await self.rebuild()
+            return
+
+        rows = await load_mirror_rows(since=started_at)
+        if len(rows) > INCREMENTAL_MAX_ROWS:
+            await self.rebuild()
+            return
+
+        async with self._lock:
+            for resource, organization_id, record in rows:
+                self.index.add(resource, record, organization_id)
+                # Keep queries flowing between records
+                await asyncio.sleep(0)
+
+    def search(
+        self,
+        query: str,
+        content_type: Optional[str] = None,
+        organization_id: Optional[int] = None,
+        limit: int = 50,
+        boosts: Optional[Dict[str, float]] = None
+    ) -> List[Dict[str, Any]]:
+        """Ranked results in the /knowledge-base/search shape, with highlighted snippets"""
+        hits = self.index.search(query, resource=content_type, organization_id=organization_id, limit=limit, boosts=boosts)
+
+        results = []
+        for score, doc, terms in hits:
+            record, resource = doc["record"], doc["resource"]
+            fields = doc["fields"]
+            excerpt, highlighted = highlight(fields["body"] or fields["extra"], terms)
+
+            results.append({
+                "type": RESULT_TYPES[resource],
+                "id": record["id"],
+                "title": record.get("name"),
+                "title_highlighted": mark(fields["title"], terms),
+                "excerpt": excerpt,
+                "highlighted": highlighted,
+                "matched_terms": sorted(terms),
+                "organization_id": doc["organization_id"],
+                "relevance_score": round(score, 4),
+                "url": f"/knowledge-base/{resource}/{record['id']}"
+            })
+        return results
+
+    async def start(self) -> None:
+        """Build the index from the mirror in the background"""
+        if not self.enabled or self._task is not None:
+            return
+
+        async def build():
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.error(f"Knowledge search index build failed: {str(e)}")
+                self.last_error = str(e)
+
+        self._task = asyncio.create_task(build())
+
+    async def wait_built(self) -> None:
+        """Wait for the startup build, if one was started"""
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            **self.index.stats(),
+            "boosts": self.boosts,
+            "last_build_at": self.last_build_at.isoformat() if self.last_build_at else None,
+            "last_build_seconds": self.last_build_seconds,
+            "last_error": self.last_error
+        }
+
+
+# Create singleton instance
+knowledge_search = KnowledgeSearch()
@@ -0,0 +1,262 @@
+import asyncio
+import os
+import re
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from .itglue_mirror import itglue_mirror
+from .knowledge_index import (
+    INCREMENTAL_MAX_ROWS, KnowledgeSearchIndex, RESULT_TYPES, document_fields, load_mirror_rows, sync_needs_rebuild
+)
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+# Password metadata is never handed to a live call
+RETRIEVABLE = ("articles", "configurations", "contacts")
+# Without a known organization, configurations (serials, IPs) and contacts would
+# reach an unverified caller from any organization; only articles are searched
+UNSCOPED_RETRIEVABLE = "articles"
+
+
+def chunk_text(text: str, max_words: int = 120, overlap_sentences: int = 1) -> List[str]:
+    """Split `text` into passages of whole sentences, about `max_words` words each.
+
+    Consecutive passages share `overlap_sentences` sentences so an answer that
+    straddles a boundary is still retrievable from one passage.
+    """
+    sentences = [sentence.strip() for sentence in _SENTENCE.split(text) if sentence.strip()]
+    chunks: List[str] = []
+    current: List[str] = []
+    words = 0
+
+    for sentence in sentences:
+        length = len(sentence.split())
+        if current and words + length > max_words:
+            chunks.append(" ".join(current))
+            current = current[-overlap_sentences:] if overlap_sentences else []
+            words = sum(len(s.split()) for s in current)
+        current.append(sentence)
+        words += length
+
+    if current and (not chunks or " ".join(current) != chunks[-1]):
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def build_passages(resource: str, record: Dict[str, Any], max_words: int = 120) -> List[Dict[str, str]]:
+    """Passages (title/body/extra fields) for one mirrored record"""
+    fields = document_fields(resource, record)
+    if resource == "articles":
+        chunks = chunk_text(fields["body"], max_words) or [fields["body"]]
+        return [{"title": fields["title"], "body": chunk, "extra": fields["extra"]} for chunk in chunks]
+
+    # Configurations and contacts are short: one passage that reads well aloud
+    body = ". ".join(part for part in (fields["body"], fields["extra"]) if part)
+    return [{"title": fields["title"], "body": body, "extra": ""}]
+
+
+class KnowledgeRetriever:
+    """Top-k passage retrieval for RetellAI agent tool calls during a live call.
+
+    Everything needed to answer is precomputed: records are chunked into passages
+    and indexed in memory when the ITGlue mirror syncs, so a lookup is pure CPU
+    with bounded work per query (rarest terms only) and never touches ITGlue or
+    the database.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("KB_RETRIEVAL_ENABLED", "true").lower() == "true"
+        self.budget_ms = float(os.getenv("KB_RETRIEVAL_BUDGET_MS", "50"))
+        self.chunk_words = int(os.getenv("KB_RETRIEVAL_CHUNK_WORDS", "120"))
+        self.default_top_k = int(os.getenv("KB_RETRIEVAL_TOP_K", "3"))
+        self.max_top_k = 10
+        self.max_query_terms = int(os.getenv("KB_RETRIEVAL_MAX_QUERY_TERMS", "12"))
+        self.max_df_ratio = float(os.getenv("KB_RETRIEVAL_MAX_DF_RATIO", "0.25"))
+        self.index = KnowledgeSearchIndex(boosts={"title": 2.0, "body": 1.0, "extra": 1.0})
+        self._passages: Dict[Tuple[str, str], List[str]] = {}
+        self.loaded = False
+        self.last_build_at: Optional[datetime] = None
+        self.last_build_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.requests = 0
+        self.over_budget = 0
+        self._latencies_ms: deque = deque(maxlen=2000)
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        itglue_mirror.subscribe(self._on_sync)
+
+    @property
+    def ready(self) -> bool:
+        return self.loaded and len(self.index) > 0
+
+    # Index maintenance
+
+    def add_record(self, resource: str, record: Dict[str, Any], organization_id: Optional[str] = None,
+                   index: Optional[KnowledgeSearchIndex] = None, passages: Optional[Dict] = None) -> int:
+        """(Re)index the passages of one record, returning how many it produced"""
+        if resource not in RETRIEVABLE:
+            return 0
+        index = index if index is not None else self.index
+        passages = passages if passages is not None else self._passages
+
+        record_key = (resource, str(record["id"]))
+        for key in passages.pop(record_key, []):
+            index.remove(resource, key)
+
+        keys = []
+        for n, fields in enumerate(build_passages(resource, record, self.chunk_words)):
+            if not fields["body"] and not fields["title"]:
+                continue
+            key = f"{record['id']}#{n}"
+            index.add(resource, record, organization_id, fields=fields, key=key)
+            keys.append(key)
+        passages[record_key] = keys
+        return len(keys)
+
+    async def rebuild(self) -> int:
+        """Chunk and index every mirrored record in a worker thread, then swap the index in"""
+        async with self._lock:
+            started = time.monotonic()
+            rows = await load_mirror_rows()
+
+            def build() -> Tuple[KnowledgeSearchIndex, Dict]:
+                index = KnowledgeSearchIndex(boosts=self.index.boosts)
+                passages: Dict[Tuple[str, str], List[str]] = {}
+                for resource, organization_id, record in rows:
+                    self.add_record(resource, record, organization_id, index=index, passages=passages)
+                return index, passages
+
+            self.index, self._passages = await asyncio.to_thread(build)
+            self.loaded = True
+            self.last_build_at = datetime.utcnow()
+            self.last_build_seconds = round(time.monotonic() - started, 3)
+            self.last_error = None
+            logger.info(f"Knowledge retrieval index built: {len(self.index)} passages in {self.last_build_seconds}s")
+            return len(self.index)
+
+    async def _on_sync(self, summary: Dict[str, Any], started_at: datetime) -> None:
+        # Chunking is ~1ms per record: anything but a small delta is rebuilt off the event loop
+        if not self.loaded or sync_needs_rebuild(summary):
+            await self.rebuild()
+            return
+
+        rows = await load_mirror_rows(since=started_at)
+        if len(rows) > INCREMENTAL_MAX_ROWS:
+            await self.rebuild()
+            return
+
+        async with self._lock:
+            for resource, organization_id, record in rows:
+                self.add_record(resource, record, organization_id)
+                await asyncio.sleep(0)
+
+    # Retrieval
+
+    def retrieve(self, query: str, organization_id: Optional[int] = None, top_k: Optional[int] = None) -> Dict[str, Any]:
+        """Best `top_k` passages for `query` within one organization, or from articles only without one"""
+        started = time.perf_counter()
+        top_k = max(1, min(top_k or self.default_top_k, self.max_top_k))
+
+        hits = self.index.search(
+            query,
+            resource=UNSCOPED_RETRIEVABLE if organization_id is None else None,
+            organization_id=organization_id,
+            limit=top_k,
+            max_terms=self.max_query_terms,
+            max_df_ratio=self.max_df_ratio
+        )
+        passages = [
+            {
+                "text": doc["fields"]["body"],
+                "title": doc["fields"]["title"],
+                "source_type": RESULT_TYPES[doc["resource"]],
+                "source_id": doc["record"]["id"],
+                "organization_id": doc["organization_id"],
+                "score": round(score, 4)
+            }
+            for score, doc, _ in hits
+        ]
+
+        took_ms = (time.perf_counter() - started) * 1000
+        self.requests += 1
+        self._latencies_ms.append(took_ms)
+        if took_ms > self.budget_ms:
+            self.over_budget += 1
+            logger.warning(f"Knowledge retrieval over budget: {took_ms:.1f}ms for {query!r}")
+
+        return {
+            "query": query,
+            "organization_id": organization_id,
+            "passages": passages,
+            # Ready-to-use context for the agent's next turn
+            "context": "\n\n".join(f"{p['title']}: {p['text']}" for p in passages),
+            "ready": self.ready,
+            "took_ms": round(took_ms, 3),
+            "budget_ms": self.budget_ms
+        }
+
+    # Lifecycle
+
+    async def start(self) -> None:
+        """Build the passage index from the mirror in the background"""
+        if not self.enabled or self._task is not None:
+            return
+
+        async def build():
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.error(f"Knowledge retrieval index build failed: {str(e)}")
+                self.last_error = str(e)
+
+        self._task = asyncio.create_task(build())
+
+    async def wait_built(self) -> None:
+        """Wait for the startup build, if one was started"""
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies_ms)
+
+        def percentile(q: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 3)
+
+        return {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "passages": len(self.index),
+            "records": len(self._passages),
+            "budget_ms": self.budget_ms,
+            "requests": self.requests,
+            "over_budget": self.over_budget,
+            "latency_ms": {
+                "p50": percentile(0.5),
+                "p99": percentile(0.99),
+                "max": round(latencies[-1], 3) if latencies else None
+            },
+            "last_build_at": self.last_build_at.isoformat() if self.last_build_at else None,
+            "last_build_seconds": self.last_build_seconds,
+            "last_error": self.last_error
+        }
+
+
+# Create singleton instance
+knowledge_retriever = KnowledgeRetriever()
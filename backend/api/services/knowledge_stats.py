@@ -0,0 +1,172 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from loguru import logger
+from sqlalchemy import func, select
+
+from ..database import AsyncSessionLocal, ITGlueArticle, ITGlueSyncRun
+from .itglue_mirror import RESOURCES, itglue_mirror
+from .itglue_service import itglue_service
+
+
+class KnowledgeBaseStats:
+    """Knowledge base landing page counts, cached and refreshed in the background.
+
+    Counts come from the local ITGlue mirror in one query once it holds data,
+    otherwise from ITGlue's `meta.total-count` with all lookups made concurrently.
+    Reads never wait on a refresh once a value exists: a stale value is returned
+    while one shared refresh runs. Only the sync leader refreshes on a timer;
+    other workers refresh on demand and after mirror syncs.
+    """
+
+    def __init__(self):
+        self.ttl = float(os.getenv("KB_STATS_TTL_SECONDS", "300"))
+        self.refresh_interval = float(os.getenv("KB_STATS_REFRESH_SECONDS", "240"))
+        self.recent_days = int(os.getenv("KB_STATS_RECENT_DAYS", "7"))
+        self._value: Optional[Dict[str, Any]] = None
+        self._computed_at: Optional[float] = None
+        self._refreshing: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self.last_error: Optional[str] = None
+
+        itglue_mirror.subscribe(self._on_sync)
+
+    async def get(self) -> Dict[str, Any]:
+        """Cached stats; computes on first use and refreshes in the background once stale"""
+        if self._value is None:
+            return await self.refresh()
+
+        age = time.monotonic() - self._computed_at
+        if age >= self.ttl:
+            self._start_refresh()
+        return {**self._value, "cache_age_seconds": round(age, 1), "stale": age >= self.ttl}
+
+    def cached(self) -> Optional[Dict[str, Any]]:
+        """The last computed stats, however old, or None if there are none"""
+        if self._value is None:
+            return None
+        age = time.monotonic() - self._computed_at
+        return {**self._value, "cache_age_seconds": round(age, 1), "stale": True, "last_error": self.last_error}
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._compute_and_store())
+            self._refreshing.add_done_callback(self._refresh_done)
+        return self._refreshing
+
+    def _refresh_done(self, task: asyncio.Task) -> None:
+        # Background refreshes often have no awaiter; record their failures here
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            self.last_error = str(error)
+            logger.error(f"Knowledge base stats refresh failed: {str(error)}")
+
+    async def refresh(self) -> Dict[str, Any]:
+        """Recompute now (joining a refresh already in flight)"""
+        value = await asyncio.shield(self._start_refresh())
+        return {**value, "cache_age_seconds": 0.0, "stale": False}
+
+    async def _mirror_ready(self) -> bool:
+        try:
+            async with AsyncSessionLocal() as db:
+                return await itglue_mirror.is_ready(db, "articles")
+        except Exception as e:
+            logger.warning(f"ITGlue mirror unavailable for stats, using ITGlue counts: {str(e)}")
+            return False
+
+    async def _compute_and_store(self) -> Dict[str, Any]:
+        started = time.monotonic()
+        value = await (self._from_mirror() if await self._mirror_ready() else self._from_itglue())
+
+        value["computed_at"] = datetime.utcnow().isoformat()
+        value["compute_ms"] = round((time.monotonic() - started) * 1000, 1)
+        self._value = value
+        self._computed_at = time.monotonic()
+        self.last_error = None
+        return value
+
+    async def _from_mirror(self) -> Dict[str, Any]:
+        recent_since = datetime.utcnow() - timedelta(days=self.recent_days)
+        counts = {
+            resource: select(func.count()).select_from(model).scalar_subquery().label(resource)
+            for resource, (model, _, _) in RESOURCES.items()
+        }
+        recent = select(func.count()).select_from(ITGlueArticle).where(
+            ITGlueArticle.itglue_updated_at >= recent_since
+        ).scalar_subquery().label("recent_updates")
+        last_sync = select(func.max(ITGlueSyncRun.finished_at)).where(
+            ITGlueSyncRun.status == "completed"
+        ).scalar_subquery().label("last_sync")
+
+        # One round trip for every count
+        async with AsyncSessionLocal() as db:
+            row = (await db.execute(select(*counts.values(), recent, last_sync))).one()
+
+        categories = await itglue_service.get_categories()
+        return {
+            "total_articles": row.articles,
+            "total_categories": len(categories),
+            "recent_updates": row.recent_updates,
+            "configurations": row.configurations,
+            "passwords": row.passwords,
+            "contacts": row.contacts,
+            "last_sync": row.last_sync.isoformat() + "Z" if row.last_sync else None,
+            "source": "local_mirror"
+        }
+
+    async def _from_itglue(self) -> Dict[str, Any]:
+        recent_since = (datetime.utcnow() - timedelta(days=self.recent_days)).isoformat() + "Z"
+        endpoints = {resource: endpoint for resource, (_, endpoint, _) in RESOURCES.items()}
+
+        totals = await asyncio.gather(
+            *(itglue_service.get_total(endpoint) for endpoint in endpoints.values()),
+            itglue_service.get_total(endpoints["articles"], {"filter[updated_at]": f"{recent_since},*"}),
+            itglue_service.get_categories()
+        )
+        counts = dict(zip(endpoints, totals))
+        return {
+            "total_articles": counts["articles"],
+            "total_categories": len(totals[-1]),
+            "recent_updates": totals[-2],
+            "configurations": counts["configurations"],
+            "passwords": counts["passwords"],
+            "contacts": counts["contacts"],
+            "last_sync": None,
+            "source": "itglue_api"
+        }
+
+    async def _on_sync(self, summary: Dict[str, Any], started_at: datetime) -> None:
+        self._start_refresh()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                pass  # Logged and recorded by _refresh_done
+            await asyncio.sleep(self.refresh_interval)
+
+    async def start(self, leader: bool = True) -> None:
+        """Keep the stats warm in the background (in the sync leader only)"""
+        if not leader or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+# Create singleton instance
+knowledge_stats = KnowledgeBaseStats()
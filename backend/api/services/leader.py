@@ -0,0 +1,123 @@
+import asyncio
+import os
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from ..database import engine
+
+ROLES = ("auto", "leader", "follower")
+
+
+class BackgroundSyncLeader:
+    """Elects the one worker that pulls from SyncroMSP and ITGlue.
+
+    Every uvicorn worker runs the lifespan, so without an election each worker
+    would send its own copy of every upstream sync. Each service starts as a
+    follower, keeping its in-memory state in step with the mirror tables. The
+    worker that takes a session-level Postgres advisory lock, held on a
+    dedicated connection, restarts the services as leaders. If that connection
+    drops, the lock is released and another worker takes over within
+    BACKGROUND_SYNC_LEADER_RETRY_SECONDS. BACKGROUND_SYNC_ROLE=leader or follower
+    skips the election, e.g. for a single process or a dedicated sync worker.
+
+    Services take part through `start(leader: bool)` and `stop()`.
+    """
+
+    def __init__(self):
+        self.role = os.getenv("BACKGROUND_SYNC_ROLE", "auto").lower()
+        if self.role not in ROLES:
+            logger.warning(f"Unknown BACKGROUND_SYNC_ROLE '{self.role}', using 'auto'")
+            self.role = "auto"
+        self.lock_key = int(os.getenv("BACKGROUND_SYNC_LOCK_KEY", "5310001"))
+        self.retry_interval = float(os.getenv("BACKGROUND_SYNC_LEADER_RETRY_SECONDS", "15"))
+        self.keepalive = float(os.getenv("BACKGROUND_SYNC_LEADER_KEEPALIVE_SECONDS", "30"))
+        self.leading = False
+        self.elections = 0
+        self.last_error: Optional[str] = None
+        self._services: List[Any] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _assume(self, leader: bool) -> None:
+        """Restart every service in the given role"""
+        for service in reversed(self._services):
+            await service.stop()
+        self.leading = leader
+        for service in self._services:
+            await service.start(leader=leader)
+
+    async def _lead(self) -> None:
+        """Hold the lock (if it is free) and lead until its connection is lost"""
+        async with engine.connect() as conn:
+            fairy = await conn.get_raw_connection()
+            driver = fairy.driver_connection
+            if not await driver.fetchval("SELECT pg_try_advisory_lock($1)", self.lock_key):
+                return
+
+            try:
+                lost = asyncio.Event()
+                driver.add_termination_listener(lambda _: lost.set())
+                self.elections += 1
+                logger.info(f"This worker (pid {os.getpid()}) is the background sync leader")
+                await self._assume(leader=True)
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), timeout=self.keepalive)
+                    except asyncio.TimeoutError:
+                        # Surfaces silently dropped connections
+                        await driver.execute("SELECT 1")
+                raise ConnectionError("advisory lock connection closed")
+            finally:
+                # Closing the connection releases the lock; it must never go back to the pool
+                await conn.invalidate()
+                if self.leading:
+                    await asyncio.shield(self._assume(leader=False))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._lead()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"Background sync leadership lost or unavailable: {str(e)}")
+            await asyncio.sleep(self.retry_interval)
+
+    async def start(self, *services: Any) -> None:
+        """Start `services` in order as followers, then stand for election"""
+        if self._task is not None:
+            return
+        self._services = list(services)
+        for service in self._services:
+            await service.start(leader=self.role == "leader")
+        self.leading = self.role == "leader"
+
+        if self.role == "auto":
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the election and every service, in reverse start order"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for service in reversed(self._services):
+            await service.stop()
+        self.leading = False
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "role": self.role,
+            "leading": self.leading,
+            "pid": os.getpid(),
+            "elections": self.elections,
+            "last_error": self.last_error
+        }
+
+
+# Create singleton instance
+sync_leader = BackgroundSyncLeader()
@@ -0,0 +1,225 @@
+import re
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+# Latency histogram bucket upper bounds in seconds (Prometheus style, +Inf implied)
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_ID_SEGMENT = re.compile(r"^\+?\d+$|^(?=.*\d)[\w\-]{12,}$")
+
+
+def normalize_path(path: str) -> str:
+    """Collapse ids in a URL path so endpoints group together, e.g. /get-agent/{id}"""
+    return "/".join("{id}" if _ID_SEGMENT.match(segment) else segment for segment in path.split("/"))
+
+
+class Histogram:
+    """Fixed-bucket histogram with sum/count"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by linear interpolation inside the matching bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(self.max, lower + (upper - lower) * ((rank - seen) / bucket_count))
+            seen += bucket_count
+        return self.max
+
+
+class EndpointStats:
+    """Everything recorded for one (service, method, endpoint)"""
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.status_codes: Dict[str, int] = defaultdict(int)
+        self.retries: Dict[str, int] = defaultdict(int)
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        count = self.latency.count
+        return {
+            "requests": count,
+            "status_codes": dict(self.status_codes),
+            "errors": sum(n for code, n in self.status_codes.items() if not code.isdigit() or int(code) >= 500),
+            "retries": dict(self.retries),
+            "latency_ms": {
+                "avg": round(self.latency.sum / count * 1000, 1) if count else 0.0,
+                "p50": round(self.latency.quantile(0.5) * 1000, 1),
+                "p95": round(self.latency.quantile(0.95) * 1000, 1),
+                "p99": round(self.latency.quantile(0.99) * 1000, 1),
+                "max": round(self.latency.max * 1000, 1)
+            },
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes
+        }
+
+
+class UpstreamMetrics:
+    """In-process registry of outbound request metrics for the upstream API services"""
+
+    def __init__(self):
+        self._endpoints: Dict[Tuple[str, str, str], EndpointStats] = defaultdict(EndpointStats)
+        self._sources: List[Any] = []
+        self.started_at = time.time()
+
+    def endpoint(self, service: str, method: str, endpoint: str) -> EndpointStats:
+        return self._endpoints[(service, method.upper(), endpoint)]
+
+    def observe(self, service: str, method: str, endpoint: str, status: str, seconds: float, request_bytes: int = 0) -> None:
+        stats = self.endpoint(service, method, endpoint)
+        stats.latency.observe(seconds)
+        stats.status_codes[status] += 1
+        stats.request_bytes += request_bytes
+
+    def record_response_bytes(self, service: str, method: str, endpoint: str, size: int) -> None:
+        self.endpoint(service, method, endpoint).response_bytes += size
+
+    def record_retry(self, service: str, method: str, endpoint: str, reason: str) -> None:
+        self.endpoint(service, method, endpoint).retries[reason] += 1
+
+    def register_source(self, source: Any) -> None:
+        """Include a SingleFlight's coalescing counters in snapshots and /metrics"""
+        if source not in self._sources:
+            self._sources.append(source)
+
+    def reset(self) -> None:
+        self._endpoints.clear()
+        self.started_at = time.time()
+
+    def coalescing(self, service: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Single-flight counters of every registered source (optionally one service)"""
+        return [source.stats() for source in self._sources if not service or source.service == service]
+
+    def snapshot(self, service: Optional[str] = None) -> Dict[str, Any]:
+        services: Dict[str, Dict[str, Any]] = {}
+        for (name, method, endpoint), stats in sorted(self._endpoints.items()):
+            if service and name != service:
+                continue
+            services.setdefault(name, {})[f"{method} {endpoint}"] = stats.to_dict()
+
+        return {
+            "since": self.started_at,
+            "services": services,
+            "coalescing": self.coalescing(service)
+        }
+
+    def render_prometheus(self) -> str:
+        """Render the registry in the Prometheus text exposition format"""
+        lines = [
+            "# HELP upstream_request_duration_seconds Latency of outbound upstream API requests",
+            "# TYPE upstream_request_duration_seconds histogram"
+        ]
+        for (service, method, endpoint), stats in sorted(self._endpoints.items()):
+            labels = f'service="{service}",method="{method}",endpoint="{endpoint}"'
+            cumulative = 0
+            for bound, count in zip(stats.latency.buckets, stats.latency.counts):
+                cumulative += count
+                lines.append(f'upstream_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'upstream_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.latency.count}')
+            lines.append(f"upstream_request_duration_seconds_sum{{{labels}}} {stats.latency.sum:.6f}")
+            lines.append(f"upstream_request_duration_seconds_count{{{labels}}} {stats.latency.count}")
+
+        lines += ["# HELP upstream_requests_total Outbound upstream API requests by status", "# TYPE upstream_requests_total counter"]
+        for (service, method, endpoint), stats in sorted(self._endpoints.items()):
+            for status, count in sorted(stats.status_codes.items()):
+                lines.append(f'upstream_requests_total{{service="{service}",method="{method}",endpoint="{endpoint}",status="{status}"}} {count}')
+
+        lines += ["# HELP upstream_retries_total Retried upstream API requests by reason", "# TYPE upstream_retries_total counter"]
+        for (service, method, endpoint), stats in sorted(self._endpoints.items()):
+            for reason, count in sorted(stats.retries.items()):
+                lines.append(f'upstream_retries_total{{service="{service}",method="{method}",endpoint="{endpoint}",reason="{reason}"}} {count}')
+
+        for direction in ("request", "response"):
+            lines += [f"# HELP upstream_{direction}_bytes_total Upstream API {direction} payload bytes", f"# TYPE upstream_{direction}_bytes_total counter"]
+            for (service, method, endpoint), stats in sorted(self._endpoints.items()):
+                lines.append(f'upstream_{direction}_bytes_total{{service="{service}",method="{method}",endpoint="{endpoint}"}} {getattr(stats, direction + "_bytes")}')
+
+        lines += ["# HELP upstream_coalesced_calls_total Calls served by an already in-flight identical request", "# TYPE upstream_coalesced_calls_total counter"]
+        for source in self._sources:
+            for name, counters in sorted(source.stats()["by_method"].items()):
+                lines.append(f'upstream_coalesced_calls_total{{service="{source.service}",call="{name}"}} {counters["coalesced"]}')
+
+        return "\n".join(lines) + "\n"
+
+
+upstream_metrics = UpstreamMetrics()
+
+
+class _CountingStream(httpx.AsyncByteStream):
+    """Wraps a response body to record its size once it has been read"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+        self._size = 0
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._size += len(chunk)
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+        if self._on_close:
+            self._on_close(self._size)
+            self._on_close = None
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """httpx transport recording latency, status, and payload sizes per endpoint"""
+
+    def __init__(self, service: str, transport: Optional[httpx.AsyncBaseTransport] = None, registry: UpstreamMetrics = upstream_metrics):
+        self.service = service
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        self._registry = registry
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        method = request.method
+        endpoint = normalize_path(request.url.path)
+        request_bytes = int(request.headers.get("content-length", 0) or 0)
+        started = time.perf_counter()
+
+        try:
+            response = await self._transport.handle_async_request(request)
+        except httpx.TransportError as e:
+            self._registry.observe(self.service, method, endpoint, type(e).__name__, time.perf_counter() - started, request_bytes)
+            raise
+
+        self._registry.observe(self.service, method, endpoint, str(response.status_code), time.perf_counter() - started, request_bytes)
+        response.stream = _CountingStream(
+            response.stream,
+            lambda size: self._registry.record_response_bytes(self.service, method, endpoint, size)
+        )
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def upstream_client(service: str, limits: Optional[httpx.Limits] = None, **kwargs) -> httpx.AsyncClient:
+    """httpx.AsyncClient whose requests are recorded in the upstream metrics registry"""
+    transport = httpx.AsyncHTTPTransport(limits=limits) if limits else httpx.AsyncHTTPTransport()
+    return httpx.AsyncClient(transport=InstrumentedTransport(service, transport), **kwargs)
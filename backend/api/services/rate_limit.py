@@ -0,0 +1,212 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+class TokenBucket:
+    """Async token bucket allowing `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Wait until `tokens` are available and take them"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+    def try_acquire(self, tokens: float = 1.0, reserve: float = 0.0) -> float:
+        """Take `tokens` without waiting, leaving at least `reserve` behind.
+
+        Returns 0 on success, otherwise seconds until they are available.
+        """
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+
+        self._refill()
+        if self._tokens >= tokens + reserve:
+            self._tokens -= tokens
+            return 0.0
+        return (tokens + reserve - self._tokens) / self.rate
+
+    def paused_for(self) -> float:
+        """Seconds left on the current pause (0 if not paused)"""
+        return max(0.0, self._paused_until - time.monotonic())
+
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for `seconds` (e.g. after a 429 with Retry-After)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+        self._updated_at = time.monotonic()
+
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request cannot be admitted before its deadline"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PriorityScheduler:
+    """Admits requests against a shared TokenBucket, most important class first.
+
+    Waiters queue by (class, arrival); each token that frees up goes to the oldest
+    waiter of the most important class. Classes after the first cannot take the
+    last `reserve` tokens, so interactive requests keep headroom while a background
+    sync is running. A waiter still queued at its deadline gets RateLimitExceeded.
+    """
+
+    def __init__(self, bucket: TokenBucket, priorities: Sequence[str], reserve: float = 0.0):
+        self.bucket = bucket
+        self.priorities = list(priorities)
+        self.reserve = reserve
+        self._rank = {name: rank for rank, name in enumerate(self.priorities)}
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._stats = {name: {"admitted": 0, "rejected": 0, "wait_seconds": 0.0} for name in self.priorities}
+
+    def _reserve_for(self, rank: int) -> float:
+        return 0.0 if rank == 0 else self.reserve
+
+    async def acquire(self, priority: str, timeout: Optional[float] = None) -> None:
+        """Wait for a request slot in `priority`, for at most `timeout` seconds"""
+        rank = self._rank[priority]
+        started = time.monotonic()
+
+        # Nobody of equal or higher priority is queued: take a token directly if one is free
+        if (not self._waiters or self._waiters[0][0] > rank) and \
+                self.bucket.try_acquire(reserve=self._reserve_for(rank)) == 0:
+            self._record(priority, "admitted", 0.0)
+            return
+
+        paused = self.bucket.paused_for()
+        if timeout is not None and paused > timeout:
+            self._record(priority, "rejected")
+            raise RateLimitExceeded(f"Rate limited for another {paused:.1f}s ({priority} request)", paused)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (rank, next(self._sequence), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        self._wakeup.set()
+
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._record(priority, "rejected")
+            retry_after = max(self.bucket.paused_for(), 1.0 / self.bucket.rate)
+            raise RateLimitExceeded(
+                f"No request slot within {timeout:.1f}s ({priority} request, {self.queued()} queued)",
+                retry_after
+            )
+        self._record(priority, "admitted", time.monotonic() - started)
+
+    async def _dispatch(self) -> None:
+        while self._waiters:
+            rank, _, future = self._waiters[0]
+            if future.done():
+                # Timed out or cancelled while queued
+                heapq.heappop(self._waiters)
+                continue
+
+            wait = self.bucket.try_acquire(reserve=self._reserve_for(rank))
+            if wait == 0:
+                heapq.heappop(self._waiters)
+                future.set_result(None)
+                continue
+
+            # Sleep until a token frees up, or a more important waiter arrives
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def _record(self, priority: str, outcome: str, waited: float = 0.0) -> None:
+        stats = self._stats[priority]
+        stats[outcome] += 1
+        stats["wait_seconds"] += waited
+
+    def queued(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def stats(self) -> Dict[str, Any]:
+        queued = {name: 0 for name in self.priorities}
+        for rank, _, future in self._waiters:
+            if not future.done():
+                queued[self.priorities[rank]] += 1
+
+        return {
+            "rate_per_second": self.bucket.rate,
+            "burst": self.bucket.capacity,
+            "reserve": self.reserve,
+            "tokens_available": round(self.bucket.available(), 2),
+            "paused_for_seconds": round(self.bucket.paused_for(), 2),
+            "by_priority": {
+                name: {
+                    "queued": queued[name],
+                    "admitted": stats["admitted"],
+                    "rejected": stats["rejected"],
+                    "avg_wait_ms": round(stats["wait_seconds"] / stats["admitted"] * 1000, 1) if stats["admitted"] else 0.0
+                }
+                for name, stats in self._stats.items()
+            }
+        }
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Exponential backoff with jitter for the given (1-based) attempt"""
+    delay = min(cap, base * (2 ** (attempt - 1)))
+    return delay * (0.5 + random.random() / 2)
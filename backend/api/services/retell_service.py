@@ -1,15 +1,22 @@
 import httpx
 import os
-from typing import Dict, Any, Optional, List
+import asyncio
+from typing import Dict, Any, Optional, List, AsyncIterator, Awaitable, Callable, Union
 from pydantic import BaseModel
 from loguru import logger
 from datetime import datetime
 
+from .cache import TTLCache, cached_read
+from .singleflight import SingleFlight, coalesced
+from .rate_limit import TokenBucket, parse_retry_after, backoff_delay
+from .metrics import upstream_client, upstream_metrics
+
 class RetellAIService:
     def __init__(self):
         self.api_key = os.getenv("RETELLAI_API_KEY")
-        self.base_url = "https://api.retellai.com"
-        self.base_url_v2 = "https://api.retellai.com/v2"
+        # Point RETELLAI_API_URL at the local emulator (python -m emulator) for offline/load testing
+        self.base_url = os.getenv("RETELLAI_API_URL", "https://api.retellai.com").rstrip("/")
+        self.base_url_v2 = f"{self.base_url}/v2"
         self.webhook_url = os.getenv("RETELLAI_AGENT_WEBHOOK_URL")
         self.agent_name_prefix = os.getenv("RETELLAI_AGENT_NAME_PREFIX", "SigmaOne - User <user_id> - Agent '<agent_name>'")
         
@@ -20,11 +27,63 @@ class RetellAIService:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        
+        # Read-through cache for RetellAI lookups, TTLs in seconds (0 disables caching for a method)
+        self.cache_ttls = {
+            "list_agents": float(os.getenv("RETELLAI_CACHE_TTL_LIST_AGENTS", "30")),
+            "get_agent": float(os.getenv("RETELLAI_CACHE_TTL_AGENT", "60")),
+            "get_phone_numbers": float(os.getenv("RETELLAI_CACHE_TTL_LIST_PHONE_NUMBERS", "60")),
+            "get_phone_number": float(os.getenv("RETELLAI_CACHE_TTL_PHONE_NUMBER", "60")),
+            "list_conversation_flows": float(os.getenv("RETELLAI_CACHE_TTL_LIST_CONVERSATION_FLOWS", "60")),
+            "get_conversation_flow": float(os.getenv("RETELLAI_CACHE_TTL_CONVERSATION_FLOW", "120")),
+        }
+        self._cache = TTLCache(maxsize=int(os.getenv("RETELLAI_CACHE_MAX_ENTRIES", "512")))
+        # A read that starts after an invalidation must not join a fetch that began before it,
+        # or cached_read would store the pre-write result under the new generation
+        self._single_flight = SingleFlight("retellai", scope=lambda: self._cache.generation)
+        upstream_metrics.register_source(self._single_flight)
+        
+        # Bulk agent updates: bounded concurrency under RetellAI's request rate limit
+        self.bulk_concurrency = int(os.getenv("RETELLAI_BULK_CONCURRENCY", "8"))
+        self.bulk_max_attempts = int(os.getenv("RETELLAI_BULK_MAX_ATTEMPTS", "5"))
+        self._rate_limiter = TokenBucket(
+            rate=float(os.getenv("RETELLAI_RATE_LIMIT_PER_SECOND", "10")),
+            capacity=float(os.getenv("RETELLAI_RATE_LIMIT_BURST", "10"))
+        )
+        self._agent_update_subscribers: List[Callable[[str, Dict[str, Any]], Awaitable[None]]] = []
+    
+    def subscribe_agent_updates(self, callback: Callable[[str, Dict[str, Any]], Awaitable[None]]) -> None:
+        """Await `callback(agent_id, fields)` after every successful agent PATCH, single or bulk"""
+        self._agent_update_subscribers.append(callback)
+    
+    async def _agent_updated(self, agent_id: str, fields: Dict[str, Any]) -> None:
+        for callback in self._agent_update_subscribers:
+            try:
+                await callback(agent_id, fields)
+            except Exception as e:
+                logger.error(f"RetellAI agent update subscriber failed for {agent_id}: {str(e)}")
+    
+    def invalidate_cache(self, method: Optional[str] = None, *args: Any) -> None:
+        """Invalidate cached reads - everything, one method, or one method call"""
+        if method is None:
+            self._cache.clear()
+        elif args:
+            self._cache.invalidate((method, *args))
+        else:
+            self._cache.invalidate_prefix(method)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get read cache statistics"""
+        return {**self._cache.stats(), "ttls": self.cache_ttls}
+    
+    def _client(self, **kwargs) -> httpx.AsyncClient:
+        """HTTP client with per-endpoint latency/status metrics"""
+        return upstream_client("retellai", **kwargs)
     
     async def create_agent(self, agent_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new RetellAI agent"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 # Prepare agent configuration
                 agent_config = {
                     "llm_websocket_url": agent_data.get("llm_websocket_url"),
@@ -56,6 +115,7 @@ class RetellAIService:
                 if response.status_code == 201:
                     result = response.json()
                     logger.info(f"Successfully created RetellAI agent: {result.get('agent_id')}")
+                    self.invalidate_cache("list_agents")
                     return result
                 else:
                     logger.error(f"Failed to create agent: {response.status_code} - {response.text}")
@@ -65,10 +125,12 @@ class RetellAIService:
             logger.error(f"Error creating RetellAI agent: {str(e)}")
             raise
     
+    @cached_read("list_agents")
+    @coalesced("list_agents")
     async def list_agents(self) -> List[Dict[str, Any]]:
         """List all RetellAI agents"""
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
+            async with self._client(timeout=10.0) as client:
                 response = await client.get(
                     f"{self.base_url}/list-agents",
                     headers=self.headers
@@ -84,10 +146,12 @@ class RetellAIService:
             logger.error(f"Error listing RetellAI agents: {str(e)}")
             raise
     
+    @cached_read("get_agent")
+    @coalesced("get_agent")
     async def get_agent(self, agent_id: str) -> Dict[str, Any]:
         """Get a specific RetellAI agent"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 response = await client.get(
                     f"{self.base_url}/get-agent/{agent_id}",
                     headers=self.headers
@@ -106,7 +170,7 @@ class RetellAIService:
     async def update_agent(self, agent_id: str, agent_data: Dict[str, Any]) -> Dict[str, Any]:
         """Update a RetellAI agent"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 response = await client.patch(
                     f"{self.base_url}/update-agent/{agent_id}",
                     headers=self.headers,
@@ -116,6 +180,9 @@ class RetellAIService:
                 if response.status_code == 200:
                     result = response.json()
                     logger.info(f"Successfully updated RetellAI agent: {agent_id}")
+                    self.invalidate_cache("get_agent", agent_id)
+                    self.invalidate_cache("list_agents")
+                    await self._agent_updated(agent_id, agent_data)
                     return result
                 else:
                     logger.error(f"Failed to update agent: {response.status_code} - {response.text}")
@@ -128,54 +195,183 @@ class RetellAIService:
     async def update_all_agent_webhooks(self, new_webhook_url: str) -> Dict[str, Any]:
         """Update webhook URL for all RetellAI agents"""
         try:
-            # First, get all agents
-            agents_response = await self.list_agents()
-            agents = agents_response.get('data', [])
-            
-            if not agents:
-                return {"success": True, "message": "No agents found", "updated_count": 0}
-            
-            updated_count = 0
-            failed_updates = []
-            
-            # Update each agent's webhook URL
-            for agent in agents:
-                agent_id = agent.get('agent_id')
-                if not agent_id:
-                    continue
-                    
-                try:
-                    await self.update_agent(agent_id, {
-                        "agent_level_webhook_url": new_webhook_url
-                    })
-                    updated_count += 1
-                    logger.info(f"Updated webhook for agent {agent_id}")
-                except Exception as e:
-                    failed_updates.append({"agent_id": agent_id, "error": str(e)})
-                    logger.error(f"Failed to update webhook for agent {agent_id}: {str(e)}")
-            
-            result = {
-                "success": True,
-                "message": f"Updated {updated_count} agents successfully",
-                "updated_count": updated_count,
-                "total_agents": len(agents),
-                "new_webhook_url": new_webhook_url
-            }
-            
-            if failed_updates:
-                result["failed_updates"] = failed_updates
-                result["message"] += f", {len(failed_updates)} failed"
-            
+            result = await self.bulk_update_agents({"agent_level_webhook_url": new_webhook_url})
+            result["new_webhook_url"] = new_webhook_url
             return result
             
         except Exception as e:
             logger.error(f"Error bulk updating agent webhooks: {str(e)}")
             raise
 
+    async def bulk_update_agents(
+        self,
+        updates: Union[Dict[str, Any], Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]],
+        agent_ids: Optional[List[str]] = None,
+        concurrency: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Apply an update to many RetellAI agents and return a summary"""
+        result = {}
+        failed_updates = []
+        
+        async for event in self.iter_bulk_update_agents(updates, agent_ids=agent_ids, concurrency=concurrency):
+            if event["event"] == "agent_failed":
+                failed_updates.append({"agent_id": event["agent_id"], "error": event["error"]})
+            elif event["event"] == "finished":
+                result = event
+        
+        summary = {
+            "success": True,
+            "message": f"Updated {result.get('updated_count', 0)} agents successfully",
+            "updated_count": result.get("updated_count", 0),
+            "skipped_count": result.get("skipped_count", 0),
+            "total_agents": result.get("total", 0),
+            "duration_seconds": result.get("duration_seconds", 0)
+        }
+        
+        if failed_updates:
+            summary["failed_updates"] = failed_updates
+            summary["message"] += f", {len(failed_updates)} failed"
+        
+        return summary
+
+    async def iter_bulk_update_agents(
+        self,
+        updates: Union[Dict[str, Any], Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]],
+        agent_ids: Optional[List[str]] = None,
+        concurrency: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Update many agents concurrently, yielding progress events as they happen.
+        
+        `updates` is either the fields to PATCH on every agent or a callable that
+        receives the agent's current config and returns the fields for that agent
+        (None to skip it). Agents that already have the requested values are skipped.
+        Requests share one client, stay under the service rate limit and are retried
+        with backoff on 429/5xx.
+        """
+        # Skipping agents that already match needs their current config, not a cached listing
+        self.invalidate_cache("list_agents")
+        agents_response = await self.list_agents()
+        agents = agents_response.get("data", []) if isinstance(agents_response, dict) else agents_response
+        
+        # list-agents can return several versions of an agent - update each agent once
+        agents_by_id = {}
+        for agent in agents:
+            if agent.get("agent_id"):
+                agents_by_id[agent["agent_id"]] = agent
+        
+        if agent_ids is not None:
+            agents_by_id = {
+                agent_id: agents_by_id.get(agent_id, {"agent_id": agent_id})
+                for agent_id in agent_ids
+            }
+        
+        total = len(agents_by_id)
+        concurrency = max(1, min(concurrency or self.bulk_concurrency, total or 1))
+        started_at = asyncio.get_running_loop().time()
+        counts = {"updated_count": 0, "skipped_count": 0, "failed_count": 0}
+        
+        yield {"event": "started", "total": total, "concurrency": concurrency}
+        
+        work: asyncio.Queue = asyncio.Queue()
+        for agent in agents_by_id.values():
+            work.put_nowait(agent)
+        events: asyncio.Queue = asyncio.Queue()
+        
+        async def worker(client: httpx.AsyncClient):
+            try:
+                while True:
+                    try:
+                        agent = work.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    
+                    agent_id = agent["agent_id"]
+                    try:
+                        fields = updates(agent) if callable(updates) else updates
+                        
+                        if not fields or all(agent.get(key) == value for key, value in fields.items()):
+                            await events.put({"event": "agent_skipped", "agent_id": agent_id})
+                            continue
+                        
+                        attempts = await self._patch_agent_with_retry(client, agent_id, fields)
+                        await self._agent_updated(agent_id, fields)
+                        await events.put({"event": "agent_updated", "agent_id": agent_id, "attempts": attempts})
+                    except Exception as e:
+                        logger.error(f"Failed to update agent {agent_id}: {str(e)}")
+                        await events.put({"event": "agent_failed", "agent_id": agent_id, "error": str(e)})
+            finally:
+                # Tells the consumer this worker is done, however it exited
+                events.put_nowait(None)
+        
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with self._client(timeout=15.0, limits=limits) as client:
+            workers = [asyncio.create_task(worker(client)) for _ in range(concurrency)]
+            try:
+                completed = 0
+                running = len(workers)
+                while running:
+                    event = await events.get()
+                    if event is None:
+                        running -= 1
+                        continue
+                    completed += 1
+                    counts[event["event"].replace("agent_", "") + "_count"] += 1
+                    yield {**event, "completed": completed, "total": total}
+            finally:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                self.invalidate_cache("list_agents")
+        
+        duration = asyncio.get_running_loop().time() - started_at
+        logger.info(
+            f"Bulk agent update finished: {counts['updated_count']} updated, "
+            f"{counts['skipped_count']} skipped, {counts['failed_count']} failed in {duration:.1f}s"
+        )
+        yield {"event": "finished", "total": total, **counts, "duration_seconds": round(duration, 3)}
+
+    async def _patch_agent_with_retry(self, client: httpx.AsyncClient, agent_id: str, fields: Dict[str, Any]) -> int:
+        """PATCH one agent under the rate limiter, retrying 429/5xx and network errors"""
+        for attempt in range(1, self.bulk_max_attempts + 1):
+            await self._rate_limiter.acquire()
+            retry_after = None
+            
+            try:
+                response = await client.patch(
+                    f"{self.base_url}/update-agent/{agent_id}",
+                    headers=self.headers,
+                    json=fields
+                )
+            except httpx.TransportError as e:
+                error = f"RetellAI request failed: {str(e)}"
+                reason = type(e).__name__
+            else:
+                if response.status_code == 200:
+                    self.invalidate_cache("get_agent", agent_id)
+                    return attempt
+                
+                error = f"RetellAI API error: {response.status_code}"
+                if response.status_code != 429 and response.status_code < 500:
+                    raise Exception(error)
+                
+                reason = str(response.status_code)
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if response.status_code == 429:
+                    # Back the whole bulk run off, not just this worker
+                    self._rate_limiter.pause(retry_after if retry_after is not None else backoff_delay(attempt))
+            
+            if attempt == self.bulk_max_attempts:
+                raise Exception(error)
+            
+            delay = retry_after if retry_after is not None else backoff_delay(attempt)
+            upstream_metrics.record_retry("retellai", "PATCH", "/update-agent/{id}", reason)
+            logger.warning(f"Retrying update for agent {agent_id} in {delay:.2f}s ({error})")
+            await asyncio.sleep(delay)
+
     async def create_conversation_flow(self, flow_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new RetellAI conversation flow"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 response = await client.post(
                     f"{self.base_url}/create-conversation-flow",
                     headers=self.headers,
@@ -185,6 +381,7 @@ class RetellAIService:
                 if response.status_code == 201:
                     result = response.json()
                     logger.info(f"Successfully created conversation flow: {result.get('conversation_flow_id')}")
+                    self.invalidate_cache("list_conversation_flows")
                     return result
                 else:
                     logger.error(f"Failed to create conversation flow: {response.status_code} - {response.text}")
@@ -194,10 +391,12 @@ class RetellAIService:
             logger.error(f"Error creating conversation flow: {str(e)}")
             raise
 
-    async def list_conversation_flows(self) -> Dict[str, Any]:
+    @cached_read("list_conversation_flows")
+    @coalesced("list_conversation_flows")
+    async def list_conversation_flows(self) -> List[Dict[str, Any]]:
         """List all conversation flows"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 response = await client.get(
                     f"{self.base_url}/list-conversation-flows",
                     headers=self.headers
@@ -205,7 +404,7 @@ class RetellAIService:
                 
                 if response.status_code == 200:
                     result = response.json()
-                    logger.info(f"Successfully retrieved {len(result.get('data', []))} conversation flows")
+                    logger.info(f"Successfully retrieved {len(result)} conversation flows")
                     return result
                 else:
                     logger.error(f"Failed to list conversation flows: {response.status_code} - {response.text}")
@@ -215,10 +414,12 @@ class RetellAIService:
             logger.error(f"Error listing conversation flows: {str(e)}")
             raise
 
+    @cached_read("get_conversation_flow")
+    @coalesced("get_conversation_flow")
     async def get_conversation_flow(self, flow_id: str) -> Dict[str, Any]:
         """Get a specific conversation flow"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 response = await client.get(
                     f"{self.base_url}/get-conversation-flow/{flow_id}",
                     headers=self.headers
@@ -239,7 +440,7 @@ class RetellAIService:
     async def update_conversation_flow(self, flow_id: str, flow_data: Dict[str, Any]) -> Dict[str, Any]:
         """Update a conversation flow"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 response = await client.patch(
                     f"{self.base_url}/update-conversation-flow/{flow_id}",
                     headers=self.headers,
@@ -249,6 +450,8 @@ class RetellAIService:
                 if response.status_code == 200:
                     result = response.json()
                     logger.info(f"Successfully updated conversation flow: {flow_id}")
+                    self.invalidate_cache("get_conversation_flow", flow_id)
+                    self.invalidate_cache("list_conversation_flows")
                     return result
                 else:
                     logger.error(f"Failed to update conversation flow: {response.status_code} - {response.text}")
@@ -261,7 +464,7 @@ class RetellAIService:
     async def delete_conversation_flow(self, flow_id: str) -> bool:
         """Delete a conversation flow"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 response = await client.delete(
                     f"{self.base_url}/delete-conversation-flow/{flow_id}",
                     headers=self.headers
@@ -269,6 +472,8 @@ class RetellAIService:
                 
                 if response.status_code == 200:
                     logger.info(f"Successfully deleted conversation flow: {flow_id}")
+                    self.invalidate_cache("get_conversation_flow", flow_id)
+                    self.invalidate_cache("list_conversation_flows")
                     return True
                 else:
                     logger.error(f"Failed to delete conversation flow: {response.status_code} - {response.text}")
@@ -281,7 +486,7 @@ class RetellAIService:
     # async def delete_agent(self, agent_id: str) -> bool:
     #     """Delete a RetellAI agent"""
     #     try:
-    #         async with httpx.AsyncClient() as client:
+    #         async with self._client() as client:
     #             response = await client.delete(
     #                 f"{self.base_url}/delete-agent/{agent_id}",
     #                 headers=self.headers
@@ -298,10 +503,12 @@ class RetellAIService:
     #         logger.error(f"Error deleting RetellAI agent: {str(e)}")
     #         raise
     
+    @cached_read("get_phone_numbers")
+    @coalesced("get_phone_numbers")
     async def get_phone_numbers(self) -> List[Dict[str, Any]]:
         """List all phone numbers"""
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
+            async with self._client(timeout=10.0) as client:
                 response = await client.get(
                     f"{self.base_url}/list-phone-numbers",
                     headers=self.headers
@@ -317,10 +524,12 @@ class RetellAIService:
             logger.error(f"Error listing phone numbers: {str(e)}")
             raise
     
+    @cached_read("get_phone_number")
+    @coalesced("get_phone_number")
     async def get_phone_number(self, phone_number_id: str) -> Dict[str, Any]:
         """Get a specific phone number"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 response = await client.get(
                     f"{self.base_url}/get-phone-number/{phone_number_id}",
                     headers=self.headers
@@ -339,7 +548,7 @@ class RetellAIService:
     async def update_phone_number(self, phone_number_id: str, agent_id: str) -> Dict[str, Any]:
         """Update phone number agent assignment"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 phone_config = {
                     "inbound_agent_id": agent_id,
                     "outbound_agent_id": agent_id
@@ -354,6 +563,8 @@ class RetellAIService:
                 if response.status_code == 200:
                     result = response.json()
                     logger.info(f"Successfully updated phone number: {phone_number_id}")
+                    self.invalidate_cache("get_phone_number", phone_number_id)
+                    self.invalidate_cache("get_phone_numbers")
                     return result
                 else:
                     logger.error(f"Failed to update phone number: {response.status_code} - {response.text}")
@@ -366,7 +577,7 @@ class RetellAIService:
     async def make_call(self, from_number: str, to_number: str, agent_id: str) -> Dict[str, Any]:
         """Make an outbound call"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 call_config = {
                     "from_number": from_number,
                     "to_number": to_number,
@@ -394,7 +605,7 @@ class RetellAIService:
     async def make_agent_to_agent_call(self, caller_agent_id: str, inbound_agent_id: str, from_number: str, to_number: str) -> Dict[str, Any]:
         """Make an agent-to-agent call"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 # For agent-to-agent calls, we create a call where the caller agent calls the inbound agent's number
                 # The inbound agent will automatically answer based on RetellAI's configuration
                 call_config = {
@@ -426,10 +637,11 @@ class RetellAIService:
             logger.error(f"Error making agent-to-agent call: {str(e)}")
             raise
     
+    @coalesced("get_call")
     async def get_call(self, call_id: str) -> Dict[str, Any]:
         """Get call details"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with self._client() as client:
                 response = await client.get(
                     f"{self.base_url_v2}/get-call/{call_id}",
                     headers=self.headers
@@ -445,10 +657,11 @@ class RetellAIService:
             logger.error(f"Error getting call: {str(e)}")
             raise
     
+    @coalesced("list_calls")
     async def list_calls(self, limit: int = 100, sort_order: str = "descending") -> List[Dict[str, Any]]:
         """List calls"""
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
+            async with self._client(timeout=10.0) as client:
                 response = await client.post(
                     f"{self.base_url_v2}/list-calls",
                     headers=self.headers,
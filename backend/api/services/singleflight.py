@@ -0,0 +1,85 @@
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+def freeze(value: Any) -> Hashable:
+    """Turn call arguments (dicts, lists) into a hashable key"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls so they share one upstream request.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it is still running await the same task instead of issuing their
+    own request. Nothing is cached once the task finishes.
+
+    `scope`, if given, is called on every call and its result becomes part of
+    the key, so calls only share a flight started under the same scope (e.g.
+    the same cache generation or request priority).
+    """
+
+    def __init__(self, service: str, scope: Optional[Callable[[], Hashable]] = None):
+        self.service = service
+        self.scope = scope
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        name = key[0] if isinstance(key, tuple) and key else str(key)
+        counters = self._counters.setdefault(name, {"calls": 0, "executions": 0, "coalesced": 0})
+        counters["calls"] += 1
+        if self.scope is not None:
+            key = (key, self.scope())
+
+        task = self._in_flight.get(key)
+        if task is None or task.done():
+            counters["executions"] += 1
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._in_flight[key] = task
+            task.add_done_callback(functools.partial(self._forget, key))
+        else:
+            counters["coalesced"] += 1
+
+        # Shield so one caller being cancelled does not cancel the shared request
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the exception as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        totals = {"calls": 0, "executions": 0, "coalesced": 0}
+        for counters in self._counters.values():
+            for field in totals:
+                totals[field] += counters[field]
+
+        return {
+            "service": self.service,
+            "in_flight": len(self._in_flight),
+            **totals,
+            "coalesced_ratio": round(totals["coalesced"] / totals["calls"], 4) if totals["calls"] else 0.0,
+            "by_method": {name: dict(counters) for name, counters in self._counters.items()}
+        }
+
+
+def coalesced(name: str):
+    """Share one in-flight call between concurrent identical service method calls.
+
+    The decorated method's instance must provide a ``_single_flight`` (SingleFlight).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            key = (name, freeze(args), freeze(kwargs))
+            return await self._single_flight.do(key, func, self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,8 +1,29 @@
 import httpx
 import os
-from typing import Dict, Any, Optional, List
+import asyncio
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, List, AsyncIterator, Iterator
 from loguru import logger
 
+from .singleflight import SingleFlight, coalesced
+from .metrics import upstream_client, upstream_metrics, normalize_path
+from .rate_limit import TokenBucket, PriorityScheduler, RateLimitExceeded, parse_retry_after, backoff_delay
+
+# Request priority classes, most important first
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PROBE = "probe"
+
+_request_priority: ContextVar[str] = ContextVar("syncromsp_request_priority", default=INTERACTIVE)
+
+
+def _optional_seconds(value: str) -> Optional[float]:
+    seconds = float(value)
+    return seconds if seconds > 0 else None
+
 class SyncroMSPService:
     def __init__(self):
         self.api_key = os.getenv("SYNCROMSP_API_KEY")
@@ -21,46 +42,234 @@ class SyncroMSPService:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         } if self.api_key else {}
+        
+        # Callers only share a flight at their own priority (deadline and queue position)
+        self._single_flight = SingleFlight("syncromsp", scope=_request_priority.get)
+        upstream_metrics.register_source(self._single_flight)
+        
+        # Every request is admitted by one scheduler sharing SyncroMSP's per-minute budget:
+        # interactive reads go ahead of background syncs, which go ahead of health probes
+        self.page_concurrency = int(os.getenv("SYNCROMSP_PAGE_CONCURRENCY", "4"))
+        self.max_attempts = int(os.getenv("SYNCROMSP_MAX_ATTEMPTS", "4"))
+        self._rate_limiter = TokenBucket(
+            rate=float(os.getenv("SYNCROMSP_REQUESTS_PER_MINUTE", "180")) / 60,
+            capacity=float(os.getenv("SYNCROMSP_RATE_LIMIT_BURST", "10"))
+        )
+        self._scheduler = PriorityScheduler(
+            self._rate_limiter,
+            priorities=(INTERACTIVE, BACKGROUND, PROBE),
+            reserve=float(os.getenv("SYNCROMSP_INTERACTIVE_RESERVE", "2"))
+        )
+        # How long a request may wait for budget (queueing plus 429 retries); None waits indefinitely
+        self.deadlines: Dict[str, Optional[float]] = {
+            INTERACTIVE: _optional_seconds(os.getenv("SYNCROMSP_INTERACTIVE_DEADLINE_SECONDS", "10")),
+            BACKGROUND: _optional_seconds(os.getenv("SYNCROMSP_BACKGROUND_DEADLINE_SECONDS", "0")),
+            PROBE: _optional_seconds(os.getenv("SYNCROMSP_PROBE_DEADLINE_SECONDS", "2"))
+        }
+    
+    def _client(self, **kwargs) -> httpx.AsyncClient:
+        """HTTP client with per-endpoint latency/status metrics"""
+        return upstream_client("syncromsp", **kwargs)
+    
+    # ============================================================================
+    # REQUEST SCHEDULING
+    # ============================================================================
+    
+    @contextmanager
+    def priority(self, name: str) -> Iterator[None]:
+        """Make SyncroMSP calls inside the block (and tasks started from it) run at `name` priority"""
+        if name not in self.deadlines:
+            raise ValueError(f"Unknown SyncroMSP request priority: {name}")
+        token = _request_priority.set(name)
+        try:
+            yield
+        finally:
+            _request_priority.reset(token)
+    
+    async def _send(self, client: httpx.AsyncClient, path: str, params: Optional[Dict[str, Any]] = None) -> httpx.Response:
+        """GET `path` once the scheduler admits it, retrying 429s until the request's deadline.
+        
+        Raises RateLimitExceeded if the budget does not allow the request before its deadline.
+        """
+        priority = _request_priority.get()
+        timeout = self.deadlines[priority]
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        
+        for attempt in range(1, self.max_attempts + 1):
+            remaining = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+            await self._scheduler.acquire(priority, remaining)
+            response = await client.get(f"{self.base_url}{path}", headers=self.headers, params=params)
+            if response.status_code != 429:
+                return response
+            
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            delay = retry_after if retry_after is not None else backoff_delay(attempt, base=2.0)
+            # Hold back every queued request, not just this one
+            self._rate_limiter.pause(delay)
+            upstream_metrics.record_retry("syncromsp", "GET", normalize_path(response.request.url.path), "429")
+            
+            if attempt == self.max_attempts or (deadline is not None and time.monotonic() + delay > deadline):
+                raise RateLimitExceeded(f"SyncroMSP rate limit reached on {path}, retry after {delay:.1f}s", delay)
+            logger.warning(f"SyncroMSP rate limited on {path} ({priority}), retrying in {delay:.1f}s")
+    
+    def scheduler_status(self) -> Dict[str, Any]:
+        return {
+            **self._scheduler.stats(),
+            "deadlines_seconds": self.deadlines
+        }
+    
+    # ============================================================================
+    # PAGINATED FETCH ENGINE
+    # ============================================================================
+    
+    async def _get_page(self, client: httpx.AsyncClient, path: str, page: int, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Fetch one page of a list endpoint"""
+        response = await self._send(client, path, {**(params or {}), "page": page})
+        
+        if response.status_code == 200:
+            return response.json()
+        
+        logger.error(f"Failed to get {path} page {page}: {response.status_code} - {response.text}")
+        raise Exception(f"SyncroMSP API error: {response.status_code}")
+    
+    async def iter_pages(
+        self,
+        path: str,
+        collection: str,
+        params: Optional[Dict[str, Any]] = None,
+        max_items: Optional[int] = None,
+        concurrency: Optional[int] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Stream the pages of a SyncroMSP list endpoint as they arrive.
+        
+        Page 1 is fetched first to discover `meta.total_pages`; the remaining pages are
+        fetched concurrently (up to `concurrency` at once) and yielded in completion
+        order. Without a page count, pages are walked sequentially until an empty one.
+        Stops early once `max_items` items have been yielded.
+        """
+        concurrency = max(1, concurrency or self.page_concurrency)
+        remaining = max_items
+        
+        def take(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            nonlocal remaining
+            if remaining is None:
+                return items
+            items = items[:remaining]
+            remaining -= len(items)
+            return items
+        
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with self._client(timeout=30.0, limits=limits) as client:
+            first = await self._get_page(client, path, 1, params)
+            items = first.get(collection, [])
+            yield take(items)
+            if not items or remaining == 0:
+                return
+            
+            total_pages = (first.get("meta") or {}).get("total_pages")
+            if total_pages is None:
+                page = 2
+                while remaining is None or remaining > 0:
+                    items = (await self._get_page(client, path, page, params)).get(collection, [])
+                    if not items:
+                        return
+                    yield take(items)
+                    page += 1
+                return
+            
+            last_page = int(total_pages)
+            if max_items is not None:
+                last_page = min(last_page, math.ceil(max_items / len(items)))
+            if last_page < 2:
+                return
+            
+            queue: asyncio.Queue = asyncio.Queue()
+            pages = iter(range(2, last_page + 1))
+            
+            async def worker():
+                # Workers share one page iterator, so each page is claimed exactly once
+                for page in pages:
+                    try:
+                        data = await self._get_page(client, path, page, params)
+                    except Exception as e:
+                        await queue.put(e)
+                        return
+                    await queue.put(data.get(collection, []))
+            
+            workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, last_page - 1))]
+            try:
+                for _ in range(last_page - 1):
+                    result = await queue.get()
+                    if isinstance(result, Exception):
+                        raise result
+                    yield take(result)
+                    if remaining == 0:
+                        return
+            finally:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+    
+    async def iter_tickets(self, status: Optional[str] = None, since_updated_at: Optional[str] = None, concurrency: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream every ticket (optionally filtered) - READ-ONLY OPERATION"""
+        params = {}
+        if status:
+            params["status"] = status
+        if since_updated_at:
+            params["since_updated_at"] = since_updated_at
+        
+        async for page in self.iter_pages(self.tickets_path, "tickets", params=params, concurrency=concurrency):
+            for ticket in page:
+                yield ticket
+    
+    async def iter_customers(self, concurrency: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream every customer - READ-ONLY OPERATION"""
+        async for page in self.iter_pages(self.customers_path, "customers", concurrency=concurrency):
+            for customer in page:
+                yield customer
     
     # ============================================================================
     # READ OPERATIONS (ACTIVE)
     # ============================================================================
     
+    @coalesced("get_tickets")
     async def get_tickets(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
-        """Get tickets from SyncroMSP - READ-ONLY OPERATION"""
+        """Get up to `limit` tickets from SyncroMSP, following pagination - READ-ONLY OPERATION"""
         try:
-            async with httpx.AsyncClient() as client:
-                params = {"limit": limit}
-                if status:
-                    params["status"] = status
-                
-                response = await client.get(
-                    f"{self.base_url}{self.tickets_path}",
-                    headers=self.headers,
-                    params=params
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    tickets = data.get("tickets", [])
-                    logger.info(f"Retrieved {len(tickets)} tickets from SyncroMSP")
-                    return tickets
-                else:
-                    logger.error(f"Failed to get tickets: {response.status_code} - {response.text}")
-                    raise Exception(f"SyncroMSP API error: {response.status_code}")
+            params = {"status": status} if status else None
+            tickets = []
+            async for page in self.iter_pages(self.tickets_path, "tickets", params=params, max_items=limit):
+                tickets.extend(page)
+            
+            logger.info(f"Retrieved {len(tickets)} tickets from SyncroMSP")
+            return tickets
                     
         except Exception as e:
             logger.error(f"Error getting SyncroMSP tickets: {str(e)}")
             raise
     
+    async def get_tickets_page(self, page: int = 1, since_updated_at: Optional[str] = None) -> Dict[str, Any]:
+        """Get one page of tickets (optionally only those updated since a timestamp) - READ-ONLY OPERATION"""
+        try:
+            params = {"since_updated_at": since_updated_at} if since_updated_at else None
+            async with self._client(timeout=30.0) as client:
+                data = await self._get_page(client, self.tickets_path, page, params)
+            
+            return {
+                "tickets": data.get("tickets", []),
+                "meta": data.get("meta", {})
+            }
+        
+        except Exception as e:
+            logger.error(f"Error getting SyncroMSP tickets page {page}: {str(e)}")
+            raise
+
+    @coalesced("get_ticket")
     async def get_ticket(self, ticket_id: int) -> Dict[str, Any]:
         """Get a specific ticket from SyncroMSP - READ-ONLY OPERATION"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}{self.tickets_path}/{ticket_id}",
-                    headers=self.headers
-                )
+            async with self._client() as client:
+                response = await self._send(client, f"{self.tickets_path}/{ticket_id}")
                 
                 if response.status_code == 200:
                     data = response.json()
@@ -75,37 +284,43 @@ class SyncroMSPService:
             logger.error(f"Error getting SyncroMSP ticket: {str(e)}")
             raise
     
+    @coalesced("get_customers")
     async def get_customers(self, limit: int = 100) -> List[Dict[str, Any]]:
-        """Get customers from SyncroMSP - READ-ONLY OPERATION"""
+        """Get up to `limit` customers from SyncroMSP, following pagination - READ-ONLY OPERATION"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}{self.customers_path}",
-                    headers=self.headers,
-                    params={"limit": limit}
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    customers = data.get("customers", [])
-                    logger.info(f"Retrieved {len(customers)} customers from SyncroMSP")
-                    return customers
-                else:
-                    logger.error(f"Failed to get customers: {response.status_code} - {response.text}")
-                    raise Exception(f"SyncroMSP API error: {response.status_code}")
+            customers = []
+            async for page in self.iter_pages(self.customers_path, "customers", max_items=limit):
+                customers.extend(page)
+            
+            logger.info(f"Retrieved {len(customers)} customers from SyncroMSP")
+            return customers
                     
         except Exception as e:
             logger.error(f"Error getting SyncroMSP customers: {str(e)}")
             raise
     
+    async def get_customers_page(self, page: int = 1, sort: Optional[str] = None) -> Dict[str, Any]:
+        """Get one page of customers with pagination meta - READ-ONLY OPERATION"""
+        try:
+            params = {"sort": sort} if sort else None
+            async with self._client(timeout=30.0) as client:
+                data = await self._get_page(client, self.customers_path, page, params)
+            
+            return {
+                "customers": data.get("customers", []),
+                "meta": data.get("meta", {})
+            }
+        
+        except Exception as e:
+            logger.error(f"Error getting SyncroMSP customers page {page}: {str(e)}")
+            raise
+
+    @coalesced("get_customer")
     async def get_customer(self, customer_id: int) -> Dict[str, Any]:
         """Get a specific customer from SyncroMSP - READ-ONLY OPERATION"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}{self.customers_path}/{customer_id}",
-                    headers=self.headers
-                )
+            async with self._client() as client:
+                response = await self._send(client, f"{self.customers_path}/{customer_id}")
                 
                 if response.status_code == 200:
                     data = response.json()
@@ -164,7 +379,7 @@ class SyncroMSPService:
 async def create_ticket_original(self, ticket_data: Dict[str, Any]) -> Dict[str, Any]:
     # Original create ticket implementation
     try:
-        async with httpx.AsyncClient() as client:
+        async with self._client() as client:
             response = await client.post(
                 f"{self.base_url}{self.tickets_path}",
                 headers=self.headers,
@@ -187,7 +402,7 @@ async def create_ticket_original(self, ticket_data: Dict[str, Any]) -> Dict[str,
 async def update_ticket_original(self, ticket_id: int, ticket_data: Dict[str, Any]) -> Dict[str, Any]:
     # Original update ticket implementation
     try:
-        async with httpx.AsyncClient() as client:
+        async with self._client() as client:
             response = await client.put(
                 f"{self.base_url}{self.tickets_path}/{ticket_id}",
                 headers=self.headers,
@@ -210,7 +425,7 @@ async def update_ticket_original(self, ticket_id: int, ticket_data: Dict[str, An
 async def add_comment_original(self, ticket_id: int, comment: str, hidden: bool = False) -> Dict[str, Any]:
     # Original add comment implementation
     try:
-        async with httpx.AsyncClient() as client:
+        async with self._client() as client:
             response = await client.post(
                 f"{self.base_url}{self.tickets_path}/{ticket_id}{self.ticket_comments_path}",
                 headers=self.headers,
@@ -0,0 +1,292 @@
+import asyncio
+import base64
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import AsyncSessionLocal, SyncroSyncState, SyncroTicket
+from .customer_mirror import parse_iso_datetime
+from .syncro_service import BACKGROUND, syncro_service
+
+_UPSERT_COLUMNS = (
+    "customer_id", "subject", "description", "status", "priority", "problem_type",
+    "assigned_technician", "created_at", "updated_at", "synced_at", "ticket_metadata"
+)
+
+
+def encode_cursor(updated_at: datetime, row_id: uuid.UUID) -> str:
+    return base64.urlsafe_b64encode(f"{updated_at.isoformat()}|{row_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Decode a keyset cursor, raising ValueError if it is malformed"""
+    try:
+        updated_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(updated_at), uuid.UUID(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def ticket_to_row(ticket: Dict[str, Any], synced_at: datetime) -> Dict[str, Any]:
+    """Map a SyncroMSP ticket payload to a syncro_tickets row"""
+    comments = ticket.get("comments") or []
+    technician = (ticket.get("user") or {}).get("full_name") or ticket.get("user_id")
+    customer_id = ticket.get("customer_id")
+
+    return {
+        "id": uuid.uuid4(),
+        "syncro_ticket_id": str(ticket.get("id")),
+        "customer_id": str(customer_id) if customer_id is not None else None,
+        "subject": ticket.get("subject"),
+        "description": ticket.get("description") or (comments[0].get("body") if comments else None),
+        "status": ticket.get("status"),
+        "priority": ticket.get("priority"),
+        "problem_type": ticket.get("problem_type"),
+        "assigned_technician": str(technician) if technician is not None else None,
+        "created_at": parse_iso_datetime(ticket.get("created_at")) or synced_at,
+        "updated_at": parse_iso_datetime(ticket.get("updated_at")) or synced_at,
+        "synced_at": synced_at,
+        "ticket_metadata": ticket
+    }
+
+
+def row_to_ticket(row: SyncroTicket) -> Dict[str, Any]:
+    """Return the mirrored ticket in the same shape SyncroMSP returns it"""
+    if row.ticket_metadata:
+        return row.ticket_metadata
+    return {
+        "id": int(row.syncro_ticket_id) if row.syncro_ticket_id and row.syncro_ticket_id.isdigit() else row.syncro_ticket_id,
+        "customer_id": row.customer_id,
+        "subject": row.subject,
+        "description": row.description,
+        "status": row.status,
+        "priority": row.priority,
+        "problem_type": row.problem_type,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "updated_at": row.updated_at.isoformat() if row.updated_at else None
+    }
+
+
+class SyncroTicketMirror:
+    """Delta sync of SyncroMSP tickets into syncro_tickets, plus reads against it.
+
+    Each sync asks SyncroMSP only for tickets updated since the high-water mark of
+    the last completed sync (minus a small overlap for clock skew) and upserts
+    them. The mark lives in syncro_sync_state and only moves when a sync finishes,
+    so write-through upserts and half-finished syncs cannot skip tickets. A
+    background task in the sync leader worker repeats this every
+    SYNCROMSP_TICKET_SYNC_SECONDS, in full every SYNCROMSP_TICKET_FULL_SYNC_SECONDS.
+    Reads come from the table, so other workers need no task of their own.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("SYNCROMSP_TICKET_MIRROR_ENABLED", "true").lower() == "true"
+        self.sync_interval = float(os.getenv("SYNCROMSP_TICKET_SYNC_SECONDS", "120"))
+        self.full_sync_interval = float(os.getenv("SYNCROMSP_TICKET_FULL_SYNC_SECONDS", "86400"))
+        self.overlap = timedelta(seconds=float(os.getenv("SYNCROMSP_TICKET_SYNC_OVERLAP_SECONDS", "60")))
+        self.has_data = False
+        self.leading = False
+        self.last_sync_at: Optional[datetime] = None
+        self.last_full_sync_at: Optional[datetime] = None
+        self.last_result: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def is_ready(self, db: AsyncSession) -> bool:
+        """True once the mirror holds tickets (checked against the table until it does)"""
+        if not self.has_data:
+            result = await db.execute(select(SyncroTicket.id).limit(1))
+            self.has_data = result.first() is not None
+        return self.has_data
+
+    async def _load_state(self) -> Optional[SyncroSyncState]:
+        async with AsyncSessionLocal() as db:
+            return await db.get(SyncroSyncState, "tickets")
+
+    async def _save_state(self, high_water: Optional[datetime], full: bool) -> None:
+        """Record a completed sync (the only place the delta cursor advances)"""
+        now = datetime.utcnow()
+        values = {"resource": "tickets", "high_water": high_water, "updated_at": now}
+        if full:
+            values["last_full_sync_at"] = now
+        stmt = pg_insert(SyncroSyncState).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SyncroSyncState.resource],
+            set_={column: stmt.excluded[column] for column in values if column != "resource"}
+        )
+        async with AsyncSessionLocal() as db:
+            await db.execute(stmt)
+            await db.commit()
+        if full:
+            self.last_full_sync_at = now
+
+    async def sync(self, full: bool = False) -> Dict[str, Any]:
+        """Upsert tickets updated since the last completed sync's high-water mark (or all tickets if full)"""
+        async with self._lock:
+            started = time.monotonic()
+            state = await self._load_state()
+            if state is not None and state.last_full_sync_at:
+                self.last_full_sync_at = state.last_full_sync_at
+            previous = state.high_water if state is not None else None
+            since = None
+            if not full and previous:
+                since = previous - self.overlap
+
+            pages = inserted = updated = 0
+            high_water = previous
+            params = {"since_updated_at": since.isoformat() + "Z"} if since else None
+            # Pages arrive concurrently; each is upserted as soon as it lands
+            with syncro_service.priority(BACKGROUND):
+                async for tickets in syncro_service.iter_pages(syncro_service.tickets_path, "tickets", params=params):
+                    pages += 1
+                    if not tickets:
+                        continue
+                    page_inserted, page_updated = await self.upsert(tickets)
+                    inserted += page_inserted
+                    updated += page_updated
+                    for ticket in tickets:
+                        updated_at = parse_iso_datetime(ticket.get("updated_at"))
+                        if updated_at and (high_water is None or updated_at > high_water):
+                            high_water = updated_at
+
+            # Reached only if every page landed
+            await self._save_state(high_water, full or since is None)
+            self.last_sync_at = datetime.utcnow()
+            self.last_error = None
+            self.last_result = {
+                "mode": "full" if full else ("delta" if since else "initial"),
+                "since": since.isoformat() if since else None,
+                "pages": pages,
+                "inserted": inserted,
+                "updated": updated,
+                "duration_seconds": round(time.monotonic() - started, 3)
+            }
+            logger.info(f"SyncroMSP ticket mirror synced: {self.last_result}")
+            return self.last_result
+
+    async def upsert(self, tickets: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """Insert or update tickets, returning (inserted, updated) counts"""
+        now = datetime.utcnow()
+        rows = {str(ticket.get("id")): ticket_to_row(ticket, now) for ticket in tickets}
+        if not rows:
+            return 0, 0
+
+        stmt = pg_insert(SyncroTicket).values(list(rows.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SyncroTicket.syncro_ticket_id],
+            set_={column: stmt.excluded[column] for column in _UPSERT_COLUMNS}
+        ).returning(literal_column("(xmax = 0)").label("inserted"))
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(stmt)
+            flags = [row.inserted for row in result]
+            await db.commit()
+
+        self.has_data = True
+        inserted = sum(1 for flag in flags if flag)
+        return inserted, len(flags) - inserted
+
+    async def list_tickets(
+        self,
+        db: AsyncSession,
+        status: Optional[str] = None,
+        priority: Optional[str] = None,
+        customer_id: Optional[str] = None,
+        updated_since: Optional[datetime] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Most recently updated tickets first, filtered in SQL, paged by (updated_at, id) keyset"""
+        query = select(SyncroTicket)
+        if status:
+            query = query.where(SyncroTicket.status == status)
+        if priority:
+            query = query.where(SyncroTicket.priority == priority)
+        if customer_id:
+            query = query.where(SyncroTicket.customer_id == str(customer_id))
+        if updated_since:
+            # updated_at is stored as naive UTC; asyncpg rejects comparing it with an aware value
+            if updated_since.tzinfo is not None:
+                updated_since = updated_since.astimezone(timezone.utc).replace(tzinfo=None)
+            query = query.where(SyncroTicket.updated_at >= updated_since)
+        if cursor:
+            cursor_updated_at, cursor_id = decode_cursor(cursor)
+            query = query.where(tuple_(SyncroTicket.updated_at, SyncroTicket.id) < tuple_(cursor_updated_at, cursor_id))
+
+        query = query.order_by(SyncroTicket.updated_at.desc(), SyncroTicket.id.desc()).limit(limit + 1)
+        rows = (await db.execute(query)).scalars().all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].updated_at, rows[-1].id)
+        return [row_to_ticket(row) for row in rows], next_cursor
+
+    async def get_ticket(self, db: AsyncSession, ticket_id: int) -> Optional[SyncroTicket]:
+        result = await db.execute(select(SyncroTicket).where(SyncroTicket.syncro_ticket_id == str(ticket_id)))
+        return result.scalar_one_or_none()
+
+    async def _run(self) -> None:
+        while True:
+            if self.last_full_sync_at is None:
+                try:
+                    state = await self._load_state()
+                    if state is not None:
+                        self.last_full_sync_at = state.last_full_sync_at
+                except Exception as e:
+                    logger.warning(f"Could not read SyncroMSP ticket sync state: {str(e)}")
+            # Without a recorded full sync the cursor is missing too, so sync() runs in full anyway
+            full = (
+                self.last_full_sync_at is not None
+                and (datetime.utcnow() - self.last_full_sync_at).total_seconds() >= self.full_sync_interval
+            )
+            try:
+                await self.sync(full=full)
+            except Exception as e:
+                logger.error(f"SyncroMSP ticket mirror sync failed: {str(e)}")
+                self.last_error = str(e)
+            await asyncio.sleep(self.sync_interval)
+
+    async def start(self, leader: bool = True) -> None:
+        """Start the background delta sync task (in the sync leader only)"""
+        if not self.enabled or not leader or self._task is not None:
+            return
+        self.leading = True
+        self._task = asyncio.create_task(self._run())
+        logger.info("SyncroMSP ticket mirror started")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.leading = False
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "leading": self.leading,
+            "has_data": self.has_data,
+            "syncing": self._lock.locked(),
+            "last_sync_at": self.last_sync_at.isoformat() if self.last_sync_at else None,
+            "last_full_sync_at": self.last_full_sync_at.isoformat() if self.last_full_sync_at else None,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+            "sync_interval_seconds": self.sync_interval
+        }
+
+
+# Create singleton instance
+ticket_mirror = SyncroTicketMirror()
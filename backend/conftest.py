@@ -0,0 +1,2 @@
+# Shared fixtures; this file also puts backend/ on sys.path for the tests
+from emulator.fixtures import retell_emulator  # noqa: F401
@@ -0,0 +1,3 @@
+# Local emulators for upstream APIs (offline testing and load tests)
+from .retell import EmulatorConfig, create_app
+from .fixtures import EmulatorServer, running_emulator
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Run the local RetellAI emulator
+
+    python -m emulator --port 8900 --latency-ms 120 --error-rate 0.02 --rate-limit 20 \
+        --webhook-url http://localhost:8000/api/v1/retellai/agent-level-webhook
+
+Then start the backend with RETELLAI_API_URL=http://127.0.0.1:8900
+"""
+
+import argparse
+
+import uvicorn
+
+from emulator.retell import EmulatorConfig, create_app
+
+
+def main():
+    defaults = EmulatorConfig()
+    parser = argparse.ArgumentParser(description="Local RetellAI API emulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms)
+    parser.add_argument("--latency-jitter-ms", type=float, default=defaults.latency_jitter_ms)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="Fraction of requests failing (0-1)")
+    parser.add_argument("--error-status", type=int, default=defaults.error_status)
+    parser.add_argument("--rate-limit", type=float, default=defaults.rate_limit_per_second, help="Requests per second, 0 disables")
+    parser.add_argument("--rate-limit-burst", type=float, default=defaults.rate_limit_burst)
+    parser.add_argument("--webhook-url", default=defaults.webhook_url, help="Agent-level webhook receiving call events")
+    parser.add_argument("--webhook-turns", type=int, default=defaults.webhook_turns)
+    parser.add_argument("--webhook-interval-ms", type=float, default=defaults.webhook_interval_ms)
+    parser.add_argument("--seed-agents", type=int, default=defaults.seed_agents)
+    parser.add_argument("--seed-phone-numbers", type=int, default=defaults.seed_phone_numbers)
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible runs")
+    args = parser.parse_args()
+
+    config = EmulatorConfig(
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        rate_limit_per_second=args.rate_limit,
+        rate_limit_burst=args.rate_limit_burst,
+        webhook_url=args.webhook_url,
+        webhook_turns=args.webhook_turns,
+        webhook_interval_ms=args.webhook_interval_ms,
+        seed_agents=args.seed_agents,
+        seed_phone_numbers=args.seed_phone_numbers,
+        seed=args.seed
+    )
+
+    print(f"🧪 RetellAI emulator on http://{args.host}:{args.port}")
+    print(f"   Point the backend at it with RETELLAI_API_URL=http://{args.host}:{args.port}")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Helpers for running the RetellAI emulator inside tests and benchmarks.
+
+    with running_emulator(EmulatorConfig(latency_ms=80, error_rate=0.05)) as emulator:
+        retell_service.base_url = emulator.url
+        retell_service.base_url_v2 = f"{emulator.url}/v2"
+        ...
+
+When pytest is installed a ``retell_emulator`` fixture is also provided; it starts
+an emulator and points the ``retell_service`` singleton at it for the test.
+"""
+
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import uvicorn
+
+from emulator.retell import EmulatorConfig, EmulatorState, create_app
+
+
+class EmulatorServer:
+    """Runs an emulator app with uvicorn on a background thread"""
+
+    def __init__(self, config: Optional[EmulatorConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.app = create_app(config)
+        self.host = host
+        self.port = port
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def state(self) -> EmulatorState:
+        return self.app.state.emulator
+
+    def start(self, timeout: float = 10.0) -> "EmulatorServer":
+        # Bind first so port=0 resolves to a free port before the server starts
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        self.port = sock.getsockname()[1]
+
+        self._server = uvicorn.Server(uvicorn.Config(self.app, log_level="warning", lifespan="off"))
+        self._thread = threading.Thread(target=self._server.run, kwargs={"sockets": [sock]}, daemon=True)
+        self._thread.start()
+
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("RetellAI emulator failed to start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+@contextmanager
+def running_emulator(config: Optional[EmulatorConfig] = None, host: str = "127.0.0.1", port: int = 0) -> Iterator[EmulatorServer]:
+    """Start an emulator for the duration of the block"""
+    server = EmulatorServer(config, host=host, port=port).start()
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
+if pytest is not None:
+    @pytest.fixture
+    def retell_emulator(monkeypatch):
+        """Emulator with the retell_service singleton pointed at it (use emulator.state to reconfigure)"""
+        monkeypatch.setenv("RETELLAI_API_KEY", "emulator")
+        from api.services.retell_service import retell_service
+
+        with running_emulator(EmulatorConfig(seed=0)) as server:
+            monkeypatch.setattr(retell_service, "base_url", server.url)
+            monkeypatch.setattr(retell_service, "base_url_v2", f"{server.url}/v2")
+            retell_service.invalidate_cache()
+            yield server
+            retell_service.invalidate_cache()
@@ -0,0 +1,342 @@
+"""
+Local RetellAI API emulator.
+
+Implements the RetellAI endpoints used by RetellAIService with in-memory state,
+configurable latency, error injection and rate limiting, and streams agent-level
+webhooks for every call it "places". Point the backend at it with
+RETELLAI_API_URL=http://127.0.0.1:8900 (any RETELLAI_API_KEY is accepted).
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from api.services.rate_limit import TokenBucket
+from emulator.webhooks import stream_call_webhooks
+
+
+class EmulatorConfig(BaseModel):
+    """Runtime behaviour of the emulator, adjustable via PATCH /emulator/config"""
+    latency_ms: float = float(os.getenv("RETELL_EMULATOR_LATENCY_MS", "50"))
+    latency_jitter_ms: float = float(os.getenv("RETELL_EMULATOR_LATENCY_JITTER_MS", "25"))
+    error_rate: float = float(os.getenv("RETELL_EMULATOR_ERROR_RATE", "0"))
+    error_status: int = int(os.getenv("RETELL_EMULATOR_ERROR_STATUS", "500"))
+    rate_limit_per_second: float = float(os.getenv("RETELL_EMULATOR_RATE_LIMIT_PER_SECOND", "0"))
+    rate_limit_burst: float = float(os.getenv("RETELL_EMULATOR_RATE_LIMIT_BURST", "20"))
+    webhook_url: Optional[str] = os.getenv("RETELL_EMULATOR_WEBHOOK_URL")
+    webhook_turns: int = int(os.getenv("RETELL_EMULATOR_WEBHOOK_TURNS", "4"))
+    webhook_interval_ms: float = float(os.getenv("RETELL_EMULATOR_WEBHOOK_INTERVAL_MS", "250"))
+    webhook_start_delay_ms: float = float(os.getenv("RETELL_EMULATOR_WEBHOOK_START_DELAY_MS", "500"))
+    seed_agents: int = int(os.getenv("RETELL_EMULATOR_SEED_AGENTS", "5"))
+    seed_phone_numbers: int = int(os.getenv("RETELL_EMULATOR_SEED_PHONE_NUMBERS", "3"))
+    seed: Optional[int] = None
+
+
+class EmulatorState:
+    """In-memory RetellAI objects plus request counters"""
+
+    def __init__(self, config: EmulatorConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.reset()
+
+    def reset(self) -> None:
+        self.agents: Dict[str, Dict[str, Any]] = {}
+        self.flows: Dict[str, Dict[str, Any]] = {}
+        self.phone_numbers: Dict[str, Dict[str, Any]] = {}
+        self.calls: Dict[str, Dict[str, Any]] = {}
+        self.requests: Counter = Counter()
+        self.injected_errors: Counter = Counter()
+        self.throttled: Counter = Counter()
+        self.webhooks_sent = 0
+        self.webhook_tasks: List[asyncio.Task] = []
+        self.configure_rate_limit()
+
+        for i in range(self.config.seed_agents):
+            self.create_agent({"agent_name": f"Emulated Agent {i + 1}", "voice_id": "11labs-Adrian"})
+        agent_ids = list(self.agents)
+        for i in range(self.config.seed_phone_numbers):
+            number = f"+1555010{i:04d}"
+            agent_id = agent_ids[i % len(agent_ids)] if agent_ids else None
+            self.phone_numbers[number] = {
+                "phone_number": number,
+                "phone_number_id": number,
+                "phone_number_pretty": f"+1 (555) 010-{i:04d}",
+                "area_code": 555,
+                "nickname": f"Emulator line {i + 1}",
+                "inbound_agent_id": agent_id,
+                "outbound_agent_id": agent_id,
+                "last_modification_timestamp": _now_ms()
+            }
+
+    def configure_rate_limit(self) -> None:
+        rate = self.config.rate_limit_per_second
+        self.bucket = TokenBucket(rate, self.config.rate_limit_burst) if rate > 0 else None
+
+    def create_agent(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        agent_id = f"agent_{uuid.uuid4().hex[:24]}"
+        agent = {
+            "agent_id": agent_id,
+            "agent_name": data.get("agent_name"),
+            "voice_id": data.get("voice_id", "11labs-Adrian"),
+            "response_engine": {"type": data.get("llm_type", "retell-llm"), "llm_id": f"llm_{uuid.uuid4().hex[:24]}"},
+            "webhook_url": data.get("webhook_url"),
+            "agent_level_webhook_url": data.get("agent_level_webhook_url"),
+            "version": 0,
+            "last_modification_timestamp": _now_ms(),
+            **{k: v for k, v in data.items() if k not in ("agent_id", "version")}
+        }
+        self.agents[agent_id] = agent
+        return agent
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _not_found(kind: str, object_id: str) -> HTTPException:
+    return HTTPException(status_code=404, detail=f"{kind} {object_id} not found")
+
+
+def create_app(config: Optional[EmulatorConfig] = None) -> FastAPI:
+    """Build an emulator app with its own state"""
+    app = FastAPI(title="RetellAI Emulator", docs_url="/emulator/docs", openapi_url="/emulator/openapi.json")
+    state = EmulatorState(config or EmulatorConfig())
+    app.state.emulator = state
+
+    @app.middleware("http")
+    async def emulate_upstream(request: Request, call_next):
+        path = request.url.path
+        if path.startswith("/emulator"):
+            return await call_next(request)
+
+        route = "/".join(path.split("/")[:3]) if path.startswith("/v2/") else "/".join(path.split("/")[:2])
+        state.requests[route] += 1
+        cfg = state.config
+
+        if not request.headers.get("authorization", "").startswith("Bearer "):
+            return JSONResponse({"detail": "Missing API key"}, status_code=401)
+
+        if state.bucket is not None:
+            wait = state.bucket.try_acquire()
+            if wait > 0:
+                state.throttled[route] += 1
+                return JSONResponse(
+                    {"detail": "Rate limit exceeded"},
+                    status_code=429,
+                    headers={"Retry-After": str(max(1, round(wait)))}
+                )
+
+        latency = cfg.latency_ms + state.rng.uniform(-cfg.latency_jitter_ms, cfg.latency_jitter_ms)
+        if latency > 0:
+            await asyncio.sleep(latency / 1000)
+
+        if cfg.error_rate > 0 and state.rng.random() < cfg.error_rate:
+            state.injected_errors[route] += 1
+            return JSONResponse({"detail": "Injected emulator error"}, status_code=cfg.error_status)
+
+        return await call_next(request)
+
+    # Agents
+
+    @app.post("/create-agent", status_code=201)
+    async def create_agent(request: Request):
+        return state.create_agent(await request.json())
+
+    @app.get("/list-agents")
+    async def list_agents():
+        return list(state.agents.values())
+
+    @app.get("/get-agent/{agent_id}")
+    async def get_agent(agent_id: str):
+        if agent_id not in state.agents:
+            raise _not_found("Agent", agent_id)
+        return state.agents[agent_id]
+
+    @app.patch("/update-agent/{agent_id}")
+    async def update_agent(agent_id: str, request: Request):
+        agent = state.agents.get(agent_id)
+        if agent is None:
+            raise _not_found("Agent", agent_id)
+        agent.update(await request.json())
+        agent["version"] += 1
+        agent["last_modification_timestamp"] = _now_ms()
+        return agent
+
+    # Conversation flows
+
+    @app.post("/create-conversation-flow", status_code=201)
+    async def create_conversation_flow(request: Request):
+        flow_id = f"conversation_flow_{uuid.uuid4().hex[:12]}"
+        flow = {**await request.json(), "conversation_flow_id": flow_id, "version": 0}
+        state.flows[flow_id] = flow
+        return flow
+
+    @app.get("/list-conversation-flows")
+    async def list_conversation_flows():
+        return list(state.flows.values())
+
+    @app.get("/get-conversation-flow/{flow_id}")
+    async def get_conversation_flow(flow_id: str):
+        if flow_id not in state.flows:
+            raise _not_found("Conversation flow", flow_id)
+        return state.flows[flow_id]
+
+    @app.patch("/update-conversation-flow/{flow_id}")
+    async def update_conversation_flow(flow_id: str, request: Request):
+        flow = state.flows.get(flow_id)
+        if flow is None:
+            raise _not_found("Conversation flow", flow_id)
+        flow.update(await request.json())
+        flow["version"] += 1
+        return flow
+
+    @app.delete("/delete-conversation-flow/{flow_id}")
+    async def delete_conversation_flow(flow_id: str):
+        if state.flows.pop(flow_id, None) is None:
+            raise _not_found("Conversation flow", flow_id)
+        return {"success": True}
+
+    # Phone numbers
+
+    @app.get("/list-phone-numbers")
+    async def list_phone_numbers():
+        return list(state.phone_numbers.values())
+
+    @app.get("/get-phone-number/{phone_number}")
+    async def get_phone_number(phone_number: str):
+        if phone_number not in state.phone_numbers:
+            raise _not_found("Phone number", phone_number)
+        return state.phone_numbers[phone_number]
+
+    @app.patch("/update-phone-number/{phone_number}")
+    async def update_phone_number(phone_number: str, request: Request):
+        number = state.phone_numbers.get(phone_number)
+        if number is None:
+            raise _not_found("Phone number", phone_number)
+        number.update(await request.json())
+        number["last_modification_timestamp"] = _now_ms()
+        return number
+
+    # Calls
+
+    @app.post("/v2/create-phone-call", status_code=201)
+    async def create_phone_call(request: Request):
+        data = await request.json()
+        agent_id = data.get("override_agent_id")
+        if agent_id is None and data.get("from_number") in state.phone_numbers:
+            agent_id = state.phone_numbers[data["from_number"]].get("outbound_agent_id")
+
+        call_id = f"call_{uuid.uuid4().hex}"
+        call = {
+            "call_id": call_id,
+            "call_type": "phone_call",
+            "agent_id": agent_id,
+            "from_number": data.get("from_number"),
+            "to_number": data.get("to_number"),
+            "direction": "outbound",
+            "call_status": "registered",
+            "metadata": data.get("metadata", {}),
+            "start_timestamp": None,
+            "end_timestamp": None
+        }
+        state.calls[call_id] = call
+        start_webhook_stream(state, call)
+        return call
+
+    @app.get("/v2/get-call/{call_id}")
+    async def get_call(call_id: str):
+        if call_id not in state.calls:
+            raise _not_found("Call", call_id)
+        return state.calls[call_id]
+
+    @app.post("/v2/list-calls")
+    async def list_calls(request: Request):
+        body = await request.json() if await request.body() else {}
+        reverse = body.get("sort_order", "descending") == "descending"
+        calls = sorted(state.calls.values(), key=lambda c: c.get("start_timestamp") or 0, reverse=reverse)
+        return calls[:body.get("limit", 1000)]
+
+    # Emulator control
+
+    @app.get("/emulator/config")
+    async def get_config():
+        return state.config
+
+    @app.patch("/emulator/config")
+    async def update_config(request: Request):
+        state.config = state.config.copy(update=await request.json())
+        state.configure_rate_limit()
+        return state.config
+
+    @app.post("/emulator/reset")
+    async def reset():
+        state.reset()
+        return {"success": True, "agents": len(state.agents), "phone_numbers": len(state.phone_numbers)}
+
+    @app.get("/emulator/stats")
+    async def stats():
+        return {
+            "requests": dict(state.requests),
+            "injected_errors": dict(state.injected_errors),
+            "throttled": dict(state.throttled),
+            "agents": len(state.agents),
+            "conversation_flows": len(state.flows),
+            "phone_numbers": len(state.phone_numbers),
+            "calls": len(state.calls),
+            "webhooks_sent": state.webhooks_sent
+        }
+
+    @app.post("/emulator/calls/{call_id}/webhooks")
+    async def replay_webhooks(call_id: str, webhook_url: Optional[str] = None):
+        """Stream webhooks for an existing call again (optionally to another URL)"""
+        call = state.calls.get(call_id)
+        if call is None:
+            raise _not_found("Call", call_id)
+        if not start_webhook_stream(state, call, webhook_url):
+            raise HTTPException(status_code=400, detail="No webhook_url configured")
+        return {"success": True, "call_id": call_id}
+
+    return app
+
+
+def start_webhook_stream(state: EmulatorState, call: Dict[str, Any], webhook_url: Optional[str] = None) -> bool:
+    """Schedule the webhook stream for a call; the call record follows the stream's progress"""
+    webhook_url = webhook_url or state.config.webhook_url
+    if not webhook_url:
+        return False
+
+    def on_event(event: Dict[str, Any]) -> None:
+        state.webhooks_sent += 1
+        data = event["data"]
+        if event["event"] == "call_started":
+            call.update(call_status="ongoing", start_timestamp=data["start_timestamp"])
+        elif event["event"] == "call_ended":
+            call.update({k: v for k, v in data.items() if k != "call_id"})
+
+    task = asyncio.create_task(stream_call_webhooks(
+        call,
+        webhook_url,
+        turns=state.config.webhook_turns,
+        interval_ms=state.config.webhook_interval_ms,
+        start_delay_ms=state.config.webhook_start_delay_ms,
+        rng=state.rng,
+        on_event=on_event
+    ))
+    state.webhook_tasks.append(task)
+    task.add_done_callback(state.webhook_tasks.remove)
+    return True
+
+
+app = create_app()
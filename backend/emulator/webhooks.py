@@ -0,0 +1,134 @@
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from loguru import logger
+
+# Short IT support exchanges used to build transcripts; (user, agent) pairs
+DIALOGUE = [
+    ("Hi, my email stopped syncing on my laptop this morning.",
+     "Sorry to hear that. Can you tell me which company you're calling from?"),
+    ("It's Acme Dental, I'm the office manager.",
+     "Thanks. I can see your account. Is it just your mailbox or everyone in the office?"),
+    ("Just mine as far as I know.",
+     "Got it. Have you changed your password recently?"),
+    ("Yes, yesterday actually.",
+     "That's likely it. Outlook still has the old password cached. Let's update it together."),
+    ("Okay, I'm on the sign-in window now.",
+     "Great, enter the new password and tick 'remember my credentials'."),
+    ("It's syncing again, thank you!",
+     "Perfect. I'll open a ticket with the details so the team has a record."),
+    ("Also the printer in reception keeps jamming.",
+     "I'll add that to the ticket and have a technician follow up today."),
+    ("That's everything, thanks.",
+     "You're welcome. Have a great day!"),
+]
+
+TOOL_CALLS = [
+    ("lookup_customer", {"company_name": "Acme Dental"}, {"customer_id": 1001, "found": True}),
+    ("create_ticket", {"subject": "Outlook not syncing after password change", "priority": "Medium"},
+     {"ticket_id": 52001, "number": "52001"}),
+]
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def build_call_events(call: Dict[str, Any], turns: int = 4, rng: Optional[random.Random] = None) -> List[Dict[str, Any]]:
+    """Build the ordered agent-level webhook events for one emulated call.
+
+    Produces call_started, interleaved speech_detected/user_speech/agent_response
+    turns with a tool_call part way through, and call_ended with the transcript.
+    """
+    rng = rng or random.Random()
+    call_id = call["call_id"]
+    turns = max(1, min(turns, len(DIALOGUE)))
+    started_at = _now_ms()
+
+    events: List[Dict[str, Any]] = [{
+        "event": "call_started",
+        "data": {
+            "call_id": call_id,
+            "agent_id": call.get("agent_id"),
+            "from_number": call.get("from_number"),
+            "to_number": call.get("to_number"),
+            "direction": call.get("direction", "outbound"),
+            "start_timestamp": started_at
+        }
+    }]
+
+    transcript_lines = []
+    tool_turn = rng.randrange(turns)
+    for turn, (user_text, agent_text) in enumerate(DIALOGUE[:turns]):
+        events.append({"event": "speech_detected", "data": {"call_id": call_id, "speaker": "user", "detected": True}})
+        events.append({
+            "event": "user_speech",
+            "data": {"call_id": call_id, "transcript": user_text, "is_final": True}
+        })
+        transcript_lines.append(f"User: {user_text}")
+
+        if turn == tool_turn:
+            name, arguments, result = TOOL_CALLS[rng.randrange(len(TOOL_CALLS))]
+            events.append({
+                "event": "tool_call",
+                "data": {
+                    "call_id": call_id,
+                    "tool_call": {"function": {"name": name, "arguments": arguments}},
+                    "result": result
+                }
+            })
+
+        events.append({
+            "event": "agent_response",
+            "data": {"call_id": call_id, "response": agent_text, "is_final": True}
+        })
+        transcript_lines.append(f"Agent: {agent_text}")
+
+    events.append({
+        "event": "call_ended",
+        "data": {
+            "call_id": call_id,
+            "agent_id": call.get("agent_id"),
+            "call_status": "ended",
+            "disconnection_reason": "agent_hangup",
+            "start_timestamp": started_at,
+            "end_timestamp": _now_ms(),
+            "call_length_ms": turns * rng.randint(6000, 15000),
+            "recording_url": f"https://emulator.local/recordings/{call_id}.wav",
+            "transcript": "\n".join(transcript_lines)
+        }
+    })
+    return events
+
+
+async def stream_call_webhooks(
+    call: Dict[str, Any],
+    webhook_url: str,
+    turns: int = 4,
+    interval_ms: float = 250,
+    start_delay_ms: float = 500,
+    rng: Optional[random.Random] = None,
+    on_event=None
+) -> int:
+    """POST a realistic webhook stream for `call` to `webhook_url`, returns the number delivered"""
+    delivered = 0
+    await asyncio.sleep(start_delay_ms / 1000)
+
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        for event in build_call_events(call, turns=turns, rng=rng):
+            if on_event:
+                on_event(event)
+            try:
+                response = await client.post(webhook_url, json=event)
+                if response.status_code < 400:
+                    delivered += 1
+                else:
+                    logger.warning(f"Emulator webhook {event['event']} rejected: {response.status_code}")
+            except httpx.HTTPError as e:
+                logger.warning(f"Emulator webhook {event['event']} failed: {str(e)}")
+            await asyncio.sleep(interval_ms / 1000)
+
+    return delivered
@@ -1,20 +1,51 @@
 from fastapi import FastAPI, HTTPException, Depends
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from contextlib import asynccontextmanager
+import asyncio
+import gc
 import uvicorn
 import os
 from dotenv import load_dotenv
 from loguru import logger
 from sqlalchemy import text
 
-from api.routes import agents, phone_numbers, calls, syncro, dashboard, prompts, retellai, eval_tests, onboarding, knowledge_base
+from api.routes import agents, phone_numbers, calls, syncro, dashboard, prompts, retellai, eval_tests, onboarding, knowledge_base, caller_identity
 from api.database import engine, Base
 from api.middleware.logging import LoggingMiddleware
+from api.services.metrics import upstream_metrics
+from api.services.customer_mirror import customer_mirror
+from api.services.ticket_mirror import ticket_mirror
+from api.services.caller_identity import caller_identity as caller_identity_resolver
+from api.services.itglue_mirror import itglue_mirror
+from api.services.knowledge_index import knowledge_search
+from api.services.knowledge_retrieval import knowledge_retriever
+from api.services.knowledge_stats import knowledge_stats
+from api.services.leader import sync_leader
+from api.prompts.prompt_manager import prompt_manager
+from api.prompts.suggestions import prompt_suggester
+from api.prompts.propagation import prompt_propagator
+from api.prompts.catalog_cache import prompt_catalog_cache
 
 # Load environment variables
 load_dotenv()
 
+async def freeze_startup_heap():
+    """Move the startup knowledge indexes out of cyclic GC once they are built.
+
+    gc.freeze() is process-wide and permanent: everything alive at that moment
+    is never scanned (or collected by the cycle collector) again. It runs once
+    per worker, after a gc.collect() so pending cycle garbage is freed rather
+    than frozen. The indexes are millions of small acyclic objects; without this,
+    full collections traverse them and stall requests. Later rebuilds are not
+    frozen, and indexes they replace are still freed by reference counting.
+    """
+    await asyncio.gather(knowledge_search.wait_built(), knowledge_retriever.wait_built(), return_exceptions=True)
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Froze {gc.get_freeze_count()} startup objects out of cyclic GC")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan management"""
@@ -30,10 +61,28 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Database connection failed: {e}")
     
+    # Every worker keeps its own in-memory indexes over the mirrors, prompt files and catalog
+    await knowledge_search.start()
+    await knowledge_retriever.start()
+    await prompt_manager.start()
+    await prompt_suggester.start()
+    await prompt_catalog_cache.start()
+    # One elected worker syncs SyncroMSP and ITGlue; the others follow the mirror tables
+    await sync_leader.start(customer_mirror, caller_identity_resolver, ticket_mirror, itglue_mirror, knowledge_stats)
+    heap_freeze = asyncio.create_task(freeze_startup_heap())
+    
     yield
     
     # Shutdown
     logger.info("Shutting down SigmaOne TuneUp Backend...")
+    heap_freeze.cancel()
+    await prompt_propagator.stop()
+    await sync_leader.stop()
+    await prompt_catalog_cache.stop()
+    await prompt_suggester.stop()
+    await prompt_manager.stop()
+    await knowledge_retriever.stop()
+    await knowledge_search.stop()
 
 # Create FastAPI app
 app = FastAPI(
@@ -68,6 +117,7 @@ app.include_router(retellai.router, prefix="/api/v1/retellai", tags=["retellai"]
 app.include_router(eval_tests.router, prefix="/api/v1/eval-tests", tags=["eval-tests"])
 app.include_router(onboarding.router, prefix="/api/v1/onboarding", tags=["onboarding"])
 app.include_router(knowledge_base.router, prefix="/api/v1/knowledge-base", tags=["knowledge-base"])
+app.include_router(caller_identity.router, prefix="/api/v1/caller-identity", tags=["caller-identity"])
 
 @app.get("/")
 async def root():
@@ -83,6 +133,11 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "message": "API is running"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Upstream API metrics (RetellAI, SyncroMSP, ITGlue) in Prometheus text format"""
+    return PlainTextResponse(upstream_metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
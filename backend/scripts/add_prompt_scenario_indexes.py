@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.database import engine
+from sqlalchemy import text
+
+async def add_prompt_scenario_indexes():
+    """Index active scenarios by template (grouped scenario counts) and active assignments by scenario (bulk assignment checks)"""
+
+    async with engine.begin() as conn:
+        print("Adding prompt scenario and assignment indexes...")
+
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_prompt_scenarios_active_template_id
+            ON prompt_scenarios (template_id)
+            WHERE is_active;
+        """))
+        print("✓ Created partial index on active scenarios by template_id")
+
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_agent_prompt_assignments_active_scenario_agent
+            ON agent_prompt_assignments (scenario_id, agent_id)
+            WHERE is_active;
+        """))
+        print("✓ Created partial index on active assignments by scenario_id, agent_id")
+
+    print("✅ Prompt scenario and assignment indexes ready!")
+
+if __name__ == "__main__":
+    asyncio.run(add_prompt_scenario_indexes())
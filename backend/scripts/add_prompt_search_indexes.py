@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.database import engine
+from sqlalchemy import text
+
+# table -> columns searched with ILIKE '%term%' by the prompt listing routes
+SEARCH_COLUMNS = {
+    "prompt_templates": ("name", "title", "description"),
+    "prompt_scenarios": ("name", "description"),
+}
+
+async def add_prompt_search_indexes():
+    """Enable pg_trgm and add trigram GIN indexes for template and scenario search"""
+
+    async with engine.begin() as conn:
+        print("Adding prompt search indexes...")
+
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm;"))
+        print("✓ pg_trgm extension enabled")
+
+        for table, columns in SEARCH_COLUMNS.items():
+            for column in columns:
+                await conn.execute(text(f"""
+                    CREATE INDEX IF NOT EXISTS ix_{table}_{column}_trgm
+                    ON {table} USING gin ({column} gin_trgm_ops);
+                """))
+                print(f"✓ Created trigram index on {table}.{column}")
+
+    print("✅ Prompt search indexes ready! Restart the API so search switches to similarity ranking.")
+
+if __name__ == "__main__":
+    asyncio.run(add_prompt_search_indexes())
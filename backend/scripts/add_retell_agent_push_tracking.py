@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.database import engine
+from sqlalchemy import text
+
+async def add_retell_agent_push_tracking():
+    """Create the table used to skip RetellAI agent pushes that change nothing"""
+
+    async with engine.begin() as conn:
+        print("Creating retell_agent_push_state...")
+
+        await conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS retell_agent_push_state (
+                retell_agent_id VARCHAR PRIMARY KEY,
+                field_hashes JSONB NOT NULL DEFAULT '{}'::jsonb,
+                last_pushed_at TIMESTAMP,
+                updated_at TIMESTAMP
+            );
+        """))
+        print("✓ Created retell_agent_push_state (field hashes keyed by RetellAI agent id)")
+
+        # Earlier per-row baselines could disagree with each other; they are only hashes, so drop them
+        for table in ("retell_agents", "agents"):
+            await conn.execute(text(f"""
+                ALTER TABLE {table}
+                DROP COLUMN IF EXISTS pushed_field_hashes,
+                DROP COLUMN IF EXISTS last_pushed_at;
+            """))
+        print("✓ Dropped per-row push tracking columns from retell_agents and agents")
+
+    print("✅ Push tracking ready! Existing agents push every field on their next save, then only changes.")
+
+if __name__ == "__main__":
+    asyncio.run(add_retell_agent_push_tracking())
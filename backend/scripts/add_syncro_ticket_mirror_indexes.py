@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.database import engine
+from sqlalchemy import text
+
+async def add_syncro_ticket_mirror_indexes():
+    """Create syncro_tickets (if missing) and the indexes used by the ticket mirror"""
+
+    async with engine.begin() as conn:
+        print("Preparing syncro_tickets for the ticket mirror...")
+
+        await conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS syncro_tickets (
+                id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                syncro_ticket_id VARCHAR UNIQUE,
+                customer_id VARCHAR,
+                subject VARCHAR,
+                description TEXT,
+                status VARCHAR,
+                priority VARCHAR,
+                problem_type VARCHAR,
+                assigned_technician VARCHAR,
+                created_at TIMESTAMP DEFAULT NOW(),
+                updated_at TIMESTAMP DEFAULT NOW(),
+                synced_at TIMESTAMP DEFAULT NOW(),
+                ticket_metadata JSON
+            );
+        """))
+        print("✓ syncro_tickets table present")
+
+        # Push-down filters
+        for column in ("status", "priority", "customer_id"):
+            await conn.execute(text(f"""
+                CREATE INDEX IF NOT EXISTS ix_syncro_tickets_{column}
+                ON syncro_tickets ({column});
+            """))
+            print(f"✓ Created index on {column}")
+
+        # Delta sync high-water mark and keyset pagination (updated_at DESC, id DESC)
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_syncro_tickets_updated_at
+            ON syncro_tickets (updated_at);
+        """))
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_syncro_tickets_updated_at_id
+            ON syncro_tickets (updated_at DESC, id DESC);
+        """))
+        print("✓ Created updated_at indexes")
+
+        # Delta sync cursor, advanced only by completed syncs
+        await conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS syncro_sync_state (
+                resource VARCHAR PRIMARY KEY,
+                high_water TIMESTAMP,
+                last_full_sync_at TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT NOW()
+            );
+        """))
+        print("✓ syncro_sync_state table present")
+
+    print("✅ syncro_tickets ready for the ticket mirror! Run GET /api/v1/syncro/tickets/sync-from-syncro?full=true to fill it.")
+
+if __name__ == "__main__":
+    asyncio.run(add_syncro_ticket_mirror_indexes())
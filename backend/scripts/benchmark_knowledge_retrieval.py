@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import gc
+import random
+import sys
+import os
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.services.knowledge_retrieval import knowledge_retriever
+
+TOPICS = [
+    "vpn", "firewall", "printer", "outlook", "exchange", "backup", "dns", "dhcp", "wifi", "password reset",
+    "multi factor authentication", "active directory", "onedrive", "teams", "sharepoint", "antivirus",
+    "remote desktop", "switch", "router", "voip phone", "laptop", "monitor", "docking station", "license"
+]
+VERBS = ["configure", "restart", "troubleshoot", "install", "update", "reset", "verify", "escalate", "document", "replace"]
+WORDS = ("the user should first check that the device is powered on and connected to the office network then "
+         "open the settings panel and confirm the account details match the values in the client record if the "
+         "problem persists collect the error message and the time it happened before contacting the on call engineer").split()
+
+
+def synthetic_article(article_id: int, rng: random.Random) -> dict:
+    topics = rng.sample(TOPICS, 3)
+    sentences = []
+    for _ in range(rng.randint(15, 60)):
+        topic = rng.choice(topics)
+        sentences.append(f"To {rng.choice(VERBS)} the {topic} {' '.join(rng.choices(WORDS, k=rng.randint(8, 20)))}.")
+    return {
+        "id": article_id,
+        "name": f"How to {rng.choice(VERBS)} the {topics[0]} ({article_id})",
+        "content": "<p>" + "</p><p>".join(sentences) + "</p>",
+        "category": "General",
+        "organization": f"Client {article_id % 200}",
+        "updated_at": "2025-01-15T10:30:00.000Z"
+    }
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def benchmark(args):
+    """Build the passage index and measure retrieval latency against the budget"""
+    rng = random.Random(args.seed)
+    budget_ms = args.budget_ms or knowledge_retriever.budget_ms
+
+    started = time.monotonic()
+    if args.from_mirror:
+        passages = await knowledge_retriever.rebuild()
+    else:
+        for article_id in range(args.articles):
+            knowledge_retriever.add_record("articles", synthetic_article(article_id, rng), str(article_id % 200))
+        knowledge_retriever.loaded = True
+        passages = len(knowledge_retriever.index)
+    print(f"Indexed {passages} passages in {time.monotonic() - started:.1f}s")
+    # As main.freeze_startup_heap() does once the startup indexes are built
+    gc.collect()
+    gc.freeze()
+
+    queries = [
+        f"{rng.choice(['how do i', 'caller says', 'cannot', 'help with'])} {rng.choice(VERBS)} {rng.choice(TOPICS)}"
+        for _ in range(args.queries)
+    ]
+
+    if args.http:
+        import httpx
+        from fastapi import FastAPI
+        from api.routes import knowledge_base
+
+        app = FastAPI()
+        app.include_router(knowledge_base.router, prefix="/api/v1/knowledge-base")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            latencies = []
+            for query in queries:
+                body = {"query": query, "top_k": args.top_k}
+                if rng.random() < 0.5:
+                    body["organization_id"] = str(rng.randrange(200))
+                request_started = time.perf_counter()
+                response = await client.post("/api/v1/knowledge-base/retrieve", json=body)
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - request_started) * 1000)
+        label = "HTTP (in-process ASGI)"
+    else:
+        latencies = []
+        for query in queries:
+            organization_id = str(rng.randrange(200)) if rng.random() < 0.5 else None
+            latencies.append(knowledge_retriever.retrieve(query, organization_id=organization_id, top_k=args.top_k)["took_ms"])
+        label = "retrieve()"
+
+    p50, p95, p99 = (percentile(latencies, q) for q in (0.5, 0.95, 0.99))
+    print(f"{label}: {len(latencies)} queries  p50 {p50:.2f}ms  p95 {p95:.2f}ms  p99 {p99:.2f}ms  max {max(latencies):.2f}ms")
+
+    if p99 > budget_ms:
+        print(f"❌ p99 {p99:.2f}ms exceeds the {budget_ms:.0f}ms budget")
+        return 1
+    print(f"✅ p99 within the {budget_ms:.0f}ms budget")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark knowledge retrieval latency for agent tool calls")
+    parser.add_argument("--articles", type=int, default=5000, help="Synthetic articles to index")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, default=None, help="Defaults to KB_RETRIEVAL_BUDGET_MS")
+    parser.add_argument("--from-mirror", action="store_true", help="Index the ITGlue mirror tables instead of synthetic data")
+    parser.add_argument("--http", action="store_true", help="Measure through the /retrieve route instead of the service")
+    parser.add_argument("--seed", type=int, default=7)
+    sys.exit(asyncio.run(benchmark(parser.parse_args())))
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.database import engine
+from api.services.html_text import html_to_text, make_excerpt
+from sqlalchemy import text
+
+MIRROR_TABLES = ("itglue_articles", "itglue_configurations", "itglue_contacts", "itglue_passwords")
+
+# Mirror table -> record field holding the HTML its text is extracted from
+TEXT_SOURCES = {"itglue_articles": "content", "itglue_configurations": "description", "itglue_contacts": "notes"}
+
+async def create_itglue_mirror_tables():
+    """Create the local ITGlue mirror tables and the sync run log"""
+
+    async with engine.begin() as conn:
+        print("Creating ITGlue mirror tables...")
+
+        for table in MIRROR_TABLES:
+            await conn.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                    itglue_id VARCHAR NOT NULL UNIQUE,
+                    organization_id VARCHAR,
+                    name VARCHAR,
+                    itglue_updated_at TIMESTAMP,
+                    synced_at TIMESTAMP DEFAULT NOW(),
+                    text TEXT,
+                    excerpt TEXT,
+                    data JSON
+                );
+            """))
+            # Tables created before text extraction moved to sync time
+            await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS text TEXT;"))
+            await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS excerpt TEXT;"))
+            await conn.execute(text(f"""
+                CREATE INDEX IF NOT EXISTS ix_{table}_organization_id
+                ON {table} (organization_id);
+            """))
+            await conn.execute(text(f"""
+                CREATE INDEX IF NOT EXISTS ix_{table}_itglue_updated_at
+                ON {table} (itglue_updated_at);
+            """))
+            print(f"✓ Created {table} table")
+
+        await conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS itglue_sync_runs (
+                id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                mode VARCHAR NOT NULL,
+                status VARCHAR NOT NULL DEFAULT 'running',
+                started_at TIMESTAMP DEFAULT NOW(),
+                finished_at TIMESTAMP,
+                items_synced INTEGER DEFAULT 0,
+                errors INTEGER DEFAULT 0,
+                results JSON
+            );
+        """))
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_itglue_sync_runs_started_at
+            ON itglue_sync_runs (started_at);
+        """))
+        print("✓ Created itglue_sync_runs table")
+
+        for table, source in TEXT_SOURCES.items():
+            rows = (await conn.execute(text(f"SELECT id, data FROM {table} WHERE text IS NULL"))).all()
+            for row_id, data in rows:
+                extracted = html_to_text((data or {}).get(source))
+                await conn.execute(
+                    text(f"UPDATE {table} SET text = :text, excerpt = :excerpt WHERE id = :id"),
+                    {"text": extracted, "excerpt": make_excerpt(extracted), "id": row_id}
+                )
+            if rows:
+                print(f"✓ Extracted text for {len(rows)} existing {table} rows")
+
+    print("✅ ITGlue mirror tables ready! Run POST /api/v1/knowledge-base/sync/itglue?full=true to fill them.")
+
+if __name__ == "__main__":
+    asyncio.run(create_itglue_mirror_tables())
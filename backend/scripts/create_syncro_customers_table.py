@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.database import engine
+from sqlalchemy import text
+
+async def create_syncro_customers_table():
+    """Create the syncro_customers mirror table"""
+
+    async with engine.begin() as conn:
+        print("Creating syncro_customers table...")
+
+        await conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS syncro_customers (
+                id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                syncro_customer_id VARCHAR NOT NULL UNIQUE,
+                business_name VARCHAR,
+                contact_name VARCHAR,
+                email VARCHAR,
+                phone VARCHAR,
+                mobile VARCHAR,
+                disabled BOOLEAN DEFAULT FALSE,
+                syncro_updated_at TIMESTAMP,
+                synced_at TIMESTAMP DEFAULT NOW(),
+                customer_data JSON
+            );
+        """))
+        print("✓ Created syncro_customers table")
+
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_syncro_customers_syncro_updated_at
+            ON syncro_customers (syncro_updated_at);
+        """))
+        print("✓ Created index on syncro_updated_at")
+
+    print("✅ SyncroMSP customer mirror table ready! It is filled by the background refresh on startup.")
+
+if __name__ == "__main__":
+    asyncio.run(create_syncro_customers_table())
@@ -0,0 +1,44 @@
+"""Smoke test: every RetellAIService call against the local RetellAI emulator"""
+
+import asyncio
+
+
+def test_retell_service_against_emulator(retell_emulator):
+    from api.services.retell_service import retell_service
+
+    async def exercise():
+        agents = await retell_service.list_agents()
+        assert agents
+        agent_id = agents[0]["agent_id"]
+
+        created = await retell_service.create_agent({"name": "Smoke test", "prompt": "Hello"})
+        assert (await retell_service.get_agent(created["agent_id"]))["agent_name"] == "Smoke test"
+
+        await retell_service.update_agent(agent_id, {"agent_name": "Renamed"})
+        assert (await retell_service.get_agent(agent_id))["agent_name"] == "Renamed"
+        assert (await retell_service.get_agent(agent_id=agent_id))["agent_name"] == "Renamed"
+
+        bulk = await retell_service.bulk_update_agents({"language": "en-GB"})
+        assert bulk["updated_count"] + bulk["skipped_count"] == bulk["total_agents"] == len(agents) + 1
+        webhooks = await retell_service.update_all_agent_webhooks("http://localhost/webhook")
+        assert "failed_updates" not in webhooks
+
+        flow = await retell_service.create_conversation_flow({"nodes": [], "start_speaker": "agent"})
+        flow_id = flow["conversation_flow_id"]
+        assert [f["conversation_flow_id"] for f in await retell_service.list_conversation_flows()] == [flow_id]
+        await retell_service.update_conversation_flow(flow_id, {"start_speaker": "user"})
+        assert (await retell_service.get_conversation_flow(flow_id))["start_speaker"] == "user"
+        assert await retell_service.delete_conversation_flow(flow_id) is True
+        assert await retell_service.list_conversation_flows() == []
+
+        numbers = await retell_service.get_phone_numbers()
+        number = numbers[0]["phone_number"]
+        await retell_service.update_phone_number(number, agent_id)
+        assert (await retell_service.get_phone_number(number))["inbound_agent_id"] == agent_id
+
+        call = await retell_service.make_call(number, "+15550000001", agent_id)
+        a2a = await retell_service.make_agent_to_agent_call(agent_id, created["agent_id"], number, "+15550000002")
+        assert (await retell_service.get_call(call["call_id"]))["agent_id"] == agent_id
+        assert {c["call_id"] for c in await retell_service.list_calls()} >= {call["call_id"], a2a["call_id"]}
+
+    asyncio.run(exercise())
@@ -6,7 +6,6 @@ Usage: python update_webhook_url.py <new_ngrok_url>
 
 import os
 import sys
-import httpx
 import asyncio
 from dotenv import load_dotenv
 
@@ -14,53 +13,33 @@ load_dotenv()
 
 async def update_webhook_urls(new_base_url: str):
     """Update all RetellAI agents with new webhook URL"""
-    api_key = os.getenv("RETELLAI_API_KEY")
-    if not api_key:
+    if not os.getenv("RETELLAI_API_KEY"):
         print("❌ RETELLAI_API_KEY not found in environment")
         return
     
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    from api.services.retell_service import retell_service
     
     webhook_url = f"{new_base_url}/api/v1/retellai/agent-level-webhook"
     
-    async with httpx.AsyncClient() as client:
-        try:
-            # Get all agents
-            response = await client.get(
-                "https://api.retellai.com/list-agents",
-                headers=headers
-            )
-            
-            if response.status_code != 200:
-                print(f"❌ Failed to list agents: {response.text}")
-                return
-                
-            agents = response.json()
-            print(f"📍 Found {len(agents)} agents to update")
-            
-            # Update each agent
-            for agent in agents:
-                agent_id = agent["agent_id"]
-                agent_name = agent.get("agent_name", "Unknown")
-                
-                update_data = {"webhook_url": webhook_url}
-                
-                update_response = await client.patch(
-                    f"https://api.retellai.com/update-agent/{agent_id}",
-                    headers=headers,
-                    json=update_data
+    try:
+        # Agents are updated concurrently under the RetellAI rate limit
+        async for event in retell_service.iter_bulk_update_agents({"webhook_url": webhook_url}):
+            if event["event"] == "started":
+                print(f"📍 Found {event['total']} agents to update")
+            elif event["event"] == "agent_updated":
+                print(f"✅ [{event['completed']}/{event['total']}] Updated agent {event['agent_id']}")
+            elif event["event"] == "agent_skipped":
+                print(f"⏭️  [{event['completed']}/{event['total']}] Agent {event['agent_id']} already up to date")
+            elif event["event"] == "agent_failed":
+                print(f"❌ [{event['completed']}/{event['total']}] Failed to update agent {event['agent_id']}: {event['error']}")
+            elif event["event"] == "finished":
+                print(
+                    f"\n📊 {event['updated_count']} updated, {event['skipped_count']} skipped, "
+                    f"{event['failed_count']} failed in {event['duration_seconds']}s"
                 )
                 
-                if update_response.status_code == 200:
-                    print(f"✅ Updated agent '{agent_name}' ({agent_id})")
-                else:
-                    print(f"❌ Failed to update agent '{agent_name}': {update_response.text}")
-                    
-        except Exception as e:
-            print(f"❌ Error: {str(e)}")
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
     
     print(f"\n🎯 New webhook URL: {webhook_url}")
     print("💡 Don't forget to update your .env file:")